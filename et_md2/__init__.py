@@ -48,14 +48,47 @@ except ModuleNotFoundError as e:
     from pathlib import Path
     import click
     from et_micc2.project import auto_build_binary_extension
-    msg = auto_build_binary_extension(Path(__file__).parent, 'verletlist/impl_cpp')
+    msg = auto_build_binary_extension(Path(__file__).parent, 'verletlist/c_vl')
     if not msg:
         import et_md2.verletlist.c_vl
     else:
         click.secho(msg, fg='bright_red')
 
 
+import et_md2.grid
+
 import et_md2.verletlist
 
+try:
+    import et_md2.spatial_sorting.cpp
+except ModuleNotFoundError as e:
+    # Try to build this binary extension:
+    from pathlib import Path
+    import click
+    from et_micc2.project import auto_build_binary_extension
+    msg = auto_build_binary_extension(Path(__file__).parent, 'spatial_sorting/cpp')
+    if not msg:
+        import et_md2.spatial_sorting.cpp
+    else:
+        click.secho(msg, fg='bright_red')
+
+import et_md2.spatial_sorting
+
 import et_md2.atoms
 
+try:
+    import et_md2.integrators.cpp
+except ModuleNotFoundError as e:
+    # Try to build this binary extension:
+    from pathlib import Path
+    import click
+    from et_micc2.project import auto_build_binary_extension
+    msg = auto_build_binary_extension(Path(__file__).parent, 'integrators/cpp')
+    if not msg:
+        import et_md2.integrators.cpp
+    else:
+        click.secho(msg, fg='bright_red')
+
+import et_md2.integrators
+import et_md2.io
+
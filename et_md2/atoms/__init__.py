@@ -13,6 +13,35 @@ import matplotlib.pyplot as plt
 # from mpl_toolkits.mplot3d import Axes3D
 
 
+# The unit cells of Atoms.lattice_positions(): the fractional coordinates of
+# the basis atoms, and the edges of the unit cell relative to the lattice constant.
+_fcc = [[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]]
+_unit_cells = {
+	'fcc'      : (_fcc, (1.0, 1.0, 1.0)),
+	'bcc'      : ([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]], (1.0, 1.0, 1.0)),
+	'primitive': ([[0.0, 0.0, 0.0]], (1.0, 1.0, 1.0)),
+	# orthorhombic unit cell of the ideal hcp lattice
+	'hcp'      : ([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 5.0/6.0, 0.5], [0.0, 1.0/3.0, 0.5]]
+	              , (1.0, np.sqrt(3.0), np.sqrt(8.0/3.0))),
+	# two fcc lattices shifted by a quarter of the body diagonal
+	'diamond'  : (_fcc + [[x + 0.25, y + 0.25, z + 0.25] for x, y, z in _fcc], (1.0, 1.0, 1.0)),
+}
+
+
+def _nearest_neighbour_distance(basis, edges):
+	"""Return the nearest neighbour distance of a lattice, relative to the lattice constant.
+
+	:param np.ndarray basis: fractional coordinates of the basis atoms, shape (Z,3)
+	:param np.ndarray edges: edges of the unit cell relative to the lattice constant, shape (3,)
+	"""
+	# the basis atoms in the unit cell and its 26 neighbours
+	shifts = np.stack(np.meshgrid(*3*[np.arange(-1, 2)], indexing='ij'), axis=-1).reshape(-1, 3)
+	points = (basis[np.newaxis, :, :] + shifts[:, np.newaxis, :]).reshape(-1, 3)
+	rij = (points[np.newaxis, :, :] - basis[:, np.newaxis, :]) * edges
+	rij = np.sqrt(np.einsum('ijk,ijk->ij', rij, rij))
+	return rij[rij > 1e-12].min()
+
+
 class Atoms:
 	"""Class for a collection of atoms.
 
@@ -20,6 +49,12 @@ class Atoms:
 	:param int n: number of atoms to generate. All atom array are created with np.empty,
 		and they are not initialized.
 	:param float|np.single dtype: type of the atom arrays, float (np.double) by default.
+
+	The atom type array ``type`` has dtype np.int32 and is always initialized
+	to 0 (a single species). The periodic image counters ``image``, shape (n,3),
+	dtype np.int32, count how many times an atom was wrapped by the periodic
+	boundary conditions, and are initialized to 0. They are not in ``arrays``,
+	which all have the floating point type dtype.
 	"""
 	def __init__(self, n=10, dtype=float, zero=False):
 		accepted_dtypes = (float,np.single)
@@ -40,6 +75,8 @@ class Atoms:
 			self.m = np.empty( n   , dtype=dtype)
 
 		self.arrays = [self.r, self.v, self.a, self.m]
+		self.type = np.zeros(n, dtype=np.int32)
+		self.image = np.zeros((n,3), dtype=np.int32)
 
 		self.lower_corner = None
 		self.upper_corner = None
@@ -51,9 +88,15 @@ class Atoms:
 		return self.r.shape[0]
 
 
+	@property
+	def ntypes(self):
+		"""Return the number of atom types, i.e. max(type) + 1."""
+		return int(self.type.max()) + 1 if self.n else 0
+
+
 	def resize(self, n, positions_only=False):
 		"""resize all atom arrays """
-		arrays = [self.r] if positions_only else self.arrays
+		arrays = [self.r] if positions_only else self.arrays + [self.type, self.image]
 		for ar in arrays:
 			newshape = list(ar.shape)
 			newshape[0] = n
@@ -68,65 +111,59 @@ class Atoms:
 		self.upper_corner = np.array(upper_corner)
 
 
-	def lattice_positions(self, lower_corner=(0,0,0), upper_corner=(1,1,1), r0=None, cell='fcc'):
-		"""Fill the box with lattice points."""
-		if cell == 'fcc':
-			unitcell = np.array([[0.0,0.0,0.0]
-								,[0.5,0.5,0.0]
-								,[0.5,0.0,0.5]
-								,[0.0,0.5,0.5]])
-			if not r0:
-				r0 = np.sqrt(0.5)
-				a = 1.0
-			else:
-				a = np.sqrt(2) * r0
-
-		elif cell == 'bcc':
-			unitcell = np.array([[0.0,0.0,0.0]
-								,[0.5,0.5,0.5]])
-			if not r0:
-				r0 = np.sqrt(3.0)/2.0
-				a = 1.0
-			else:
-				a = 2*r0/np.sqrt(3.0)
-
-		elif cell == 'primitive':
-			unitcell = np.array([[0.0,0.0,0.0]])
-			if not r0:
-				r0 = 0.5
-				a = 1.0
-			else:
-				a = r0
-
-		else:
+	def lattice_positions(self, lower_corner=(0,0,0), upper_corner=(1,1,1), r0=None, cell='fcc', edges=None):
+		"""Fill the box with lattice points.
+
+		The lattice points are generated with array arithmetic: the basis of the
+		unit cell is added to the offsets of all unit cells overlapping the box,
+		and the points outside the box are masked out. The atom arrays are resized
+		once, to the exact number of lattice points, which are ordered by unit
+		cell (x fastest, z slowest), and by basis atom within a unit cell.
+
+		:param lower_corner: lower corner of the box.
+		:param upper_corner: upper corner of the box.
+		:param float r0: nearest neighbour distance. If None, the lattice constant
+			(the width of the unit cell in the x-direction) is 1.
+		:param cell: 'fcc', 'bcc', 'primitive', 'hcp' or 'diamond', or a user
+			supplied basis: an array_like with shape (Z,3) with the fractional
+			coordinates of the Z atoms of the unit cell.
+		:param edges: for a user supplied basis, the edges of the (orthorhombic)
+			unit cell relative to the lattice constant, (1,1,1) if None.
+		"""
+		if isinstance(cell, str):
+			try:
+				basis, edges = _unit_cells[cell]
+			except KeyError:
 				raise NotImplementedError(f"Unknown unit cell `{cell}`.")
+		else:
+			basis = cell
+			if edges is None:
+				edges = (1.0, 1.0, 1.0)
+		basis = np.asarray(basis, dtype=float)
+		edges = np.asarray(edges, dtype=float)
+		if basis.ndim != 2 or basis.shape[1] != 3 or edges.shape != (3,):
+			raise ValueError("Expecting a basis with shape (Z,3) and unit cell edges with shape (3,).")
+
+		if r0:
+			a = r0 / _nearest_neighbour_distance(basis, edges)
+		else:
+			a = 1.0
+		cell_size = a * edges
 
-		unitcell *= a
-		Z = unitcell.shape[0]
-
-		# estimate the number of unit cells that fit in the box, to be able to allocate
-		# the arrays
 		lc = np.array(lower_corner)
 		uc = np.array(upper_corner)
 		w = uc - lc
-		n = np.ceil(w/a).astype(int)
-		N = int(Z * n[0] * n[1] * n[2])
-		self.resize(N, positions_only=True) # this is an upper bound
-		ijk = np.array([0.0, 0.0, 0.0])
-		ia = 0
-		for k in range(n[2]):
-			ijk[2] = k
-			for j in range(n[1]):
-				ijk[1] = j
-				for i in range(n[0]):
-					ijk[0] = i
-					p = ijk + unitcell
-					for iz in range(Z):
-						if np.all(p[iz,:] < w) :
-							self.r[ia,:] = p[iz]
-							ia += 1
-
-		self.resize(ia) # this is the real size.
+		# the unit cells overlapping the box
+		n = np.ceil(w / cell_size).astype(int)
+		# p[k,j,i,iz] = (ijk + basis[iz])*cell_size, with ijk = (i,j,k)
+		k, j, i = np.meshgrid(np.arange(n[2]), np.arange(n[1]), np.arange(n[0]), indexing='ij')
+		ijk = np.stack((i, j, k), axis=-1)
+		p = (ijk[:, :, :, np.newaxis, :] + basis) * cell_size
+		p = p.reshape(-1, 3)
+		inside = np.all(p < w, axis=1)
+
+		self.resize(int(np.count_nonzero(inside)))
+		np.compress(inside, p, axis=0, out=self.r)
 
 		# add the offset (lower_corner)
 		if not np.all(lc == 0.0):
@@ -153,33 +190,87 @@ class Atoms:
 	def apply_PBC(self, collect=False):
 		"""Apply periodic boundary conditions.
 
-		:param bool collect: return set of moved atoms
-		:return: if collect is True, returns the set of moved atoms, otherwise returns None.
+		Atoms outside the box [lower_corner, upper_corner[ are wrapped into the
+		box, in all three dimensions at once. Their image counters are updated,
+		such that the unwrapped positions are ``r + image*(upper_corner - lower_corner)``,
+		see :py:meth:`unwrapped_positions`.
+
+		:param bool collect: return the indices of the moved atoms.
+		:return: if collect is True, a sorted integer array with the indices of the
+			moved atoms, otherwise None.
 		"""
+		moved = np.empty(0, dtype=np.intp)
 		if not self.lower_corner is None and not self.upper_corner is None:
-			moved  = set()
-			for id in range(3):
-				ar = self.r[id]
-				lc = self.lower_corner[id]
-				uc = self.upper_corner[id]
-				d = uc - lc
-				below = np.argwhere(ar < lc)
-				if len(below):
-					ar[below] += d
-					if collect:
-						for atom in below:
-							moved.add(atom[0])
-				above = np.argwhere(ar >= uc)
-				if len(above):
-					ar[above] -= d
-					if collect:
-						for atom in above:
-							moved.add(atom[0])
+			lc = np.asarray(self.lower_corner, dtype=self.r.dtype)
+			uc = np.asarray(self.upper_corner, dtype=self.r.dtype)
+			outside = (self.r < lc) | (self.r >= uc)
+			moved = np.flatnonzero(outside.any(axis=1))
+			if len(moved):
+				w = uc - lc
+				r = self.r[moved]
+				shift = np.floor((r - lc) / w)
+				r -= shift * w
+				# round-off error may leave a coordinate just outside the box
+				over = r >= uc
+				under = r < lc
+				r[over] -= np.broadcast_to(w, r.shape)[over]
+				r[under] += np.broadcast_to(w, r.shape)[under]
+				shift += over
+				shift -= under
+				self.r[moved] = r
+				self.image[moved] += shift.astype(self.image.dtype)
 
 		if collect:
 			return moved
 
 
+	def sort_spatially(self, cell_width):
+		"""Reorder the atoms along a Hilbert curve, to improve the cache locality.
+
+		The atoms are binned in cells of width cell_width, which are ordered along
+		a Hilbert curve, see :py:func:`et_md2.spatial_sorting.hilbert_order`. All
+		atom arrays (``arrays``, ``type`` and ``image``) are permuted in place.
+		Verlet lists of the atoms must be rebuilt, or relabelled with
+		``vl.permute(perm)``.
+
+		:param float cell_width: width of the cells, typically the cutoff distance.
+		:return: the permutation perm, an integer array: atom i was atom perm[i]
+			before sorting.
+		"""
+		import et_md2.spatial_sorting
+		perm = et_md2.spatial_sorting.hilbert_order(self.r, cell_width)
+		for ar in self.arrays + [self.type, self.image]:
+			ar[:] = ar[perm]
+		return perm
+
+
+	def unwrapped_positions(self):
+		"""Return the positions of the atoms as if there were no periodic boundary
+		conditions, ``r + image*(upper_corner - lower_corner)``.
+		"""
+		if self.lower_corner is None or self.upper_corner is None:
+			return self.r.copy()
+		w = np.asarray(self.upper_corner, dtype=self.r.dtype) - np.asarray(self.lower_corner, dtype=self.r.dtype)
+		return self.r + self.image * w
+
+
+	def save(self, path):
+		"""Save the atoms to a checkpoint file, see :py:func:`et_md2.io.save_atoms`."""
+		import et_md2.io
+		et_md2.io.save_atoms(self, path)
+
+
+	@staticmethod
+	def load(path, mmap_mode='c'):
+		"""Load atoms from a checkpoint file, see :py:func:`et_md2.io.load_atoms`.
+
+		By default, the atom arrays are memory-mapped (copy-on-write), and cannot
+		be resized.
+		"""
+		import et_md2.io
+		return et_md2.io.load_atoms(path, mmap_mode)
+
+
 	def plot(self, box=True, atoms=True):
 		"""Plot the box and the atoms"""
 
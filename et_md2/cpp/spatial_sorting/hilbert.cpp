@@ -9,6 +9,11 @@
 #include "hilbert_c.hpp"
 #include <stdexcept>
 #include <string>
+#include <vector>
+#include <algorithm>
+#ifdef _OPENMP
+#  include <omp.h>
+#endif
 
 //#define DEBUG_IO
 #ifdef DEBUG_IO
@@ -68,7 +73,7 @@ namespace hilbert
     HilbertIndex_t
     ijk2h( int const* ijk )
     {
-        int ijk_copy[3] = { ijk[0], ijk[0], ijk[0] };
+        int ijk_copy[3] = { ijk[0], ijk[1], ijk[2] };
         return ijk2h(ijk_copy);
     }
  //-------------------------------------------------------------------------------------------------
@@ -97,7 +102,7 @@ namespace hilbert
             HilbertIndex_t htmp = h[i];
             I_t            itmp = i;// = I[i]
             I_t j = i;
-            while( h[j-1] > htmp )
+            while( j > 0 && h[j-1] > htmp )
             {
                 #ifdef DEBUG_IO
                 std::cout<<j<<std::endl;
@@ -105,7 +110,6 @@ namespace hilbert
                 
                 h[j] = h[j-1];
                 I[j] = I[j-1];
-                if(j==0) break; 
                 j -= 1;
             }
             h[j] = htmp;
@@ -119,4 +123,89 @@ namespace hilbert
        }
     }
  //-------------------------------------------------------------------------------------------------
+ // LSD radix sort, 8 bits per pass. The keys are sorted as h - min(h), and
+ // only the passes covering the bits of max(h) - min(h) are done, i.e. 3 passes
+ // for the Hilbert indices of a 128x128x128 grid. Each pass is a stable counting
+ // sort: every thread counts the digits of a contiguous chunk of the keys, a
+ // prefix sum over (digit, thread) gives the position of the first key with
+ // that digit of every thread, and the threads scatter their chunk in order.
+    void radix_sort( I_t const n, HilbertIndex_t* h, I_t* I )
+    {
+        typedef unsigned long long Key_t;
+        int const RADIX_BITS = 8;
+        std::size_t const NBUCKETS = std::size_t(1) << RADIX_BITS;
+        Key_t const MASK = NBUCKETS - 1;
+
+        if( n == 0 )
+            return;
+        HilbertIndex_t hmin = h[0], hmax = h[0];
+        #pragma omp parallel for reduction(min:hmin) reduction(max:hmax) schedule(static)
+        for( long i=0; i<(long)n; ++i ) {
+            hmin = std::min( hmin, h[i] );
+            hmax = std::max( hmax, h[i] );
+        }
+        Key_t const range = (Key_t)hmax - (Key_t)hmin;
+        int npasses = 0;
+        while( npasses*RADIX_BITS < 64 && ( range >> (npasses*RADIX_BITS) ) )
+            ++npasses;
+
+     // (key, original position) pairs, double buffered
+        std::vector<Key_t> key(n), key_tmp(n);
+        std::vector<I_t>   idx(n), idx_tmp(n);
+        #pragma omp parallel for schedule(static)
+        for( long i=0; i<(long)n; ++i ) {
+            key[i] = (Key_t)h[i] - (Key_t)hmin;
+            idx[i] = i;
+        }
+
+        std::size_t nthreads = 1;
+      #ifdef _OPENMP
+        nthreads = std::max( 1, std::min( omp_get_max_threads(), (int)(n/NBUCKETS) ) );
+      #endif
+        std::vector<std::size_t> count(nthreads*NBUCKETS);
+        for( int pass=0; pass<npasses; ++pass )
+        {
+            int const shift = pass*RADIX_BITS;
+            #pragma omp parallel num_threads(nthreads)
+            {
+             // the number of threads actually used may be less than requested
+                std::size_t t = 0, nt = 1;
+              #ifdef _OPENMP
+                t  = omp_get_thread_num();
+                nt = omp_get_num_threads();
+              #endif
+                std::size_t const i0 = n*t/nt;
+                std::size_t const i1 = n*(t+1)/nt;
+                std::size_t * ct = &count[t*NBUCKETS];
+                std::fill( ct, ct + NBUCKETS, 0 );
+                for( std::size_t i=i0; i<i1; ++i )
+                    ++ct[ ( key[i] >> shift ) & MASK ];
+                #pragma omp barrier
+                #pragma omp single
+                {// exclusive prefix sum, digit major, thread minor
+                    std::size_t offset = 0;
+                    for( std::size_t b=0; b<NBUCKETS; ++b )
+                        for( std::size_t tt=0; tt<nt; ++tt ) {
+                            std::size_t const c = count[tt*NBUCKETS + b];
+                            count[tt*NBUCKETS + b] = offset;
+                            offset += c;
+                        }
+                }// implicit barrier
+                for( std::size_t i=i0; i<i1; ++i ) {
+                    std::size_t const pos = ct[ ( key[i] >> shift ) & MASK ]++;
+                    key_tmp[pos] = key[i];
+                    idx_tmp[pos] = idx[i];
+                }
+            }
+            key.swap(key_tmp);
+            idx.swap(idx_tmp);
+        }
+
+        #pragma omp parallel for schedule(static)
+        for( long i=0; i<(long)n; ++i ) {
+            h[i] = (HilbertIndex_t)( key[i] + (Key_t)hmin );
+            I[i] = idx[i];
+        }
+    }
+ //-------------------------------------------------------------------------------------------------
 }// namespace hilbert
@@ -194,6 +194,15 @@ namespace hilbert
      // to sort any other array A in the same order:
      //     for( I_t i=0; i<n; i++ )
      //         Asorted[i] = A[[I[i]];
+ //-------------------------------------------------------------------------------------------------
+    void radix_sort
+      ( I_t      const   n // (input) array length of h and I
+      , HilbertIndex_t * h // (input and output) array of hilbert indices, sorted on output
+      , I_t            * I // (output) array of new positions I[i] of i-th element
+      );
+     // Same as insertion_sort, but with a stable LSD radix sort, which is
+     // O(n) and parallelized with OpenMP. The result does not depend on the
+     // number of threads.
  //-------------------------------------------------------------------------------------------------
  // create a sorted copy of <unsorted>
     template <class T>
@@ -11,11 +11,13 @@
     // py::array_t<T> a_;
         size_t shape_[NDIM];
         T * ptrT_; 
+        bool c_contiguous_;
 
     public:
     //-----------------------------------------------------------------------------
     // ctor
-        ArrayInfo(py::array_t<T> a)
+        template<int ExtraFlags>
+        ArrayInfo(py::array_t<T,ExtraFlags> a)
         // : a_(a)
         {
             auto buf = a.request();
@@ -29,6 +31,14 @@
                 this->shape_[i] = buf.shape[i];
             }
             this->ptrT_ = static_cast<T *>(buf.ptr);
+         // strides of a C-contiguous array, dimensions of length 1 do not matter
+            this->c_contiguous_ = true;
+            py::ssize_t stride = sizeof(T);
+            for( size_t i = NDIM; i-- > 0; ) {
+                if( buf.shape[i] > 1 && buf.strides[i] != stride )
+                    this->c_contiguous_ = false;
+                stride *= buf.shape[i];
+            }
         }
         
     //-----------------------------------------------------------------------------
@@ -55,6 +65,26 @@
             return this->shape_[i];
         }
 
+    //-----------------------------------------------------------------------------
+    // Throw runtime_error if the array is not C-contiguous. Arrays that are
+    // modified in place cannot be converted to a C-contiguous copy.
+        void assert_c_contiguous(char const* name) const
+        {
+            if( !c_contiguous_ )
+                throw std::runtime_error(std::string("Expecting a C-contiguous array `") + name + "`.");
+        }
+
+    //-----------------------------------------------------------------------------
+    // Throw runtime_error if the length of the i-th array dimension is not n
+        void assert_shape(size_t i, size_t n, char const* name) const
+        {
+            if( shape_[i] != n ) {
+                std::string msg = std::string("Expecting array `") + name + "` with length " + std::to_string(n)
+                                + " in dimension " + std::to_string(i) + ", got " + std::to_string(shape_[i]) + ".";
+                throw std::runtime_error(msg);
+            }
+        }
+
     //-----------------------------------------------------------------------------
     // Throw runtime_error if b does not have the same shape as *this   
         template<class B>
@@ -95,3 +125,41 @@
 
     };
  //-----------------------------------------------------------------------------
+
+ //-----------------------------------------------------------------------------
+ // Array of atom positions, or other read-only per atom arrays. pybind11
+ // converts arrays with another layout (e.g. Fortran order or strided) or
+ // dtype to a C-contiguous copy.
+    template<class T>
+    using carray_t = py::array_t<T, py::array::c_style | py::array::forcecast>;
+
+ //-----------------------------------------------------------------------------
+ // Return the ArrayInfo of an array that is updated in place, e.g. the atom
+ // accelerations. A converted copy would not be updated, hence a must be a
+ // C-contiguous numpy array with dtype T.
+    template<class T, size_t NDIM>
+    ArrayInfo<T,NDIM>
+    inplace_info(py::object a, char const* name)
+    {
+        if( !py::isinstance<py::array_t<T>>(a) ) {
+            std::string msg = std::string("Expecting a numpy array `") + name + "` with dtype "
+                            + py::str(py::dtype::of<T>()).cast<std::string>() + ".";
+            throw std::runtime_error(msg);
+        }
+        ArrayInfo<T,NDIM> info( a.cast<py::array_t<T>>() );
+        info.assert_c_contiguous(name);
+        return info;
+    }
+
+ //-----------------------------------------------------------------------------
+ // Return the ArrayInfo of an array of atom positions, after verifying that it
+ // has shape (n,3).
+    template<class T, int ExtraFlags>
+    ArrayInfo<T,2>
+    positions_info(py::array_t<T,ExtraFlags> r, char const* name = "r")
+    {
+        ArrayInfo<T,2> ar(r);
+        ar.assert_shape(1, 3, name);
+        return ar;
+    }
+ //-----------------------------------------------------------------------------
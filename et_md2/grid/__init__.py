@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module et_md2.grid
+==================
+
+A submodule for cell lists. The atoms are binned in a regular grid of cells
+that are at least as wide as the cutoff distance, so that the neighbours of
+an atom are found in its own cell and the 26 surrounding cells.
+
+"""
+import numpy as np
+
+
+def _counting_argsort(keys, nkeys):
+    """Return the indices that sort the integer keys in [0, nkeys[ stably.
+
+    This is a least significant digit radix sort with 16-bit digits, one
+    stable argsort per digit. Numpy sorts integers of at most 16 bits with a
+    counting sort (radix sort) if kind='stable', which is O(n), whereas wider
+    integers are sorted with timsort, O(n log n).
+    """
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind='stable')
+    shift = 16
+    while (nkeys - 1) >> shift:
+        digit = ((keys[order] >> shift) & 0xFFFF).astype(np.uint16)
+        order = order[np.argsort(digit, kind='stable')]
+        shift += 16
+    return order
+
+
+class Grid:
+    """Cell list of a set of atoms.
+
+    :param float cell_size: minimal width of the cells, typically the cutoff
+        distance of the Verlet list.
+    :param atoms: Atoms object. If provided, its positions are used by ``build()``
+        and its box (``lower_corner``, ``upper_corner``) is used if it is set.
+    :param lower_corner: lower corner of the box. If None, it is taken from the atoms,
+        or, if the atoms have no box, from the bounding box of the positions.
+    :param upper_corner: upper corner of the box, idem.
+
+    The cell list is stored as CSR arrays, like the linearised Verlet list:
+
+    *   cl_list : 1D numpy array containing the atom indices of all cells, one cell
+                  after the other.
+    *   cl_size : 1D numpy array containing the number of atoms in each cell.
+    *   cl_offset : 1D numpy array containing the starting position of each cell
+                  in the cl_list array.
+
+    Cell (k,l,m) has the flat index ``k + K[0]*(l + K[1]*m)``.
+    """
+    def __init__(self, cell_size, atoms=None, lower_corner=None, upper_corner=None):
+        self.cell_size = cell_size
+        self.atoms = atoms
+        self.lower_corner = None if lower_corner is None else np.array(lower_corner, dtype=float)
+        self.upper_corner = None if upper_corner is None else np.array(upper_corner, dtype=float)
+        self.K = None
+        self.cell = None
+        self.cl_list = None
+        self.cl_size = None
+        self.cl_offset = None
+
+
+    @property
+    def ncells(self):
+        """Return the total number of cells."""
+        return int(np.prod(self.K))
+
+
+    def _box(self, r):
+        """Return the lower and upper corner of the box."""
+        lc = self.lower_corner
+        uc = self.upper_corner
+        if lc is None and self.atoms is not None:
+            lc = self.atoms.lower_corner
+        if uc is None and self.atoms is not None:
+            uc = self.atoms.upper_corner
+        if lc is None:
+            lc = r.min(axis=0)
+        if uc is None:
+            uc = r.max(axis=0)
+        return np.asarray(lc, dtype=float), np.asarray(uc, dtype=float)
+
+
+    def build(self, r=None):
+        """Bin the atoms in the cells.
+
+        The atoms are ordered by cell with a counting sort over the flat cell
+        indices: the cell sizes are counted with ``np.bincount``, the offsets
+        are their exclusive prefix sum, and the atoms are placed in their cell
+        by a radix sort of the flat cell indices with 16-bit digits, each of
+        which numpy sorts with a counting sort. Within a cell the atoms are in
+        increasing order. Atoms outside the box are put in the nearest boundary
+        cell.
+
+        :param np.ndarray r: atom coordinates, r.shape = (n,3). If None, the
+            positions of the atoms passed to the ctor are used.
+        """
+        if r is None:
+            if self.atoms is None:
+                raise ValueError("Grid.build() needs positions, or atoms passed to the ctor.")
+            r = self.atoms.r
+
+        lc, uc = self._box(r)
+        w = uc - lc
+        # The number of cells is rounded down, so that the cells are at least cell_size wide.
+        self.K = np.maximum(np.floor(w / self.cell_size).astype(int), 1)
+        cell_width = np.where(w > 0, w / self.K, 1.0)
+
+        ijk = np.floor((r - lc) / cell_width).astype(int)
+        np.clip(ijk, 0, self.K - 1, out=ijk)
+        self.cell = ijk[:, 0] + self.K[0] * (ijk[:, 1] + self.K[1] * ijk[:, 2])
+
+        # counting sort
+        self.cl_size = np.bincount(self.cell, minlength=self.ncells)
+        self.cl_offset = np.zeros(self.ncells, dtype=int)
+        np.cumsum(self.cl_size[:-1], out=self.cl_offset[1:])
+        self.cl_list = _counting_argsort(self.cell, self.ncells)
+
+
+    def linearised(self):
+        """The cell list is built in linearised form, test if it is built."""
+        return not self.cl_list is None
+
+
+    def cell_list(self, k, l, m):
+        """Return the atoms in cell (k,l,m).
+
+        :return: view of a numpy array
+        :raises IndexError: if the cell does not exist.
+        """
+        K = self.K
+        if not (0 <= k < K[0] and 0 <= l < K[1] and 0 <= m < K[2]):
+            raise IndexError(f"No such cell: {(k, l, m)}, the grid has {tuple(K)} cells.")
+        c = k + K[0] * (l + K[1] * m)
+        offset = self.cl_offset[c]
+        return self.cl_list[offset:offset + self.cl_size[c]]
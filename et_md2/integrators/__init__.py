@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module et_md2.integrators
+========================
+
+A submodule for integrating the equations of motion of the atoms.
+
+:py:func:`run` integrates with the velocity Verlet algorithm. With a C++ Verlet
+list (:py:mod:`et_md2.verletlist.c_vl`), the position and velocity updates,
+the periodic boundary conditions, the Verlet list rebuilds and the force
+computation are all done in C++ (:py:mod:`et_md2.integrators.cpp`), and
+control returns to Python only every *every* steps. With a Python Verlet list
+the same algorithm is run with numpy array arithmetic.
+
+"""
+
+import numpy as np
+
+import et_md2.verletlist
+import et_md2.interactions
+import et_md2.potentials
+
+
+def run(atoms, vl, potential=None, dt=0.001, nsteps=1, every=None, callback=None, pbc=False):
+    """Integrate the equations of motion of the atoms with the velocity Verlet algorithm.
+
+    The Verlet list is rebuilt whenever an atom has moved more than half the skin
+    since the last build. The time steps are run in chunks of *every* steps. After
+    each chunk ``callback(step, atoms, epot, virial)`` is called, with *step* the
+    number of time steps done so far, and *epot* and *virial* the interaction
+    energy and virial tensor of the last step, e.g. to compute observables or to
+    write a trajectory.
+
+    :param atoms: Atoms object. atoms.r and atoms.v are updated, and atoms.a
+        contains the accelerations of the last step on return.
+    :param vl: Verlet list object, either implementation. Arrays vl.vl_list, ...
+        obtained before the run keep viewing the old Verlet list if it is rebuilt.
+    :param potential: potential, see :py:func:`et_md2.interactions.compute_all`.
+        If None, the reduced Lennard-Jones potential is used.
+    :param float dt: time step.
+    :param int nsteps: number of time steps.
+    :param int every: number of time steps between calls to callback. If None,
+        all time steps are run in a single chunk.
+    :param callback: function called after every chunk of time steps, or None.
+    :param bool pbc: apply periodic boundary conditions, the box is given by
+        atoms.lower_corner and atoms.upper_corner. Atoms leaving the box are
+        wrapped to the other side, and their periodic image counters atoms.image
+        are updated, see :py:meth:`et_md2.atoms.Atoms.apply_PBC`. The box is
+        also set as periodic box of the Verlet list, hence the atoms interact
+        across the box boundaries (minimum image convention).
+    :return: tuple (epot, virial) of the last step.
+    """
+    if pbc and (atoms.lower_corner is None or atoms.upper_corner is None):
+        raise ValueError("Periodic boundary conditions need atoms.lower_corner and atoms.upper_corner.")
+    if every is None or every > nsteps:
+        every = nsteps
+    if nsteps > 0 and every < 1:
+        raise ValueError(f"Expecting every > 0, got {every}.")
+
+    is_py = isinstance(vl, et_md2.verletlist.VL)
+    if potential is None and is_py:
+        potential = et_md2.potentials.LJ_py()
+
+    if pbc:
+        vl.set_box(atoms.lower_corner, atoms.upper_corner)
+        atoms.apply_PBC()
+
+    # initial accelerations
+    if vl.needs_rebuild(atoms.r):
+        if is_py:
+            vl.build_vectorized(atoms.r)
+        else:
+            vl.build(atoms.r)
+    atoms.a[:] = 0.0
+    _, epot, virial = et_md2.interactions.compute_all(atoms, vl, potential)
+
+    if is_py:
+        run_chunk = _run_py
+    else:
+        run_chunk = _run_cpp
+        potential = et_md2.potentials.to_cpp(potential)
+
+    step = 0
+    while step < nsteps:
+        n = min(every, nsteps - step)
+        epot, virial = run_chunk(atoms, vl, potential, dt, n, pbc)
+        step += n
+        if callback is not None:
+            callback(step, atoms, epot, virial)
+
+    return epot, virial
+
+
+def _run_cpp(atoms, vl, potential, dt, nsteps, pbc):
+    """Run nsteps time steps in C++, return (epot, virial) of the last step."""
+    import et_md2.integrators.cpp as cpp
+    args = [atoms.r, atoms.v, atoms.a, atoms.m, vl, potential, dt, nsteps]
+    if pbc:
+        args += [atoms.lower_corner, atoms.upper_corner, atoms.image]
+    else:
+        args += [None, None, None]
+    if hasattr(potential, 'ntypes'):
+        args.append(atoms.type)
+    if atoms.r.dtype == np.float32:
+        epot, virial, nrebuilds = cpp.run_sp(*args)
+    else:
+        epot, virial, nrebuilds = cpp.run_dp(*args)
+    return epot, virial
+
+
+def _run_py(atoms, vl, potential, dt, nsteps, pbc):
+    """Run nsteps time steps with numpy, return (epot, virial) of the last step."""
+    half_dt = 0.5 * dt
+    for _ in range(nsteps):
+        atoms.v += half_dt * atoms.a
+        atoms.r += dt * atoms.v
+        if pbc:
+            atoms.apply_PBC()
+        if vl.needs_rebuild(atoms.r):
+            vl.build_vectorized(atoms.r)
+        atoms.a[:] = 0.0
+        _, epot, virial = et_md2.interactions.compute_all(atoms, vl, potential)
+        atoms.v += half_dt * atoms.a
+    return epot, virial
@@ -0,0 +1,183 @@
+/*
+ *  C++ source file for module et_md2.integrators.cpp
+ */
+
+
+// See http://people.duke.edu/~ccc14/cspy/18G_C++_Python_pybind11.html for examples on how to use pybind11.
+// The example below is modified after http://people.duke.edu/~ccc14/cspy/18G_C++_Python_pybind11.html#More-on-working-with-numpy-arrays
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+
+namespace py = pybind11;
+
+#include <string>
+#include <cstdint>
+#include <stdexcept>
+
+#include "vl.hpp"
+#include "ArrayInfo.hpp"
+#include "integrators.hpp"
+
+// Copy the corners of the periodic box to lower and upper. Return false if
+// there is no periodic box (None).
+bool
+get_box( py::object lower_corner, py::object upper_corner, double * lower, double * upper )
+{
+    if( lower_corner.is_none() || upper_corner.is_none() )
+        return false;
+    carray_t<double> lc = lower_corner.cast<carray_t<double>>();
+    carray_t<double> uc = upper_corner.cast<carray_t<double>>();
+    ArrayInfo<double,1> alc(lc);
+    ArrayInfo<double,1> auc(uc);
+    if( alc.shape(0) != 3 || auc.shape(0) != 3 )
+        throw std::runtime_error("Expecting box corners with 3 coordinates.");
+    for( std::size_t d=0; d<3; ++d ) {
+        lower[d] = alc.cdata()[d];
+        upper[d] = auc.cdata()[d];
+        if( !( upper[d] > lower[d] ) )
+            throw std::runtime_error("Expecting upper_corner > lower_corner.");
+    }
+    return true;
+}
+
+// Return a pointer to the periodic image counters, nullptr if image is None.
+std::int32_t *
+get_image( py::object image, std::size_t n )
+{
+    if( image.is_none() )
+        return nullptr;
+ // the counters are updated in place, hence no conversion is allowed
+    if( !py::isinstance<py::array_t<std::int32_t, py::array::c_style>>(image) )
+        throw std::runtime_error("Expecting periodic image counters with dtype=numpy.int32.");
+    py::array_t<std::int32_t> aimage = image.cast<py::array_t<std::int32_t>>();
+    ArrayInfo<std::int32_t,2> ai(aimage);
+    if( ai.shape(0) != n || ai.shape(1) != 3 )
+        throw std::runtime_error("Expecting periodic image counters with shape (n,3).");
+    return ai.data();
+}
+
+// Run nsteps velocity Verlet steps. Return the tuple (epot, virial, nrebuilds)
+// of the last step. The GIL is released while integrating. The positions r,
+// velocities v and accelerations a are updated in place, hence they must be
+// C-contiguous arrays of shape (n,3), with n the number of atoms of the Verlet
+// list. The masses m are converted to a C-contiguous array if necessary.
+template<typename FloatType, typename VLType, typename Potential>
+py::tuple
+run
+  ( py::object r
+  , py::object v
+  , py::object a
+  , carray_t<FloatType> m
+  , VLType & vl
+  , Potential const & potential
+  , double dt
+  , std::size_t nsteps
+  , py::object lower_corner
+  , py::object upper_corner
+  , py::object image
+  , std::int32_t const * types
+  )
+{
+    if( nsteps == 0 )
+        throw std::runtime_error("Expecting nsteps > 0.");
+    ArrayInfo<FloatType,2> ar = inplace_info<FloatType,2>(r, "r");
+    ArrayInfo<FloatType,2> av = inplace_info<FloatType,2>(v, "v");
+    ArrayInfo<FloatType,2> aa = inplace_info<FloatType,2>(a, "a");
+    ArrayInfo<FloatType,1> am(m);
+    ar.assert_shape(1, 3, "r");
+    if( ar.shape(0) != vl.natoms() )
+        throw std::runtime_error("Expecting the positions of all atoms of the Verlet list.");
+    ar.assert_identical_shape(av);
+    ar.assert_identical_shape(aa);
+    if( am.shape(0) != ar.shape(0) && am.shape(0) != 1 )
+        throw std::runtime_error("Expecting a mass for each atom, or a single mass.");
+    double lower[3], upper[3];
+    bool const periodic = get_box( lower_corner, upper_corner, lower, upper );
+    std::int32_t * pimage = get_image( image, ar.shape(0) );
+    py::array_t<FloatType> virial({3,3});
+    ArrayInfo<FloatType,2> avirial(virial);
+    std::size_t nrebuilds = 0;
+    FloatType epot;
+    {
+        py::gil_scoped_release release;
+        epot = integrators::velocity_verlet
+                 ( ar.data(), av.data(), aa.data(), ar.shape(0), am.cdata(), am.shape(0)
+                 , vl, potential, dt, nsteps
+                 , ( periodic ? lower : nullptr ), ( periodic ? upper : nullptr ), pimage
+                 , avirial.data(), nrebuilds, types
+                 );
+    }
+    return py::make_tuple( epot, virial, nrebuilds );
+}
+
+// Expose run<suffix> for one floating point type, Verlet list type and potential type.
+template<typename FloatType, typename VLType, typename Potential>
+void
+declare_run( py::module& m, std::string const& suffix )
+{
+    m.def(("run" + suffix).c_str()
+         , []( py::object r, py::object v, py::object a, carray_t<FloatType> m
+             , VLType & vl, Potential const & potential, double dt, std::size_t nsteps
+             , py::object lower_corner, py::object upper_corner, py::object image )
+           {
+               return run( r, v, a, m, vl, potential, dt, nsteps, lower_corner, upper_corner, image, nullptr );
+           }
+         , py::arg("r"), py::arg("v"), py::arg("a"), py::arg("m"), py::arg("vl"), py::arg("potential")
+         , py::arg("dt"), py::arg("nsteps"), py::arg("lower_corner")=py::none(), py::arg("upper_corner")=py::none()
+         , py::arg("image")=py::none()
+         );
+}
+
+// Idem, for a potential for mixtures of atom types, which takes the atom
+// types as an extra argument.
+template<typename FloatType, typename VLType, typename Potential>
+void
+declare_typed_run( py::module& m, std::string const& suffix )
+{
+    m.def(("run" + suffix).c_str()
+         , []( py::object r, py::object v, py::object a, carray_t<FloatType> m
+             , VLType & vl, Potential const & potential, double dt, std::size_t nsteps
+             , py::object lower_corner, py::object upper_corner, py::object image, carray_t<std::int32_t> types )
+           {
+               ArrayInfo<std::int32_t,1> atypes(types);
+               if( atypes.shape(0) != vl.natoms() )
+                   throw std::runtime_error("Expecting an atom type for each atom.");
+               std::int32_t const * t = atypes.cdata();
+               for( std::size_t i=0; i<atypes.shape(0); ++i )
+                   if( t[i] < 0 || t[i] >= (std::int32_t)potential.ntypes() )
+                       throw std::out_of_range("Atom type out of range.");
+               return run( r, v, a, m, vl, potential, dt, nsteps, lower_corner, upper_corner, image, t );
+           }
+         , py::arg("r"), py::arg("v"), py::arg("a"), py::arg("m"), py::arg("vl"), py::arg("potential")
+         , py::arg("dt"), py::arg("nsteps"), py::arg("lower_corner"), py::arg("upper_corner"), py::arg("image")
+         , py::arg("types")
+         );
+}
+
+// Idem, for all potential types.
+template<typename FloatType, typename VLType>
+void
+declare_run( py::module& m, std::string const& suffix )
+{
+    declare_run<FloatType, VLType, potentials::LJ        >(m, suffix);
+    declare_run<FloatType, VLType, potentials::Morse     >(m, suffix);
+    declare_run<FloatType, VLType, potentials::WCA       >(m, suffix);
+    declare_run<FloatType, VLType, potentials::SoftSphere>(m, suffix);
+    declare_run<FloatType, VLType, potentials::Tabulated >(m, suffix);
+    declare_typed_run<FloatType, VLType, potentials::PairLJ>(m, suffix);
+}
+
+
+PYBIND11_MODULE(cpp, m)
+{// optional module doc-string
+    m.doc() = "C++ implementation of et_md2.integrators"; // optional module docstring
+ // The potential classes are exposed by et_md2.potentials.cpp, the Verlet list
+ // classes by et_md2.verletlist.c_vl.
+    py::module::import("et_md2.potentials.cpp");
+    py::module::import("et_md2.verletlist.c_vl");
+ // list the functions you want to expose:
+    declare_run<float ,VL  >(m, "_sp");
+    declare_run<float ,VL64>(m, "_sp");
+    declare_run<double,VL  >(m, "_dp");
+    declare_run<double,VL64>(m, "_dp");
+}
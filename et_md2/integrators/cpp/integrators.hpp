@@ -0,0 +1,122 @@
+/*
+ *  C++ header file with the integrators of module et_md2.integrators.cpp
+ *
+ *  The integrators work on raw arrays and a Verlet list, and do not depend on
+ *  pybind11. The forces are computed with the kernels of interactions.hpp.
+ */
+
+#ifndef INTEGRATORS_HPP
+#define INTEGRATORS_HPP
+
+#include <cstddef>
+#include <cstdint>
+#include <cmath>
+
+#include "interactions.hpp"
+
+namespace integrators
+{//-----------------------------------------------------------------------------
+ // Wrap the atom positions into the periodic box [lower, upper[, and update
+ // the periodic image counters, if image is not nullptr, such that the
+ // unwrapped positions are r + image*(upper - lower).
+    template<typename FloatType>
+    void
+    wrap
+      ( FloatType    * r     // atom positions, shape (n,3)
+      , std::size_t    n     // number of atoms
+      , double const * lower // lower corner of the box, shape (3,)
+      , double const * upper // upper corner of the box, shape (3,)
+      , std::int32_t * image // periodic image counters, shape (n,3), or nullptr
+      )
+    {
+        #pragma omp parallel for schedule(static)
+        for( long i=0; i<(long)n; ++i ) {
+            for( std::size_t d=0; d<3; ++d ) {
+                FloatType & x = r[3*i+d];
+                if( x < lower[d] || x >= upper[d] ) {
+                    double const w = upper[d] - lower[d];
+                    long shift = (long)std::floor( (x - lower[d])/w );
+                    x -= shift*w;
+                 // round-off error may leave x just outside the box
+                    if( x >= upper[d] ) {
+                        x -= w;
+                        ++shift;
+                    } else if( x < lower[d] ) {
+                        x += w;
+                        --shift;
+                    }
+                    if( image )
+                        image[3*i+d] += shift;
+                }
+            }
+        }
+    }
+
+ //-----------------------------------------------------------------------------
+ // Integrate the equations of motion over nsteps time steps dt with the
+ // velocity Verlet algorithm:
+ //   v += a*dt/2
+ //   r += v*dt
+ //   (wrap the positions into the periodic box, rebuild the Verlet list if needed)
+ //   a = F(r)/m
+ //   v += a*dt/2
+ // On entry a must contain the accelerations at r, as on return. The Verlet list
+ // is rebuilt with vl.build() whenever an atom has moved more than skin/2 since
+ // the last build. The forces of the last step are computed with compute_all,
+ // and the interaction energy is returned, and the virial tensor stored in
+ // virial. If lower and upper are nullptr, there are no periodic boundaries.
+ // Otherwise, the periodic image counters image are updated, unless nullptr.
+    template<typename FloatType, typename VLType, typename Potential>
+    FloatType
+    velocity_verlet
+      ( FloatType       * r         // atom positions, shape (n,3)
+      , FloatType       * v         // atom velocities, shape (n,3)
+      , FloatType       * a         // atom accelerations, shape (n,3)
+      , std::size_t       n         // number of atoms
+      , FloatType const * m         // atom masses, shape (n,) or (1,)
+      , std::size_t       nm        // number of atom masses
+      , VLType          & vl        // Verlet list
+      , Potential const & potential
+      , double            dt        // time step
+      , std::size_t       nsteps    // number of time steps
+      , double    const * lower     // lower corner of the periodic box, or nullptr
+      , double    const * upper     // upper corner of the periodic box, or nullptr
+      , std::int32_t    * image     // periodic image counters, shape (n,3), or nullptr
+      , FloatType       * virial    // virial tensor, shape (3,3), overwritten
+      , std::size_t     & nrebuilds // incremented for every rebuild of the Verlet list
+      , std::int32_t const * types = nullptr // atom types, shape (n,)
+      )
+    {
+        FloatType const half_dt = dt/2;
+        long const n3 = 3*n;
+        FloatType epot = 0;
+        for( std::size_t step=0; step<nsteps; ++step )
+        {
+            #pragma omp parallel for schedule(static)
+            for( long k=0; k<n3; ++k ) {
+                v[k] += half_dt*a[k];
+                r[k] += dt*v[k];
+            }
+            if( lower && upper )
+                wrap( r, n, lower, upper, image );
+            if( vl.needs_rebuild( r, n ) ) {
+                vl.build( r, n );
+                ++nrebuilds;
+            }
+            #pragma omp parallel for schedule(static)
+            for( long k=0; k<n3; ++k )
+                a[k] = 0;
+            if( step + 1 == nsteps )
+                epot = interactions::compute_all( r, a, vl, potential, virial, types );
+            else
+                interactions::compute_forces( r, a, vl, potential, types );
+            interactions::divide_by_mass( a, n, m, nm );
+            #pragma omp parallel for schedule(static)
+            for( long k=0; k<n3; ++k )
+                v[k] += half_dt*a[k];
+        }
+        return epot;
+    }
+}// namespace integrators
+
+#endif // INTEGRATORS_HPP
@@ -8,8 +8,10 @@ A submodule for computing the interactions (forces, interaction energy) from a V
 
 """
 
+import numpy as np
+
 import et_md2.verletlist
-import et_md2.verletlist.c_vl
+import et_md2.potentials
 
 # impl = None
 
@@ -35,54 +37,132 @@ import et_md2.verletlist.c_vl
 
 
 def compute_forces(atoms, vl, ff=None):
-    """
+    """Compute the accelerations of the atoms.
+
+    For the Python Verlet list the forces are computed with array arithmetic,
+    see :py:func:`et_md2.verletlist.compute_forces`.
 
-    :param atoms:
-    :param vl:
-    :param ff_functor: force factor functor
-    :return:
+    :param atoms: Atoms object
+    :param vl: Verlet list object
+    :param ff: force factor function, accepting a numpy array of squared distances,
+        or a potential object, see :py:func:`compute_all`. The C++ implementation
+        only accepts potential objects. If None, the reduced Lennard-Jones potential
+        is used. Potentials for mixtures of atom types are passed the atom types
+        atoms.type.
+    :raises TypeError: if the Verlet list is a C++ Verlet list and ff a function.
     """
-    r = atoms.r
-    a = atoms.a
+    types = atoms.type if hasattr(ff, 'ntypes') else None
     if isinstance(vl, et_md2.verletlist.VL):
-        for i in range(vl.natoms):
-            o = vl.vl_offset[i]
-            n = vl.vl_size[i]
-            ri = r[i,:]
-            ai = a[i,:]
-            for k in range(o,o+n):
-                j = vl.vl_list[k]
-                rij = r[j,:] - ri
-                rij2 = np.dot(rij,rij)
-                rij *= ff(rij2)
-                ai     += rij
-                a[j,:] -= rij
-
+        if ff is None:
+            ff = et_md2.potentials.LJ_py()
+        et_md2.verletlist.compute_forces(vl, atoms.r, atoms.a, getattr(ff, 'force_factor', ff), types)
+        # F = ma, a currently contains the forces, so we must divide by m to obtain the accelerations
         if atoms.m.shape[0] == 1:
-            for i in range(atoms.n):
-                a[i,:] /= atoms.m[0]
-
+            atoms.a /= atoms.m[0]
         elif atoms.m.shape[0] == atoms.n:
-            for i in range(atoms.n):
-                a[i,:] /= atoms.m[i]
+            atoms.a /= atoms.m[:, np.newaxis]
 
-    elif isinstance(vl, et_md2.verletlist.c_vl.VL):
-        cpp.compute_forces(atoms.r, atoms.a, atoms.m, vl)
+    else:
+        import et_md2.interactions.cpp as cpp
+        args = (atoms.r, atoms.a, atoms.m, vl) + _cpp_potential(ff)
+        if types is not None:
+            args += (types,)
+        if atoms.r.dtype == np.float32:
+            cpp.compute_forces_sp(*args)
+        else:
+            cpp.compute_forces_dp(*args)
 
 
 def compute_interactions(atoms, vl, potential=None):
-    r = atoms.r
-    epot = 0.0
+    """Compute the interaction energy of the atoms.
+
+    For the Python Verlet list the energy is computed with array arithmetic,
+    see :py:func:`et_md2.verletlist.compute_energy`.
+
+    :param atoms: Atoms object
+    :param vl: Verlet list object
+    :param potential: potential function, accepting a numpy array of squared distances,
+        or a potential object, see :py:func:`compute_all`. The C++ implementation
+        only accepts potential objects. If None, the reduced Lennard-Jones potential
+        is used. Potentials for mixtures of atom types are passed the atom types
+        atoms.type.
+    :return: interaction energy, epot.
+    :raises TypeError: if the Verlet list is a C++ Verlet list and potential a function.
+    """
+    types = atoms.type if hasattr(potential, 'ntypes') else None
+    if isinstance(vl, et_md2.verletlist.VL):
+        if potential is None:
+            potential = et_md2.potentials.LJ_py()
+        epot = et_md2.verletlist.compute_energy(vl, atoms.r, getattr(potential, 'interaction_energy', potential), types)
+    else:
+        import et_md2.interactions.cpp as cpp
+        args = (atoms.r, vl) + _cpp_potential(potential)
+        if types is not None:
+            args += (types,)
+        if atoms.r.dtype == np.float32:
+            epot = cpp.compute_interactions_sp(*args)
+        else:
+            epot = cpp.compute_interactions_dp(*args)
+
+    return epot
+
+
+def _cpp_potential(potential):
+    """Return the potential argument of the C++ kernels, as a tuple: empty for
+    the reduced Lennard-Jones potential (potential is None), otherwise the
+    potential converted with :py:func:`et_md2.potentials.to_cpp`.
+
+    :raises TypeError: if potential is a function, rather than a potential object.
+    """
+    if potential is None:
+        return ()
+    if not (hasattr(potential, 'force_factor') or hasattr(potential, 'to_cpp')):
+        raise TypeError("The C++ kernels cannot evaluate a Python function, expecting a potential object.")
+    return (et_md2.potentials.to_cpp(potential),)
+
+
+def compute_all(atoms, vl, potential=None):
+    """Compute the accelerations, the interaction energy and the virial tensor
+    of the atoms, in a single traversal of the Verlet list.
+
+    The virial tensor is W = sum_pairs (r_i - r_j) x F_ij, with F_ij the force
+    on atom i exerted by atom j. The pressure is p = (2*Ekin + tr W)/(3V).
+
+    :param atoms: Atoms object
+    :param vl: Verlet list object
+    :param potential: Potential object with force_factor(rij2) and interaction_energy(rij2)
+        methods, accepting numpy arrays, e.g. :py:class:`et_md2.potentials.LJ_py`,
+        or one of the C++ potentials of :py:mod:`et_md2.potentials.cpp`. The C++
+        implementation only accepts the latter, and Python potentials with a to_cpp()
+        method (:py:class:`et_md2.potentials.TabulatedPotential`), which are converted
+        with :py:func:`et_md2.potentials.to_cpp`. If None, it uses the reduced
+        Lennard-Jones potential. Potentials for mixtures of atom types, which have
+        an ``ntypes`` attribute (:py:class:`et_md2.potentials.PairLJ_py` and
+        :py:class:`et_md2.potentials.cpp.PairLJ`), are passed the atom types atoms.type.
+    :return: tuple (a, epot, virial), with a the accelerations (atoms.a).
+    """
+    types = atoms.type if hasattr(potential, 'ntypes') else None
     if isinstance(vl, et_md2.verletlist.VL):
-        for i in range(vl.natoms):
-            o = vl.vl_offset[i]
-            n = vl.vl_size[i]
-            for k in range(o,o+n):
-                j = vl.vl_list[k]
-                rij = r[j,:] - r[i,:]
-                rij2 = np.dot(rij,rij)
-                epot += potential(rij2)
-    elif isinstance(vl, et_md2.verletlist.c_vl.VL):
-        epot = cpp.compute_interactions(atoms.r, vl)
-
-    return epot
\ No newline at end of file
+        if potential is None:
+            potential = et_md2.potentials.LJ_py()
+        epot, virial = et_md2.verletlist.compute_all(vl, atoms.r, atoms.a
+                                                    , potential.force_factor
+                                                    , potential.interaction_energy
+                                                    , types
+                                                    )
+        # F = ma, a currently contains the forces, so we must divide by m to obtain the accelerations
+        if atoms.m.shape[0] == 1:
+            atoms.a /= atoms.m[0]
+        elif atoms.m.shape[0] == atoms.n:
+            atoms.a /= atoms.m[:, np.newaxis]
+        return atoms.a, epot, virial
+
+    else:
+        import et_md2.interactions.cpp as cpp
+        args = (atoms.r, atoms.a, atoms.m, vl) + _cpp_potential(potential)
+        if types is not None:
+            args += (types,)
+        if atoms.r.dtype == np.float32:
+            return cpp.compute_all_sp(*args)
+        else:
+            return cpp.compute_all_dp(*args)
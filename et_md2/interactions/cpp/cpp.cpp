@@ -10,100 +10,221 @@
 
 namespace py = pybind11;
 
+#include <string>
+#include <cstdint>
+#include <stdexcept>
+
 #include "vl.hpp"
 #include "ArrayInfo.hpp"
+#include "interactions.hpp"
+
+// The potential used if no potential is passed: the reduced Lennard-Jones
+// potential V(r) = 1/r**12 - 1/r**6.
+potentials::LJ const reduced_lj(0.25, 1.0);
+
 
+// Return the ArrayInfo of the positions r, after verifying that they have
+// shape (n,3), with n the number of atoms of the Verlet list.
+template<typename FloatType, typename VLType>
+ArrayInfo<FloatType,2>
+check_positions( carray_t<FloatType> r, VLType const & vl )
+{
+    ArrayInfo<FloatType,2> ar = positions_info(r);
+    if( ar.shape(0) != vl.natoms() )
+        throw std::runtime_error("Expecting the positions of all atoms of the Verlet list.");
+    return ar;
+}
 
-template<typename FloatType, typename Potential>
+// Verify that the accelerations have the same shape as the positions r, and
+// that there is a mass for each atom, or a single mass for all atoms.
+template<typename FloatType>
+void
+check_accelerations_masses
+  ( ArrayInfo<FloatType,2> & ar
+  , ArrayInfo<FloatType,2> & aa
+  , ArrayInfo<FloatType,1> const & am
+  )
+{
+    ar.assert_identical_shape(aa);
+    if( am.shape(0) != ar.shape(0) && am.shape(0) != 1 )
+        throw std::runtime_error("Expecting a mass for each atom, or a single mass.");
+}
+
+// The accelerations a are updated in place, the positions r and masses m are
+// converted to C-contiguous arrays if necessary.
+template<typename FloatType, typename VLType, typename Potential>
 void
 compute_forces
-  ( py::array_t<FloatType> r
-  , py::array_t<FloatType> a
-  , py::array_t<FloatType> m
-  , VL const & vl
+  ( carray_t<FloatType> r
+  , py::object a
+  , carray_t<FloatType> m
+  , VLType const & vl
+  , Potential const & potential
   )
 {
-    ArrayInfo<FloatType,2> ar(r);
-    ArrayInfo<FloatType,2> aa(a);
+    ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+    ArrayInfo<FloatType,2> aa = inplace_info<FloatType,2>(a, "a");
     ArrayInfo<FloatType,1> am(m);
-    std::size_t const n = ar.shape(0);
-    FloatType const * ri;
-    FloatType const * rj;
-    FloatType rij[3];
-    for (std::size_t i=0; i<n; ++i)
-    {
-        ri = &ar[3*i];
-        std::size_t const nn = vl.ncontacts(i);
-        for (std::size_t ic=0; ic<nn; ++ic)
-        {
-            std::size_t const j = vl.contact(i,ic);
-            rj = &ar[3*j];
-            FloatType rij2 = 0;
-            for (std::size_t d=0; d<3; ++d) {
-                rij[d] = rj[d] - ri[d];
-                rij2 += rij[d]*rij[d];
-            }
-            FloatType ff = force_factor(rij2);
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] += ff*rij[d];
-                aa[3*j+d] -= ff*rij[d];
-            }
-        }
-    }
+    check_accelerations_masses(ar, aa, am);
+    interactions::compute_forces( ar.cdata(), aa.data(), vl, potential );
  // convert forces to acceleration
-    if (m.shape(0) == 1) {
-        for (std::size_t i=0; i<n; ++i) {
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] /= am[0];
-            }
-        }
-    } else if (m.shape(0) == n) {
-        for (std::size_t i=0; i<n; ++i) {
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] /= am[i];
-            }
-        }
-    }
+    interactions::divide_by_mass( aa.data(), ar.shape(0), am.cdata(), am.shape(0) );
 }
 
-template <typename FloatType>
+template <typename FloatType, typename VLType, typename Potential>
 FloatType
 compute_interactions
-  ( py::array_t<FloatType> r
-  , VL const & vl
+  ( carray_t<FloatType> r
+  , VLType const & vl
+  , Potential const & potential
+  )
+{
+    ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+    return interactions::compute_energy( ar.cdata(), vl, potential );
+}
+
+// Compute the accelerations, the interaction energy and the virial tensor in
+// a single traversal of the Verlet list. Return the tuple (a, epot, virial).
+template<typename FloatType, typename VLType, typename Potential>
+py::tuple
+compute_all
+  ( carray_t<FloatType> r
+  , py::object a
+  , carray_t<FloatType> m
+  , VLType const & vl
+  , Potential const & potential
   )
 {
-    ArrayInfo<FloatType,2> ar(r);
-    std::size_t const n = ar.shape(0);
-    FloatType const * ri;
-    FloatType const * rj;
-    FloatType epot = 0;
-    for (std::size_t i=0; i<n; ++i)
-    {
-        ri = &ar[3*i];
-        std::size_t const nn = vl.ncontacts(i);
-        for (std::size_t ic=0; ic<nn; ++ic)
-        {
-            std::size_t const j = vl.contact(i,ic);
-            rj = &ar[3*j];
-            FloatType rij2 = 0;
-            for (std::size_t d=0; d<3; ++d) {
-                rij2 += (rj[d] - ri[d])*(rj[d] - ri[d]);
-            }
-            epot += potential(rij2);
-//            std::cout<<"rij2="<<rij2<<" epot="<<epot<<std::endl;
-        }
-    }
-    return epot;
+    ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+    ArrayInfo<FloatType,2> aa = inplace_info<FloatType,2>(a, "a");
+    ArrayInfo<FloatType,1> am(m);
+    check_accelerations_masses(ar, aa, am);
+    py::array_t<FloatType> virial({3,3});
+    ArrayInfo<FloatType,2> avirial(virial);
+    FloatType epot = interactions::compute_all( ar.cdata(), aa.data(), vl, potential, avirial.data() );
+ // convert forces to acceleration
+    interactions::divide_by_mass( aa.data(), ar.shape(0), am.cdata(), am.shape(0) );
+    return py::make_tuple( a, epot, virial );
+}
+
+// Return a pointer to the atom types, after verifying that there is a type for
+// each of the n atoms, and that the types are valid for the potential.
+template<typename Potential>
+std::int32_t const *
+check_types
+  ( carray_t<std::int32_t> types
+  , std::size_t n
+  , Potential const & potential
+  )
+{
+    ArrayInfo<std::int32_t,1> atypes(types);
+    if( atypes.shape(0) != n )
+        throw std::runtime_error("Expecting an atom type for each atom.");
+    std::int32_t const * t = atypes.cdata();
+    std::int32_t const ntypes = potential.ntypes();
+    for( std::size_t i=0; i<n; ++i )
+        if( t[i] < 0 || t[i] >= ntypes )
+            throw std::out_of_range("Atom type out of range.");
+    return t;
+}
+
+// Expose the kernels for one floating point type, Verlet list type and
+// potential type, as overloads of compute_forces<suffix>, ...
+template<typename FloatType, typename VLType, typename Potential>
+void
+declare_kernels( py::module& m, std::string const& suffix )
+{
+    m.def(("compute_forces"       + suffix).c_str(), &compute_forces      <FloatType,VLType,Potential>);
+    m.def(("compute_interactions" + suffix).c_str(), &compute_interactions<FloatType,VLType,Potential>);
+    m.def(("compute_all"          + suffix).c_str(), &compute_all         <FloatType,VLType,Potential>);
+}
+
+// Idem, for a potential for mixtures of atom types, which takes the atom
+// types as an extra argument.
+template<typename FloatType, typename VLType, typename Potential>
+void
+declare_typed_kernels( py::module& m, std::string const& suffix )
+{
+    m.def(("compute_forces" + suffix).c_str()
+         , []( carray_t<FloatType> r, py::object a, carray_t<FloatType> m
+             , VLType const & vl, Potential const & potential, carray_t<std::int32_t> types )
+           {
+               ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+               ArrayInfo<FloatType,2> aa = inplace_info<FloatType,2>(a, "a");
+               ArrayInfo<FloatType,1> am(m);
+               check_accelerations_masses(ar, aa, am);
+               std::int32_t const * t = check_types( types, ar.shape(0), potential );
+               interactions::compute_forces( ar.cdata(), aa.data(), vl, potential, t );
+               interactions::divide_by_mass( aa.data(), ar.shape(0), am.cdata(), am.shape(0) );
+           }
+         );
+    m.def(("compute_interactions" + suffix).c_str()
+         , []( carray_t<FloatType> r, VLType const & vl, Potential const & potential, carray_t<std::int32_t> types )
+           {
+               ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+               std::int32_t const * t = check_types( types, ar.shape(0), potential );
+               return interactions::compute_energy( ar.cdata(), vl, potential, t );
+           }
+         );
+    m.def(("compute_all" + suffix).c_str()
+         , []( carray_t<FloatType> r, py::object a, carray_t<FloatType> m
+             , VLType const & vl, Potential const & potential, carray_t<std::int32_t> types )
+           {
+               ArrayInfo<FloatType,2> ar = check_positions(r, vl);
+               ArrayInfo<FloatType,2> aa = inplace_info<FloatType,2>(a, "a");
+               ArrayInfo<FloatType,1> am(m);
+               check_accelerations_masses(ar, aa, am);
+               std::int32_t const * t = check_types( types, ar.shape(0), potential );
+               py::array_t<FloatType> virial({3,3});
+               ArrayInfo<FloatType,2> avirial(virial);
+               FloatType epot = interactions::compute_all( ar.cdata(), aa.data(), vl, potential, avirial.data(), t );
+               interactions::divide_by_mass( aa.data(), ar.shape(0), am.cdata(), am.shape(0) );
+               return py::make_tuple( a, epot, virial );
+           }
+         );
+}
+
+// Idem, for all potential types, and without potential (reduced Lennard-Jones potential).
+template<typename FloatType, typename VLType>
+void
+declare_kernels( py::module& m, std::string const& suffix )
+{
+    declare_kernels<FloatType, VLType, potentials::LJ        >(m, suffix);
+    declare_kernels<FloatType, VLType, potentials::Morse     >(m, suffix);
+    declare_kernels<FloatType, VLType, potentials::WCA       >(m, suffix);
+    declare_kernels<FloatType, VLType, potentials::SoftSphere>(m, suffix);
+    declare_kernels<FloatType, VLType, potentials::Tabulated >(m, suffix);
+    declare_typed_kernels<FloatType, VLType, potentials::PairLJ>(m, suffix);
+
+    m.def(("compute_forces" + suffix).c_str()
+         , []( carray_t<FloatType> r, py::object a, carray_t<FloatType> m, VLType const & vl )
+           {
+               compute_forces( r, a, m, vl, reduced_lj );
+           }
+         );
+    m.def(("compute_interactions" + suffix).c_str()
+         , []( carray_t<FloatType> r, VLType const & vl )
+           {
+               return compute_interactions( r, vl, reduced_lj );
+           }
+         );
+    m.def(("compute_all" + suffix).c_str()
+         , []( carray_t<FloatType> r, py::object a, carray_t<FloatType> m, VLType const & vl )
+           {
+               return compute_all( r, a, m, vl, reduced_lj );
+           }
+         );
 }
 
 
 PYBIND11_MODULE(cpp, m)
 {// optional module doc-string
     m.doc() = "C++ implementation of et_md2.interactions"; // optional module docstring
+ // The potential classes are exposed by et_md2.potentials.cpp.
+    py::module::import("et_md2.potentials.cpp");
  // list the functions you want to expose:
-    m.def("compute_forces_sp"      , &compute_forces<float>);
-    m.def("compute_interactions_sp", &compute_interactions<float>);
-    m.def("compute_forces_dp"      , &compute_forces<double>);
-    m.def("compute_interactions_dp", &compute_interactions<double>);
+    declare_kernels<float ,VL  >(m, "_sp");
+    declare_kernels<float ,VL64>(m, "_sp");
+    declare_kernels<double,VL  >(m, "_dp");
+    declare_kernels<double,VL64>(m, "_dp");
 }
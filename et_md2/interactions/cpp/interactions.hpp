@@ -0,0 +1,287 @@
+/*
+ *  C++ header file with the interaction kernels of module et_md2.interactions.cpp
+ *
+ *  The kernels work on raw arrays and a linearised Verlet list, and do not
+ *  depend on pybind11. They are templates in the potential, which must have
+ *  the methods energy(rij2) and force_factor(rij2), see potentials.hpp.
+ *  Potentials for mixtures of atom types also need the atom types, which are
+ *  passed as the last argument types (nullptr for other potentials).
+ */
+
+#ifndef INTERACTIONS_HPP
+#define INTERACTIONS_HPP
+
+#include <cstddef>
+#include <cstdint>
+#include <stdexcept>
+#include <vector>
+#include <algorithm>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+#include "potentials.hpp"
+
+namespace interactions
+{//-----------------------------------------------------------------------------
+ // Call f(i, j, rij, rij2) for all pairs (i,j) in the linearised Verlet list vl
+ // with i0 <= i < i1, which are within the cutoff distance vl.cutoff().
+ // rij = r_j - r_i, and rij2 is its square. Pairs in the skin are skipped.
+ // If the Verlet list has a periodic box, rij is the minimum image.
+    template<typename FloatType, typename VLType, typename PairFunction>
+    void
+    for_each_pair
+      ( FloatType const * r  // atom positions, shape (n,3)
+      , VLType    const & vl // linearised Verlet list
+      , std::size_t       i0 // first atom
+      , std::size_t       i1 // last atom + 1
+      , PairFunction      f
+      )
+    {
+     // read the linearised Verlet list directly
+        typename VLType::index_type  const * vl_list   = vl.vl_list  ().data();
+        typename VLType::offset_type const * vl_offset = vl.vl_offset().data();
+        typename VLType::index_type  const * vl_size   = vl.vl_size  ().data();
+        FloatType const rc2 = vl.cutoff()*vl.cutoff();
+        bool const periodic = vl.periodic();
+        FloatType rij[3];
+        for( std::size_t i=i0; i<i1; ++i )
+        {
+            FloatType const * ri = r + 3*i;
+            typename VLType::index_type const * vli = vl_list + vl_offset[i];
+            std::size_t const nn = vl_size[i];
+            for( std::size_t ic=0; ic<nn; ++ic )
+            {
+                std::size_t const j = vli[ic];
+                FloatType const * rj = r + 3*j;
+                for( std::size_t d=0; d<3; ++d )
+                    rij[d] = rj[d] - ri[d];
+                if( periodic )
+                    vl.minimum_image(rij);
+                FloatType const rij2 = rij[0]*rij[0] + rij[1]*rij[1] + rij[2]*rij[2];
+                if( rij2 > rc2 )
+                    continue; // pair is in the skin
+                f( i, j, rij, rij2 );
+            }
+        }
+    }
+
+ //-----------------------------------------------------------------------------
+ // Split the atoms of the linearised Verlet list vl in nparts contiguous ranges
+ // [bounds[k], bounds[k+1][ with approximately the same number of pairs.
+    template<typename VLType>
+    std::vector<std::size_t>
+    partition_by_pairs
+      ( VLType const & vl
+      , std::size_t    nparts
+      )
+    {
+        auto const & vl_offset = vl.vl_offset();
+        std::size_t const n = vl_offset.size();
+        std::size_t const npairs = vl.vl_list().size();
+        std::vector<std::size_t> bounds(nparts + 1, n);
+        bounds[0] = 0;
+        for( std::size_t k=1; k<nparts; ++k ) {
+            typename VLType::offset_type const target = npairs*k/nparts;
+            bounds[k] = std::lower_bound( vl_offset.begin(), vl_offset.end(), target ) - vl_offset.begin();
+        }
+        return bounds;
+    }
+
+ //-----------------------------------------------------------------------------
+ // Run kernel(i0, i1, at) in parallel for ranges of atoms [i0,i1[ with
+ // approximately the same number of pairs, one range per OpenMP thread. The
+ // kernel adds the forces of its pairs to at. For a half Verlet list, each
+ // thread but the first has a private force buffer to avoid write conflicts,
+ // and the buffers are added to a afterwards. For a full Verlet list the kernel
+ // only writes the forces of the atoms in its own range, hence at is a for all
+ // threads. If a is nullptr, no forces are computed, at is nullptr and no
+ // buffers are allocated.
+    template<typename FloatType, typename VLType, typename RangeKernel>
+    void
+    parallel_ranges
+      ( FloatType       * a  // atom forces, shape (n,3), or nullptr
+      , VLType    const & vl // linearised Verlet list
+      , RangeKernel       kernel
+      )
+    {
+        if( !vl.linearised() )
+            throw std::runtime_error("The Verlet list must be linearised.");
+        std::size_t const n3 = 3*vl.vl_size().size();
+        bool const use_buffers = ( a && !vl.full() );
+        std::vector<std::size_t> bounds;
+        std::vector<FloatType> buffers;
+        #pragma omp parallel
+        {
+            std::size_t ithread = 0;
+            std::size_t nthreads = 1;
+          #ifdef _OPENMP
+            ithread  = omp_get_thread_num();
+            nthreads = omp_get_num_threads();
+          #endif
+            #pragma omp single
+            {
+                bounds = partition_by_pairs( vl, nthreads );
+                if( use_buffers )
+                    buffers.assign( (nthreads - 1)*n3, 0 );
+            }// implicit barrier
+            FloatType * at = ( ithread == 0 || !use_buffers ? a : buffers.data() + (ithread - 1)*n3 );
+            kernel( bounds[ithread], bounds[ithread+1], at );
+            if( use_buffers && nthreads > 1 ) {
+             // reduce the force buffers
+                #pragma omp barrier
+                #pragma omp for schedule(static)
+                for( long k=0; k<(long)n3; ++k ) {
+                    for( std::size_t t=1; t<nthreads; ++t )
+                        a[k] += buffers[(t - 1)*n3 + k];
+                }
+            }
+        }
+    }
+
+ //-----------------------------------------------------------------------------
+ // Add the interaction forces to a. The pairs are processed in parallel. For
+ // a half Verlet list the force of pair (i,j) is added to atoms i and j, for a
+ // full Verlet list only to atom i.
+    template<typename FloatType, typename VLType, typename Potential>
+    void
+    compute_forces
+      ( FloatType const * r         // atom positions, shape (n,3)
+      , FloatType       * a         // atom forces, shape (n,3)
+      , VLType    const & vl        // linearised Verlet list
+      , Potential const & potential
+      , std::int32_t const * types = nullptr // atom types, shape (n,)
+      )
+    {
+        bool const full = vl.full();
+        parallel_ranges( a, vl
+                       , [=, &vl, &potential]( std::size_t i0, std::size_t i1, FloatType * at )
+                         {
+                             for_each_pair( r, vl, i0, i1
+                                          , [=, &potential]( std::size_t i, std::size_t j, FloatType const * rij, FloatType rij2 )
+                                            {
+                                                FloatType const ff = potentials::pair_force_factor( potential, rij2, types, i, j );
+                                                for( std::size_t d=0; d<3; ++d ) {
+                                                    at[3*i+d] += ff*rij[d];
+                                                    if( !full ) // Newton's third law
+                                                        at[3*j+d] -= ff*rij[d];
+                                                }
+                                            }
+                                          );
+                         }
+                       );
+    }
+
+ //-----------------------------------------------------------------------------
+ // Return the interaction energy.
+    template<typename FloatType, typename VLType, typename Potential>
+    FloatType
+    compute_energy
+      ( FloatType const * r         // atom positions, shape (n,3)
+      , VLType    const & vl        // linearised Verlet list
+      , Potential const & potential
+      , std::int32_t const * types = nullptr // atom types, shape (n,)
+      )
+    {
+        FloatType epot = 0;
+        parallel_ranges( (FloatType*)nullptr, vl
+                       , [&]( std::size_t i0, std::size_t i1, FloatType * )
+                         {
+                             FloatType epot_t = 0;
+                             for_each_pair( r, vl, i0, i1
+                                          , [&]( std::size_t i, std::size_t j, FloatType const *, FloatType rij2 )
+                                            {
+                                                epot_t += potentials::pair_energy( potential, rij2, types, i, j );
+                                            }
+                                          );
+                             #pragma omp critical
+                             epot += epot_t;
+                         }
+                       );
+     // a full Verlet list has every pair twice
+        return ( vl.full() ? epot/2 : epot );
+    }
+
+ //-----------------------------------------------------------------------------
+ // Add the interaction forces to a, and return the interaction energy and the
+ // virial tensor, in a single traversal of the Verlet list. The virial tensor
+ // is W = sum_pairs (r_i - r_j) x F_ij, with F_ij the force on i exerted by j.
+ // Its trace is the virial in the pressure p = (2*Ekin + tr W)/(3V).
+    template<typename FloatType, typename VLType, typename Potential>
+    FloatType
+    compute_all
+      ( FloatType const * r         // atom positions, shape (n,3)
+      , FloatType       * a         // atom forces, shape (n,3)
+      , VLType    const & vl        // linearised Verlet list
+      , Potential const & potential
+      , FloatType       * virial    // virial tensor, shape (3,3), overwritten
+      , std::int32_t const * types = nullptr // atom types, shape (n,)
+      )
+    {
+        FloatType epot = 0;
+        for( std::size_t k=0; k<9; ++k )
+            virial[k] = 0;
+        bool const full = vl.full();
+        parallel_ranges( a, vl
+                       , [&]( std::size_t i0, std::size_t i1, FloatType * at )
+                         {
+                             FloatType epot_t = 0;
+                             FloatType virial_t[9] = {0};
+                             for_each_pair( r, vl, i0, i1
+                                          , [&]( std::size_t i, std::size_t j, FloatType const * rij, FloatType rij2 )
+                                            {
+                                                epot_t += potentials::pair_energy( potential, rij2, types, i, j );
+                                                FloatType const ff = potentials::pair_force_factor( potential, rij2, types, i, j );
+                                                for( std::size_t d=0; d<3; ++d ) {
+                                                    FloatType const fd = ff*rij[d];
+                                                    at[3*i+d] += fd;
+                                                    if( !full ) // Newton's third law
+                                                        at[3*j+d] -= fd;
+                                                 // r_i - r_j = -rij
+                                                    for( std::size_t e=0; e<3; ++e )
+                                                        virial_t[3*e+d] -= rij[e]*fd;
+                                                }
+                                            }
+                                          );
+                             #pragma omp critical
+                             {
+                                 epot += epot_t;
+                                 for( std::size_t k=0; k<9; ++k )
+                                     virial[k] += virial_t[k];
+                             }
+                         }
+                       );
+     // a full Verlet list has every pair twice
+        if( full ) {
+            for( std::size_t k=0; k<9; ++k )
+                virial[k] /= 2;
+            epot /= 2;
+        }
+        return epot;
+    }
+
+ //-----------------------------------------------------------------------------
+ // Convert forces to accelerations. m has either one element (all atoms have
+ // the same mass), or n elements. Otherwise a is left untouched.
+    template<typename FloatType>
+    void
+    divide_by_mass
+      ( FloatType       * a  // atom forces, shape (n,3)
+      , std::size_t       n  // number of atoms
+      , FloatType const * m  // atom masses
+      , std::size_t       nm // number of atom masses
+      )
+    {
+        if( nm == 1 ) {
+            for( std::size_t i=0; i<n; ++i )
+                for( std::size_t d=0; d<3; ++d )
+                    a[3*i+d] /= m[0];
+        } else if( nm == n ) {
+            for( std::size_t i=0; i<n; ++i )
+                for( std::size_t d=0; d<3; ++d )
+                    a[3*i+d] /= m[i];
+        }
+    }
+}// namespace interactions
+
+#endif // INTERACTIONS_HPP
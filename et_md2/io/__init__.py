@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module et_md2.io
+================
+
+A submodule for saving and loading the state of a simulation.
+
+Checkpoint files have a simple binary format:
+
+*   the magic bytes ``b'ETMD2CHK'``,
+*   the length of the header, as a little endian 64-bit unsigned integer,
+*   a JSON header, with the kind of object (``'Atoms'`` or ``'VL'``), its
+    attributes, and for every array section its dtype, shape and offset in
+    the file,
+*   the array sections, raw and C-contiguous, each aligned on ``ALIGNMENT``
+    bytes.
+
+Hence, the arrays can be memory-mapped with ``np.memmap`` when loading, which
+is zero-copy: the data is only read from disk when it is accessed.
+
+Trajectory files start with the magic bytes ``b'ETMD2TRJ'`` and a JSON header,
+like checkpoint files, followed by the frames. All frames have the same size:
+the time step, as a 64-bit integer, followed by the positions and, optionally,
+the velocities of the atoms. They are written by :py:class:`TrajectoryWriter`
+and read by :py:class:`TrajectoryReader`.
+
+Compressed trajectory files, written by :py:class:`CompressedTrajectoryWriter`
+and read by :py:class:`CompressedTrajectoryReader`, store lossy compressed
+positions only. The frames have a variable size.
+
+"""
+import json
+import queue
+import threading
+import warnings
+
+import numpy as np
+
+MAGIC = b'ETMD2CHK'
+TRAJECTORY_MAGIC = b'ETMD2TRJ'
+COMPRESSED_TRAJECTORY_MAGIC = b'ETMD2TRZ'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+    """Return the first multiple of ALIGNMENT >= offset."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _write_header(f, magic, header):
+    """Write the magic bytes, the length of the JSON header and the header.
+
+    :return: the offset of the data after the header, aligned.
+    """
+    header = json.dumps(header).encode('utf-8')
+    f.write(magic)
+    f.write(np.uint64(len(header)).astype('<u8').tobytes())
+    f.write(header)
+    start = _aligned(len(magic) + 8 + len(header))
+    f.write(bytes(start - f.tell()))
+    return start
+
+
+def _read_header(f, magic, path):
+    """Read the header written by _write_header().
+
+    :return: tuple (header, start), with start the offset of the data after the header.
+    :raises ValueError: if the file does not start with magic, or has an unsupported version.
+    """
+    if f.read(len(magic)) != magic:
+        raise ValueError(f"Not an et_md2 {'checkpoint' if magic == MAGIC else 'trajectory'} file: `{path}`.")
+    length = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+    header = json.loads(f.read(length).decode('utf-8'))
+    if header['version'] > VERSION:
+        raise ValueError(f"Unsupported file version {header['version']}: `{path}`.")
+    return header, _aligned(len(magic) + 8 + length)
+
+
+def write_sections(path, kind, attrs, arrays):
+    """Write a checkpoint file.
+
+    :param path: file name.
+    :param str kind: kind of object.
+    :param dict attrs: attributes of the object, must be JSON serializable.
+    :param dict arrays: the array sections, name -> numpy array.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = {'kind': kind, 'version': VERSION, 'attrs': attrs, 'sections': sections}
+    with open(path, 'wb') as f:
+        start = _write_header(f, MAGIC, header)
+        for name, array in arrays.items():
+            f.seek(start + sections[name]['offset'])
+            array.tofile(f)
+        # make sure the file extends to the end of the last (aligned) section
+        f.truncate(start + offset)
+
+
+def read_sections(path, kind=None, mmap_mode='c'):
+    """Read a checkpoint file.
+
+    :param path: file name.
+    :param str kind: expected kind of object, not verified if None.
+    :param str mmap_mode: mode of ``np.memmap``: 'c' (copy-on-write, the default,
+        the arrays can be modified, but the changes are not written to the file),
+        'r' (read-only) or 'r+' (the changes are written to the file). If None,
+        the arrays are read into memory.
+    :return: tuple (kind, attrs, arrays), with arrays a dict name -> numpy array.
+    :raises ValueError: if the file is not a checkpoint file, or not of the expected kind.
+    """
+    with open(path, 'rb') as f:
+        header, start = _read_header(f, MAGIC, path)
+        if kind is not None and header['kind'] != kind:
+            raise ValueError(f"Expecting a checkpoint file of {kind}, got {header['kind']}: `{path}`.")
+
+        arrays = {}
+        for name, section in header['sections'].items():
+            dtype = np.dtype(section['dtype'])
+            shape = tuple(section['shape'])
+            offset = start + section['offset']
+            if mmap_mode is None or 0 in shape:
+                # np.memmap cannot map empty arrays
+                f.seek(offset)
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape)
+    return header['kind'], header['attrs'], arrays
+
+
+def save_atoms(atoms, path):
+    """Save the atoms to a checkpoint file.
+
+    The sections are the atom arrays r, v, a, m, type and image. The box
+    corners are stored in the header.
+
+    :param atoms: Atoms object.
+    :param path: file name.
+    """
+    attrs = {'lower_corner': None if atoms.lower_corner is None else np.asarray(atoms.lower_corner, dtype=float).tolist(),
+             'upper_corner': None if atoms.upper_corner is None else np.asarray(atoms.upper_corner, dtype=float).tolist(),
+             }
+    arrays = {'r': atoms.r, 'v': atoms.v, 'a': atoms.a, 'm': atoms.m, 'type': atoms.type, 'image': atoms.image}
+    write_sections(path, 'Atoms', attrs, arrays)
+
+
+def load_atoms(path, mmap_mode='c'):
+    """Load atoms from a checkpoint file.
+
+    With memory-mapping, the atom arrays cannot be resized.
+
+    :param path: file name.
+    :param str mmap_mode: see :py:func:`read_sections`.
+    :return: Atoms object.
+    """
+    from et_md2.atoms import Atoms
+
+    _, attrs, arrays = read_sections(path, 'Atoms', mmap_mode)
+    dtype = np.single if arrays['r'].dtype == np.float32 else float
+    atoms = Atoms(0, dtype=dtype)
+    atoms.r = arrays['r']
+    atoms.v = arrays['v']
+    atoms.a = arrays['a']
+    atoms.m = arrays['m']
+    atoms.arrays = [atoms.r, atoms.v, atoms.a, atoms.m]
+    atoms.type = arrays['type']
+    atoms.image = arrays['image']
+    for corner in ('lower_corner', 'upper_corner'):
+        if attrs[corner] is not None:
+            setattr(atoms, corner, np.array(attrs[corner]))
+    return atoms
+
+
+def save_vl(vl, path):
+    """Save a linearised Verlet list to a checkpoint file, either implementation.
+
+    The sections are the arrays vl_list, vl_offset and vl_size, and the
+    reference positions, if any. The cutoff, skin, periodic box, etc. are
+    stored in the header.
+
+    :param vl: linearised Verlet list.
+    :param path: file name.
+    """
+    import et_md2.verletlist
+
+    if not vl.linearised():
+        raise ValueError("The Verlet list must be linearised.")
+    if isinstance(vl, et_md2.verletlist.VL):
+        attrs = {'impl': 'py', 'cutoff': vl.cutoff, 'skin': vl.skin, 'full': vl.full,
+                 'index_dtype': None if vl.index_dtype is None else np.dtype(vl.index_dtype).str}
+    else:
+        attrs = {'impl': 'cpp', 'class': type(vl).__name__,
+                 'cutoff': vl.cutoff(), 'skin': vl.skin(), 'full': vl.full()}
+    if vl.box_width is None:
+        attrs['lower_corner'] = attrs['upper_corner'] = None
+    else:
+        attrs['lower_corner'] = vl.lower_corner.tolist()
+        attrs['upper_corner'] = (vl.lower_corner + vl.box_width).tolist()
+    arrays = {'vl_list': vl.vl_list, 'vl_offset': vl.vl_offset, 'vl_size': vl.vl_size}
+    if vl.r_ref is not None:
+        arrays['r_ref'] = vl.r_ref
+    write_sections(path, 'VL', attrs, arrays)
+
+
+def load_vl(path, mmap_mode='c', r_ref=None):
+    """Load a linearised Verlet list from a checkpoint file.
+
+    The Verlet list is of the implementation it was saved from. The arrays of
+    a Python Verlet list are memory-mapped, those of a C++ Verlet list are
+    copied. The positions the Verlet list was built from are restored from the
+    file, or from r_ref, if provided. If neither is available, a warning is
+    issued, because ``needs_rebuild()`` then returns True.
+
+    :param path: file name.
+    :param str mmap_mode: see :py:func:`read_sections`.
+    :param np.ndarray r_ref: reference positions, shape (n,3), e.g. the positions
+        of the atoms saved together with the Verlet list.
+    :return: Verlet list object.
+    """
+    import et_md2.verletlist
+
+    _, attrs, arrays = read_sections(path, 'VL', mmap_mode)
+    if attrs['impl'] == 'py':
+        index_dtype = attrs['index_dtype']
+        vl = et_md2.verletlist.VL(cutoff=attrs['cutoff'], skin=attrs['skin'], full=attrs['full'],
+                                  index_dtype=None if index_dtype is None else np.dtype(index_dtype))
+        if attrs['lower_corner'] is not None:
+            vl.set_box(attrs['lower_corner'], attrs['upper_corner'])
+        vl.vl_list = arrays['vl_list']
+        vl.vl_offset = arrays['vl_offset']
+        vl.vl_size = arrays['vl_size']
+        vl._index_dtype = vl.vl_list.dtype
+        if 'r_ref' in arrays:
+            vl.r_ref = arrays['r_ref']
+        if r_ref is not None:
+            vl.set_reference(r_ref)
+    else:
+        import et_md2.verletlist.c_vl
+        VLType = getattr(et_md2.verletlist.c_vl, attrs['class'])
+        natoms = len(arrays['vl_size'])
+        vl = VLType(natoms, attrs['cutoff'], attrs['skin'], attrs['full'])
+        if attrs['lower_corner'] is not None:
+            vl.set_box(attrs['lower_corner'], attrs['upper_corner'])
+        vl.assign(arrays['vl_list'], arrays['vl_offset'], arrays['vl_size'])
+        if 'r_ref' in arrays:
+            vl.set_reference(arrays['r_ref'])
+        if r_ref is not None:
+            vl.set_reference(r_ref)
+    if vl.r_ref is None:
+        warnings.warn(f"The Verlet list in {path} has no reference positions, it must be rebuilt.")
+    return vl
+
+
+def _frame_dtype(natoms, dtype, fields):
+    """Return the structured dtype of a trajectory frame."""
+    return np.dtype([('step', '<i8')] + [(field, dtype, (natoms, 3)) for field in fields])
+
+
+class TrajectoryWriter:
+    """Write trajectory frames asynchronously.
+
+    ``write()`` copies the positions (and velocities) of the atoms into a
+    buffer of a preallocated ring of *nbuffers* buffers, and hands it to a
+    background thread, which appends it to the trajectory file. Hence, the
+    simulation only waits for the file I/O if all buffers are waiting to be
+    written (back-pressure). The writer can be passed as callback to
+    :py:func:`et_md2.integrators.run`::
+
+        with TrajectoryWriter('traj.bin', atoms) as writer:
+            et_md2.integrators.run(atoms, vl, nsteps=10000, every=100, callback=writer)
+
+    :param path: file name, the file is overwritten.
+    :param atoms: Atoms object, the number of atoms and the floating point type
+        of the frames are fixed by it.
+    :param bool velocities: also write the velocities.
+    :param int nbuffers: number of buffers, at least 2.
+    """
+    def __init__(self, path, atoms, velocities=False, nbuffers=3):
+        if nbuffers < 2:
+            raise ValueError(f"Expecting nbuffers >= 2, got {nbuffers}.")
+        self.natoms = atoms.n
+        self.fields = ['r', 'v'] if velocities else ['r']
+        self.dtype = np.dtype(atoms.r.dtype)
+        self._buffers = np.empty(nbuffers, dtype=_frame_dtype(self.natoms, self.dtype, self.fields))
+        # indices of the buffers that can be filled, and of those that must be written.
+        self._free = queue.Queue(maxsize=nbuffers)
+        self._full = queue.Queue(maxsize=nbuffers)
+        for i in range(nbuffers):
+            self._free.put(i)
+        self._error = None
+        self._file = open(path, 'wb')
+        _write_header(self._file, self._magic, self._header(atoms))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    _magic = TRAJECTORY_MAGIC
+
+    def _header(self, atoms):
+        """Return the header of the trajectory file."""
+        return {'kind': 'Trajectory', 'version': VERSION, 'natoms': self.natoms, 'dtype': self.dtype.str,
+                'fields': self.fields,
+                'lower_corner': None if atoms.lower_corner is None else np.asarray(atoms.lower_corner, dtype=float).tolist(),
+                'upper_corner': None if atoms.upper_corner is None else np.asarray(atoms.upper_corner, dtype=float).tolist(),
+                }
+
+    def _write_frame(self, frame):
+        """Append a frame to the file, called by the background thread.
+
+        :param np.ndarray frame: array with a single frame record.
+        """
+        # writing a numpy array releases the GIL
+        frame.tofile(self._file)
+
+    def _run(self):
+        """Write the buffers handed over by write(), until None is received."""
+        while True:
+            i = self._full.get()
+            if i is None:
+                break
+            if self._error is None:
+                try:
+                    self._write_frame(self._buffers[i:i + 1])
+                except Exception as e:
+                    self._error = e
+            # always return the buffer, so that write() never blocks forever
+            self._free.put(i)
+
+    def _check(self):
+        if self._error is not None:
+            raise IOError("Writing the trajectory failed.") from self._error
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, step, atoms):
+        """Write a frame.
+
+        Blocks only if none of the buffers is available.
+
+        :param int step: time step.
+        :param atoms: Atoms object, with the same number of atoms as the trajectory.
+        :raises IOError: if writing a previous frame failed.
+        """
+        if self.closed:
+            raise ValueError("Writing to a closed trajectory.")
+        if atoms.n != self.natoms:
+            raise ValueError(f"Expecting {self.natoms} atoms, got {atoms.n}.")
+        self._check()
+        i = self._free.get()
+        buffer = self._buffers[i]
+        buffer['step'] = step
+        buffer['r'][:] = atoms.r
+        if 'v' in self.fields:
+            buffer['v'][:] = atoms.v
+        self._full.put(i)
+
+    def __call__(self, step, atoms, epot=None, virial=None):
+        """Write a frame, the signature of the callback of :py:func:`et_md2.integrators.run`."""
+        self.write(step, atoms)
+
+    def flush(self):
+        """Wait until all frames are written."""
+        # the buffers are returned after writing, hence all frames are written
+        # when all buffers are free.
+        free = [self._free.get() for _ in range(len(self._buffers))]
+        for i in free:
+            self._free.put(i)
+        self._file.flush()
+        self._check()
+
+    def close(self):
+        """Write the pending frames, and close the file.
+
+        :raises IOError: if writing a frame failed.
+        """
+        if self.closed:
+            return
+        self._full.put(None)
+        self._thread.join()
+        self._file.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TrajectoryReader:
+    """Read a trajectory file written by :py:class:`TrajectoryWriter`.
+
+    The frames are memory-mapped, and only read from disk when accessed.
+    ``reader[k]`` returns frame k, a numpy record with fields ``'step'``,
+    ``'r'`` and, if written, ``'v'``. A frame that was only partially written
+    is ignored.
+
+    :param path: file name.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header, start = _read_header(f, TRAJECTORY_MAGIC, path)
+            f.seek(0, 2)
+            size = f.tell()
+        self.natoms = header['natoms']
+        self.fields = header['fields']
+        self.dtype = np.dtype(header['dtype'])
+        self.lower_corner = None if header['lower_corner'] is None else np.array(header['lower_corner'])
+        self.upper_corner = None if header['upper_corner'] is None else np.array(header['upper_corner'])
+        frame_dtype = _frame_dtype(self.natoms, self.dtype, self.fields)
+        nframes = (size - start) // frame_dtype.itemsize
+        if nframes:
+            self.frames = np.memmap(path, dtype=frame_dtype, mode='r', offset=start, shape=(nframes,))
+        else:
+            self.frames = np.empty(0, dtype=frame_dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, k):
+        return self.frames[k]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @property
+    def steps(self):
+        """The time steps of all frames."""
+        return self.frames['step']
+
+
+# The header of a compressed frame. nbytes is the size of the data that follows.
+_COMPRESSED_FRAME_HEADER = np.dtype([('step', '<i8'), ('nbytes', '<u8'), ('keyframe', 'u1'),
+                                     ('nbits', 'u1', (3,)), ('pad', 'u1', (4,))])
+
+
+def _bit_length(values):
+    """Return the number of bits of the unsigned integers in values (0 for 0)."""
+    # exact for values < 2**53, otherwise an overestimate
+    return np.frexp(values.astype(np.float64))[1]
+
+
+def _pack_bits(values, nbits):
+    """Pack the unsigned integers in values, which must all fit in nbits bits,
+    into a bitstream.
+
+    :return: 1D uint8 array with ceil(len(values)*nbits/8) bytes.
+    """
+    bits = np.empty((len(values), nbits), dtype=np.uint8)
+    for j in range(nbits):
+        bits[:, j] = (values >> np.uint64(nbits - 1 - j)) & np.uint64(1)
+    return np.packbits(bits.ravel())
+
+
+def _unpack_bits(data, n, nbits):
+    """Unpack n unsigned integers of nbits bits from a bitstream written by _pack_bits().
+
+    :return: 1D uint64 array.
+    """
+    bits = np.unpackbits(data, count=n * nbits).reshape(n, nbits)
+    values = np.zeros(n, dtype=np.uint64)
+    for j in range(nbits):
+        values <<= np.uint64(1)
+        values |= bits[:, j]
+    return values
+
+
+def _packed_size(n, nbits):
+    """Number of bytes of n packed integers of nbits bits."""
+    return -(-n * nbits // 8)
+
+
+def _perm_nbits(natoms):
+    """Number of bits of the atom indices of a keyframe."""
+    return max(natoms - 1, 0).bit_length()
+
+
+def _encode(values):
+    """Encode signed integers as bitstream with a fixed number of bits.
+
+    The values are zigzag encoded (0, -1, 1, -2, ... -> 0, 1, 2, 3, ...) and
+    packed with the number of bits that minimizes the size. Values that do not
+    fit (outliers) are stored separately, with their index, as 64-bit integers.
+
+    :param np.ndarray values: 1D int64 array.
+    :return: tuple (nbits, list of byte strings).
+    """
+    z = ((values << 1) ^ (values >> 63)).view(np.uint64)
+    lengths = _bit_length(z)
+    # number of values longer than nbits, for nbits = 0, ..., 64
+    noutliers = len(z) - np.cumsum(np.bincount(lengths, minlength=65))
+    nbits = int(np.argmin(len(z) * np.arange(65) + 128 * noutliers))
+    outliers = np.flatnonzero(lengths > nbits)
+    values = z[outliers]
+    z[outliers] = 0
+    data = [np.array([len(outliers)], dtype='<u8').tobytes(),
+            outliers.astype('<i8').tobytes(),
+            values.astype('<u8').tobytes(),
+            _pack_bits(z, nbits).tobytes()]
+    return nbits, data
+
+
+def _decode(data, offset, n, nbits):
+    """Decode n values encoded by _encode(), starting at data[offset].
+
+    :return: tuple (values, offset), with offset the position after the encoded values.
+    """
+    noutliers = int(np.frombuffer(data, dtype='<u8', count=1, offset=offset)[0])
+    offset += 8
+    outliers = np.frombuffer(data, dtype='<i8', count=noutliers, offset=offset)
+    offset += 8 * noutliers
+    values = np.frombuffer(data, dtype='<u8', count=noutliers, offset=offset)
+    offset += 8 * noutliers
+    size = _packed_size(n, nbits)
+    z = _unpack_bits(np.frombuffer(data, dtype=np.uint8, count=size, offset=offset), n, nbits)
+    offset += size
+    z[outliers] = values
+    return (z >> np.uint64(1)).astype(np.int64) ^ -(z & np.uint64(1)).astype(np.int64), offset
+
+
+class CompressedTrajectoryWriter(TrajectoryWriter):
+    """Write a lossy compressed trajectory of the atom positions, asynchronously.
+
+    The positions are quantized on a grid with spacing *precision*, with the
+    origin at ``atoms.lower_corner``, hence the error on the positions is at
+    most precision/2. The atoms are ordered along a Hilbert curve, see
+    :py:func:`et_md2.spatial_sorting.hilbert_order`, and the differences between
+    the quantized coordinates of successive atoms, which are small because they
+    are close in space, are packed in a bitstream, see _encode(). The Hilbert
+    order is recomputed, and stored, every *keyframe_interval* frames, the
+    frames in between use the order of the preceding keyframe.
+
+    The compression is done by the background thread, see :py:class:`TrajectoryWriter`.
+
+    :param path: file name, the file is overwritten.
+    :param atoms: Atoms object, with a box (lower_corner and upper_corner).
+    :param float precision: spacing of the quantization grid.
+    :param int keyframe_interval: number of frames between keyframes.
+    :param float cell_width: width of the cells of the Hilbert curve. If None,
+        the cells contain about one atom.
+    :param int nbuffers: number of buffers, at least 2.
+    """
+    _magic = COMPRESSED_TRAJECTORY_MAGIC
+
+    def __init__(self, path, atoms, precision, keyframe_interval=10, cell_width=None, nbuffers=3):
+        if atoms.lower_corner is None or atoms.upper_corner is None:
+            raise ValueError("A compressed trajectory needs atoms.lower_corner and atoms.upper_corner.")
+        if not precision > 0:
+            raise ValueError(f"Expecting precision > 0, got {precision}.")
+        if keyframe_interval < 1:
+            raise ValueError(f"Expecting keyframe_interval > 0, got {keyframe_interval}.")
+        self.precision = float(precision)
+        self.keyframe_interval = keyframe_interval
+        self.lower_corner = np.asarray(atoms.lower_corner, dtype=float)
+        if cell_width is None:
+            volume = np.prod(np.asarray(atoms.upper_corner, dtype=float) - self.lower_corner)
+            cell_width = (volume / max(atoms.n, 1)) ** (1/3)
+        self.cell_width = cell_width
+        self._nframes = 0
+        self._perm = None
+        super().__init__(path, atoms, velocities=False, nbuffers=nbuffers)
+
+    def _header(self, atoms):
+        header = super()._header(atoms)
+        header.update(kind='CompressedTrajectory', precision=self.precision,
+                      keyframe_interval=self.keyframe_interval, cell_width=self.cell_width)
+        return header
+
+    def _write_frame(self, frame):
+        import et_md2.spatial_sorting
+
+        r = frame['r'][0]
+        header = np.zeros(1, dtype=_COMPRESSED_FRAME_HEADER)
+        header['step'] = frame['step'][0]
+        data = []
+        if self._nframes % self.keyframe_interval == 0:
+            self._perm = et_md2.spatial_sorting.hilbert_order(r, self.cell_width)
+            header['keyframe'] = 1
+            data.append(_pack_bits(self._perm.astype(np.uint64), _perm_nbits(self.natoms)).tobytes())
+        q = np.rint((r[self._perm] - self.lower_corner) / self.precision).astype(np.int64)
+        deltas = np.diff(q, axis=0, prepend=0)
+        for d in range(3):
+            nbits, encoded = _encode(np.ascontiguousarray(deltas[:, d]))
+            header['nbits'][0, d] = nbits
+            data.extend(encoded)
+        header['nbytes'] = sum(len(b) for b in data)
+        self._file.write(header.tobytes())
+        for b in data:
+            self._file.write(b)
+        self._nframes += 1
+
+
+class CompressedTrajectoryReader:
+    """Read a compressed trajectory file written by :py:class:`CompressedTrajectoryWriter`.
+
+    The frames are decoded on demand: ``reader[k]`` returns frame k, a numpy
+    record with fields ``'step'`` and ``'r'``, like :py:class:`TrajectoryReader`.
+    Iterating over the reader decodes the frames one by one. A frame that was
+    only partially written is ignored.
+
+    :param path: file name.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header, start = _read_header(f, COMPRESSED_TRAJECTORY_MAGIC, path)
+            f.seek(0, 2)
+            size = f.tell()
+            # index of the frames
+            headers, offsets = [], []
+            offset = start
+            while offset + _COMPRESSED_FRAME_HEADER.itemsize <= size:
+                f.seek(offset)
+                frame_header = np.frombuffer(f.read(_COMPRESSED_FRAME_HEADER.itemsize), dtype=_COMPRESSED_FRAME_HEADER)
+                offset += _COMPRESSED_FRAME_HEADER.itemsize
+                if offset + int(frame_header['nbytes'][0]) > size:
+                    break
+                headers.append(frame_header)
+                offsets.append(offset)
+                offset += int(frame_header['nbytes'][0])
+        self.natoms = header['natoms']
+        self.dtype = np.dtype(header['dtype'])
+        self.precision = header['precision']
+        self.lower_corner = np.array(header['lower_corner'])
+        self.upper_corner = np.array(header['upper_corner'])
+        self._headers = np.concatenate(headers) if headers else np.empty(0, dtype=_COMPRESSED_FRAME_HEADER)
+        self._offsets = offsets
+        self._keyframes = np.flatnonzero(self._headers['keyframe'])
+        self._data = np.memmap(path, dtype=np.uint8, mode='r') if offsets else None
+        self._perm_frame = None
+        self._perm = None
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def steps(self):
+        """The time steps of all frames."""
+        return self._headers['step'].copy()
+
+    def __getitem__(self, k):
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError(f"Frame index out of range: {k}.")
+        natoms = self.natoms
+        header = self._headers[k]
+        offset = self._offsets[k]
+        if header['keyframe']:
+            perm_frame = k
+        else:
+            perm_frame = self._keyframes[np.searchsorted(self._keyframes, k) - 1]
+        if perm_frame != self._perm_frame:
+            self._perm = _unpack_bits(self._data[self._offsets[perm_frame]:], natoms, _perm_nbits(natoms)).astype(np.intp)
+            self._perm_frame = perm_frame
+        if header['keyframe']:
+            offset += _packed_size(natoms, _perm_nbits(natoms))
+        q = np.empty((natoms, 3), dtype=np.int64)
+        for d in range(3):
+            deltas, offset = _decode(self._data, offset, natoms, int(header['nbits'][d]))
+            np.cumsum(deltas, out=q[:, d])
+        frame = np.zeros(1, dtype=_frame_dtype(natoms, self.dtype, ['r']))
+        frame['step'] = header['step']
+        frame['r'][0, self._perm] = self.lower_corner + q * self.precision
+        return frame[0]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
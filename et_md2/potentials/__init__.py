@@ -6,7 +6,16 @@ Module et_md2.potentials
 
 A submodule for interaction potentials.
 
+Class :py:class:`LJ_py` is a Python implementation of the Lennard-Jones potential.
+Parameterized C++ potentials, which can be passed to the C++ interaction kernels,
+are in :py:mod:`et_md2.potentials.cpp`. Class :py:class:`TabulatedPotential`
+interpolates any potential in a table, in Python and in C++. Class
+:py:class:`PairLJ_py` is a Lennard-Jones potential for mixtures of atom types,
+with parameters per pair of types.
+
 """
+import numpy as np
+
 
 class LJ_py:
     """Lennard-Jones potentiol
@@ -65,3 +74,225 @@ class LJ_py:
                , f * rij[1]
                , f * rij[2]
                )
+
+
+class PairLJ_py:
+    """Lennard-Jones potential for a mixture of atom types.
+
+    The parameters depend on the types a and b of the interacting atoms:
+
+    V_ab(r) = 4*epsilon_ab*[ (sigma_ab/r)**12 - (sigma_ab/r)**6 ],  r < cutoff_ab
+            = 0                                                   ,  r >= cutoff_ab
+
+    The energy and the force factor take the types of the atoms as extra
+    arguments, ``interaction_energy(rij2, ti, tj)`` and ``force_factor(rij2, ti, tj)``,
+    hence all pairs are processed in a single traversal of the Verlet list.
+    The cutoff distances must not exceed the cutoff distance of the Verlet list.
+
+    :param epsilon: epsilon_ab, symmetric array with shape (ntypes,ntypes).
+    :param sigma: sigma_ab, symmetric array with shape (ntypes,ntypes).
+    :param cutoff: cutoff_ab, symmetric array with shape (ntypes,ntypes), a
+        single cutoff distance for all pairs, or None (no cutoff, except that
+        of the Verlet list).
+    """
+    def __init__(self, epsilon, sigma, cutoff=None):
+        self.epsilon = np.atleast_2d(np.asarray(epsilon, dtype=float))
+        self.ntypes = self.epsilon.shape[0]
+        shape = (self.ntypes, self.ntypes)
+        self.sigma = np.atleast_2d(np.asarray(sigma, dtype=float))
+        if cutoff is None:
+            cutoff = np.inf
+        self.cutoff = np.broadcast_to(np.asarray(cutoff, dtype=float), shape).copy()
+        for name in ('epsilon', 'sigma', 'cutoff'):
+            ar = getattr(self, name)
+            if ar.shape != shape:
+                raise ValueError(f"Expecting `{name}` with shape {shape}, got {ar.shape}.")
+            if not np.array_equal(ar, ar.T):
+                raise ValueError(f"Expecting a symmetric `{name}` matrix.")
+        self.four_epsilon = 4.0*self.epsilon
+        self.sigma2 = self.sigma**2
+        self.cutoff2 = self.cutoff**2
+
+
+    @classmethod
+    def mixed(cls, epsilon, sigma, cutoff=None):
+        """Construct the pair parameters from the parameters of the pure types
+        with the Lorentz-Berthelot mixing rules, epsilon_ab = sqrt(epsilon_a*epsilon_b)
+        and sigma_ab = (sigma_a + sigma_b)/2.
+
+        :param epsilon: 1D array with epsilon_a for each type a.
+        :param sigma: 1D array with sigma_a for each type a.
+        :param cutoff: see :py:class:`PairLJ_py`.
+        """
+        epsilon = np.asarray(epsilon, dtype=float)
+        sigma = np.asarray(sigma, dtype=float)
+        return cls( np.sqrt(np.outer(epsilon, epsilon))
+                  , 0.5*(sigma[:, np.newaxis] + sigma[np.newaxis, :])
+                  , cutoff
+                  )
+
+
+    def interaction_energy(self, rij2, ti, tj):
+        """Compute the Lennard-Jones potential
+
+        :param float|np.array rij2: squared distance between atoms.
+        :param int|np.array ti: type of atom i.
+        :param int|np.array tj: type of atom j.
+        """
+        s2 = self.sigma2[ti, tj] / rij2
+        s6 = s2*s2*s2
+        v = self.four_epsilon[ti, tj]*(s6 - 1.0)*s6
+        return np.where(rij2 < self.cutoff2[ti, tj], v, 0.0)
+
+
+    def force_factor(self, rij2, ti, tj):
+        """Lennard-Jones force factor V'(r)/r, see :py:meth:`LJ_py.force_factor`.
+
+        :param float|np.array rij2: squared interatomic distance from atom i to atom j
+        :param int|np.array ti: type of atom i.
+        :param int|np.array tj: type of atom j.
+        """
+        s2 = self.sigma2[ti, tj] / rij2
+        s6 = s2*s2*s2
+        f = 6.0*self.four_epsilon[ti, tj]*(1.0 - 2.0*s6)*s6/rij2
+        return np.where(rij2 < self.cutoff2[ti, tj], f, 0.0)
+
+
+    def to_cpp(self):
+        """Return the equivalent :py:class:`et_md2.potentials.cpp.PairLJ` object,
+        for the C++ kernels.
+        """
+        import et_md2.potentials.cpp
+        return et_md2.potentials.cpp.PairLJ(self.epsilon, self.sigma, self.cutoff)
+
+
+class TabulatedPotential:
+    """Potential interpolated in a table.
+
+    The energy and the force factor of a potential are sampled once on a
+    uniform grid in the squared interatomic distance rij2, and interpolated
+    piecewise by a cubic or linear polynomial. Evaluating the table costs the
+    same for any potential, and there is no Python callback in the kernels.
+
+    :param potential: Potential object with interaction_energy(rij2) and
+        force_factor(rij2) methods accepting numpy arrays (e.g. :py:class:`LJ_py`),
+        or a function V(rij2) accepting numpy arrays. In the latter case the force
+        factor, 2*dV/d(rij2), is computed by finite differences.
+    :param float rij2_min: smallest squared distance in the table. Below, the
+        first interval is extrapolated.
+    :param float rij2_max: largest squared distance in the table, typically the
+        squared cutoff distance. Beyond, energy and force factor are zero.
+    :param int n: number of grid points.
+    :param str kind: 'cubic' | 'linear'. For 'cubic' the energy is interpolated
+        by cubic Hermite polynomials using the exact derivative dV/d(rij2) =
+        force_factor/2, hence energy and force are consistent. The force factor
+        is interpolated by cubic Hermite polynomials with finite difference slopes.
+
+    The tables are stored as arrays of polynomial coefficients with shape (n-1,4):
+    on interval k, ``V = c[k,0] + t*(c[k,1] + t*(c[k,2] + t*c[k,3]))``, with
+    ``t = (rij2 - rij2_min)/h - k`` in [0,1[.
+    """
+    def __init__(self, potential, rij2_min, rij2_max, n=1001, kind='cubic'):
+        if not 0 < rij2_min < rij2_max:
+            raise ValueError(f"Expecting 0 < rij2_min < rij2_max, got {rij2_min}, {rij2_max}.")
+        if n < 2:
+            raise ValueError(f"Expecting at least 2 grid points, got {n}.")
+        if not kind in ('cubic', 'linear'):
+            raise ValueError(f"Unknown interpolation kind: {kind}.")
+        self.rij2_min = float(rij2_min)
+        self.rij2_max = float(rij2_max)
+        self.n = n
+        self.kind = kind
+        self.h = (self.rij2_max - self.rij2_min) / (n - 1)
+
+        rij2 = np.linspace(self.rij2_min, self.rij2_max, n)
+        if hasattr(potential, 'interaction_energy'):
+            energy = np.asarray(potential.interaction_energy(rij2), dtype=float)
+            force_factor = np.asarray(potential.force_factor(rij2), dtype=float)
+        else:
+            energy = np.asarray(potential(rij2), dtype=float)
+            force_factor = 2.0 * np.gradient(energy, self.h, edge_order=2)
+
+        if kind == 'cubic':
+            # slopes with respect to t, i.e. derivatives multiplied by h
+            self.energy_coefficients = TabulatedPotential.hermite(energy, 0.5 * force_factor * self.h)
+            self.force_factor_coefficients = TabulatedPotential.hermite(force_factor, np.gradient(force_factor, edge_order=2))
+        else:
+            self.energy_coefficients = TabulatedPotential.linear(energy)
+            self.force_factor_coefficients = TabulatedPotential.linear(force_factor)
+        self._cpp = None
+
+
+    @staticmethod
+    def hermite(y, m):
+        """Return the coefficients of the cubic Hermite polynomials through the
+        values y with slopes m, in the local coordinate t in [0,1[, shape (n-1,4).
+        """
+        y0, y1 = y[:-1], y[1:]
+        m0, m1 = m[:-1], m[1:]
+        return np.column_stack((y0, m0, 3*(y1 - y0) - 2*m0 - m1, 2*(y0 - y1) + m0 + m1))
+
+
+    @staticmethod
+    def linear(y):
+        """Return the coefficients of the linear polynomials through the values y, shape (n-1,4)."""
+        zero = np.zeros(len(y) - 1)
+        return np.column_stack((y[:-1], y[1:] - y[:-1], zero, zero))
+
+
+    def _interpolate(self, c, rij2):
+        """Evaluate the piecewise polynomial with coefficients c in rij2."""
+        rij2 = np.asarray(rij2)
+        x = (rij2 - self.rij2_min) / self.h
+        k = np.clip(np.floor(x).astype(int), 0, self.n - 2)
+        t = x - k
+        ck = c[k]
+        v = ck[..., 0] + t*(ck[..., 1] + t*(ck[..., 2] + t*ck[..., 3]))
+        v = np.where(rij2 < self.rij2_max, v, 0.0)
+        return float(v) if v.ndim == 0 else v
+
+
+    def interaction_energy(self, rij2):
+        """Interpolate the interaction energy.
+
+        :param float|np.array rij2: squared distance between atoms.
+        """
+        return self._interpolate(self.energy_coefficients, rij2)
+
+
+    def force_factor(self, rij2):
+        """Interpolate the force factor.
+
+        :param float|np.array rij2: squared interatomic distance from atom i to atom j
+        """
+        return self._interpolate(self.force_factor_coefficients, rij2)
+
+
+    def to_cpp(self):
+        """Return the equivalent :py:class:`et_md2.potentials.cpp.Tabulated` object,
+        for the C++ kernels.
+        """
+        if self._cpp is None:
+            import et_md2.potentials.cpp
+            self._cpp = et_md2.potentials.cpp.Tabulated( self.rij2_min, self.rij2_max
+                                                        , self.energy_coefficients
+                                                        , self.force_factor_coefficients
+                                                        )
+        return self._cpp
+
+
+def to_cpp(potential):
+    """Return the C++ potential to pass to the C++ kernels.
+
+    :param potential: a potential of :py:mod:`et_md2.potentials.cpp`, which is
+        returned as is, a Python potential with a to_cpp() method
+        (:py:class:`TabulatedPotential`, :py:class:`PairLJ_py`), which is converted,
+        or None, for the reduced Lennard-Jones potential V(r) = 1/r**12 - 1/r**6.
+    """
+    if potential is None:
+        import et_md2.potentials.cpp
+        return et_md2.potentials.cpp.LJ(epsilon=0.25, sigma=1.0)
+    elif hasattr(potential, 'to_cpp'):
+        return potential.to_cpp()
+    else:
+        return potential
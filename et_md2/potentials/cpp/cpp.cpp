@@ -10,108 +10,140 @@
 
 namespace py = pybind11;
 
-template <class FloatNumber>
-class PotentialBase
-{
-public:
- // RReturn the equilibrium distance
-    FloatNumber r0();
-
- // Compute the interraction energy of the potential as a function of the squared interatomic distance.
-    FloatNumber interaction_energy(FloatNumber rij2);
+#include "potentials.hpp"
+#include "ArrayInfo.hpp"
 
- // Compute the interraction force factor of the potential as a function of the squared interatomic distance.
-    FloatNumber interaction_force_factor(FloatNumber rij2);
-
- // Compute all the interaction forces from a Verlet list.
+// Add the methods interaction_energy(rij2) and force_factor(rij2) to the
+// exposed potential class cls. They accept floats and numpy arrays. The double
+// precision version is declared first, so that Python floats are not
+// converted to single precision. Arrays with dtype=numpy.float32 are computed
+// in single precision.
+template<typename Potential>
 void
-compute_forces
-  ( py::array_t<FloatType> r
-  , py::array_t<FloatType> a
-  , py::array_t<FloatType> m
-  , VL const & vl
-  )
+def_potential_methods( py::class_<Potential>& cls )
 {
-    ArrayInfo<FloatType,2> ar(r);
-    ArrayInfo<FloatType,2> aa(a);
-    ArrayInfo<FloatType,1> am(m);
-    std::size_t const n = ar.shape(0);
-    FloatType const * ri;
-    FloatType const * rj;
-    FloatType rij[3];
-    for (std::size_t i=0; i<n; ++i)
-    {
-        ri = &ar[3*i];
-        std::size_t const nn = vl.ncontacts(i);
-        for (std::size_t ic=0; ic<nn; ++ic)
-        {
-            std::size_t const j = vl.contact(i,ic);
-            rj = &ar[3*j];
-            FloatType rij2 = 0;
-            for (std::size_t d=0; d<3; ++d) {
-                rij[d] = rj[d] - ri[d];
-                rij2 += rij[d]*rij[d];
-            }
-            FloatType ff = force_factor(rij2);
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] += ff*rij[d];
-                aa[3*j+d] -= ff*rij[d];
-            }
-        }
-    }
- // convert forces to acceleration
-    if (m.shape(0) == 1) {
-        for (std::size_t i=0; i<n; ++i) {
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] /= am[0];
-            }
-        }
-    } else if (m.shape(0) == n) {
-        for (std::size_t i=0; i<n; ++i) {
-            for (std::size_t d=0; d<3; ++d) {
-                aa[3*i+d] /= am[i];
-            }
-        }
-    }
+    cls.def("interaction_energy", py::vectorize( &Potential::template energy      <double> ))
+       .def("interaction_energy", py::vectorize( &Potential::template energy      <float > ))
+       .def("force_factor"      , py::vectorize( &Potential::template force_factor<double> ))
+       .def("force_factor"      , py::vectorize( &Potential::template force_factor<float > ))
+    ;
 }
 
-template <typename FloatType>
+// PairLJ::energy and PairLJ::force_factor, after validating the atom types,
+// which index the parameter arrays.
+template<typename FloatType>
 FloatType
-compute_interactions
-  ( py::array_t<FloatType> r
-  , VL const & vl
-  )
+pair_lj_energy( potentials::PairLJ const * pair_lj, FloatType rij2, std::int32_t ti, std::int32_t tj )
 {
-    ArrayInfo<FloatType,2> ar(r);
-    std::size_t const n = ar.shape(0);
-    FloatType const * ri;
-    FloatType const * rj;
-    FloatType epot = 0;
-    for (std::size_t i=0; i<n; ++i)
-    {
-        ri = &ar[3*i];
-        std::size_t const nn = vl.ncontacts(i);
-        for (std::size_t ic=0; ic<nn; ++ic)
-        {
-            std::size_t const j = vl.contact(i,ic);
-            rj = &ar[3*j];
-            FloatType rij2 = 0;
-            for (std::size_t d=0; d<3; ++d) {
-                rij2 += (rj[d] - ri[d])*(rj[d] - ri[d]);
-            }
-            epot += potential(rij2);
-//            std::cout<<"rij2="<<rij2<<" epot="<<epot<<std::endl;
-        }
-    }
-    return epot;
+    pair_lj->validate_types(ti, tj);
+    return pair_lj->energy(rij2, ti, tj);
 }
+
+template<typename FloatType>
+FloatType
+pair_lj_force_factor( potentials::PairLJ const * pair_lj, FloatType rij2, std::int32_t ti, std::int32_t tj )
+{
+    pair_lj->validate_types(ti, tj);
+    return pair_lj->force_factor(rij2, ti, tj);
 }
 
 
 PYBIND11_MODULE(cpp, m)
 {// optional module doc-string
-    m.doc() = "pybind11 cpp plugin"; // optional module docstring
- // list the functions you want to expose:
- // m.def("exposed_name", function_pointer, "doc-string for the exposed function");
-    m.def("add", &add, "A function which adds two arrays 'x' and 'y' and stores the result in the third, 'z'.");
+    m.doc() = "C++ implementation of et_md2.potentials"; // optional module docstring
+
+    using namespace potentials;
+
+    py::class_<LJ> lj(m, "LJ");
+    lj.def(py::init<double, double>(), py::arg("epsilon")=1.0, py::arg("sigma")=1.0)
+      .def_property_readonly("epsilon", &LJ::epsilon)
+      .def_property_readonly("sigma"  , &LJ::sigma)
+      .def("r0", &LJ::r0)
+    ;
+    def_potential_methods(lj);
+
+    py::class_<Morse> morse(m, "Morse");
+    morse.def(py::init<double, double, double>(), py::arg("D")=1.0, py::arg("a")=1.0, py::arg("r0")=1.0)
+         .def_property_readonly("D", &Morse::D)
+         .def_property_readonly("a", &Morse::a)
+         .def("r0", &Morse::r0)
+    ;
+    def_potential_methods(morse);
+
+    py::class_<WCA> wca(m, "WCA");
+    wca.def(py::init<double, double>(), py::arg("epsilon")=1.0, py::arg("sigma")=1.0)
+       .def_property_readonly("epsilon", &WCA::epsilon)
+       .def_property_readonly("sigma"  , &WCA::sigma)
+       .def("r0", &WCA::r0)
+    ;
+    def_potential_methods(wca);
+
+    py::class_<SoftSphere> soft_sphere(m, "SoftSphere");
+    soft_sphere.def(py::init<double, double, double>(), py::arg("epsilon")=1.0, py::arg("sigma")=1.0, py::arg("n")=12.0)
+               .def_property_readonly("epsilon", &SoftSphere::epsilon)
+               .def_property_readonly("sigma"  , &SoftSphere::sigma)
+               .def_property_readonly("n"      , &SoftSphere::n)
+    ;
+    def_potential_methods(soft_sphere);
+
+    py::class_<Tabulated> tabulated(m, "Tabulated");
+    tabulated.def(py::init( []( double rij2_min, double rij2_max
+                              , py::array_t<double> energy_coefficients
+                              , py::array_t<double> force_factor_coefficients
+                              )
+                            {
+                                ArrayInfo<double,2> ae(energy_coefficients);
+                                ArrayInfo<double,2> af(force_factor_coefficients);
+                                if( ae.shape(1) != 4 || af.shape(1) != 4 )
+                                    throw std::runtime_error("Tabulated: expecting coefficient arrays with shape (n-1,4).");
+                                std::size_t const ne = 4*ae.shape(0);
+                                std::size_t const nf = 4*af.shape(0);
+                                return Tabulated( rij2_min, rij2_max
+                                                , std::vector<double>( ae.cdata(), ae.cdata() + ne )
+                                                , std::vector<double>( af.cdata(), af.cdata() + nf )
+                                                );
+                            }
+                          )
+                 , py::arg("rij2_min"), py::arg("rij2_max")
+                 , py::arg("energy_coefficients"), py::arg("force_factor_coefficients")
+                 )
+             .def_property_readonly("rij2_min", &Tabulated::rij2_min)
+             .def_property_readonly("rij2_max", &Tabulated::rij2_max)
+             .def_property_readonly("n"       , &Tabulated::n)
+    ;
+    def_potential_methods(tabulated);
+
+ // PairLJ has the atom types as extra arguments, which are broadcast with rij2.
+    py::class_<PairLJ> pair_lj(m, "PairLJ");
+    pair_lj.def(py::init( []( carray_t<double> epsilon, carray_t<double> sigma, py::object cutoff )
+                          {
+                              ArrayInfo<double,2> aeps(epsilon);
+                              ArrayInfo<double,2> asig(sigma);
+                              std::size_t const ntypes = aeps.shape(0);
+                              std::size_t const n2 = ntypes*ntypes;
+                              if( aeps.shape(1) != ntypes || asig.shape(0) != ntypes || asig.shape(1) != ntypes )
+                                  throw std::runtime_error("PairLJ: expecting parameter arrays with shape (ntypes,ntypes).");
+                              std::vector<double> vcutoff(n2, std::numeric_limits<double>::infinity());
+                              if( !cutoff.is_none() ) {
+                                  carray_t<double> acutoff = cutoff.cast<carray_t<double>>();
+                                  ArrayInfo<double,2> acut(acutoff);
+                                  if( acut.shape(0) != ntypes || acut.shape(1) != ntypes )
+                                      throw std::runtime_error("PairLJ: expecting parameter arrays with shape (ntypes,ntypes).");
+                                  vcutoff.assign( acut.cdata(), acut.cdata() + n2 );
+                              }
+                              return PairLJ( ntypes
+                                           , std::vector<double>( aeps.cdata(), aeps.cdata() + n2 )
+                                           , std::vector<double>( asig.cdata(), asig.cdata() + n2 )
+                                           , vcutoff
+                                           );
+                          }
+                        )
+               , py::arg("epsilon"), py::arg("sigma"), py::arg("cutoff")=py::none()
+               )
+           .def_property_readonly("ntypes", &PairLJ::ntypes)
+           .def("interaction_energy", py::vectorize( &pair_lj_energy      <double> ))
+           .def("interaction_energy", py::vectorize( &pair_lj_energy      <float > ))
+           .def("force_factor"      , py::vectorize( &pair_lj_force_factor<double> ))
+           .def("force_factor"      , py::vectorize( &pair_lj_force_factor<float > ))
+    ;
 }
@@ -0,0 +1,339 @@
+/*
+ *  C++ header file with the potentials of module et_md2.potentials.cpp
+ *
+ *  The potentials are functions of the squared interatomic distance rij2.
+ *  Each potential class has the methods
+ *
+ *    energy(rij2)       : the interaction energy V(r)
+ *    force_factor(rij2) : V'(r)/r, such that the force exerted by atom j on atom i
+ *                         is force_factor(rij2)*(r_j - r_i)
+ *
+ *  The parameters are stored in double precision, the methods are templates,
+ *  evaluated in the floating point type of rij2.
+ *
+ *  Potentials for mixtures of atom types (PairLJ) take the types of atoms i and
+ *  j as extra arguments. The kernels call pair_energy() and pair_force_factor(),
+ *  which pass the atom types to such potentials and ignore them otherwise.
+ */
+
+#ifndef POTENTIALS_HPP
+#define POTENTIALS_HPP
+
+#include <cmath>
+#include <cstdint>
+#include <cstddef>
+#include <limits>
+#include <vector>
+#include <stdexcept>
+
+namespace potentials
+{//-----------------------------------------------------------------------------
+ // Lennard-Jones potential
+ //   V(r) = 4*epsilon*[ (sigma/r)**12 - (sigma/r)**6 ]
+    class LJ
+    {
+        double epsilon_;
+        double sigma_;
+        double sigma2_;
+      public:
+        LJ( double epsilon=1.0, double sigma=1.0 )
+          : epsilon_(epsilon), sigma_(sigma), sigma2_(sigma*sigma)
+        {}
+
+        double epsilon() const { return epsilon_; }
+        double sigma  () const { return sigma_; }
+     // Return the equilibrium distance.
+        double r0() const { return std::pow(2.0, 1.0/6.0)*sigma_; }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2 ) const
+        {
+            FloatType const s2 = sigma2_/rij2;
+            FloatType const s6 = s2*s2*s2;
+            return 4*epsilon_*(s6 - 1)*s6;
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2 ) const
+        {
+            FloatType const s2 = sigma2_/rij2;
+            FloatType const s6 = s2*s2*s2;
+            return 24*epsilon_*(1 - 2*s6)*s6/rij2;
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Morse potential
+ //   V(r) = D*[ (1 - exp(-a*(r - r0)))**2 - 1 ]
+    class Morse
+    {
+        double D_;
+        double a_;
+        double r0_;
+      public:
+        Morse( double D=1.0, double a=1.0, double r0=1.0 )
+          : D_(D), a_(a), r0_(r0)
+        {}
+
+        double D () const { return D_; }
+        double a () const { return a_; }
+     // Return the equilibrium distance.
+        double r0() const { return r0_; }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2 ) const
+        {
+            FloatType const x = 1 - std::exp( -a_*(std::sqrt(rij2) - r0_) );
+            return D_*(x*x - 1);
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2 ) const
+        {
+            FloatType const r = std::sqrt(rij2);
+            FloatType const e = std::exp( -a_*(r - r0_) );
+            return 2*D_*a_*e*(1 - e)/r;
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Weeks-Chandler-Andersen potential: the repulsive part of the Lennard-Jones
+ // potential, truncated at its minimum r0 = 2**(1/6)*sigma and shifted up by
+ // epsilon.
+ //   V(r) = 4*epsilon*[ (sigma/r)**12 - (sigma/r)**6 ] + epsilon,  r < r0
+ //        = 0                                                   ,  r >= r0
+    class WCA
+    {
+        LJ lj_;
+        double r02_;
+      public:
+        WCA( double epsilon=1.0, double sigma=1.0 )
+          : lj_(epsilon, sigma), r02_(lj_.r0()*lj_.r0())
+        {}
+
+        double epsilon() const { return lj_.epsilon(); }
+        double sigma  () const { return lj_.sigma(); }
+     // Return the cutoff distance 2**(1/6)*sigma, beyond which the potential vanishes.
+        double r0() const { return lj_.r0(); }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2 ) const
+        {
+            if( rij2 >= r02_ )
+                return 0;
+            return lj_.energy(rij2) + (FloatType)lj_.epsilon();
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2 ) const
+        {
+            if( rij2 >= r02_ )
+                return 0;
+            return lj_.force_factor(rij2);
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Soft sphere potential
+ //   V(r) = epsilon*(sigma/r)**n
+    class SoftSphere
+    {
+        double epsilon_;
+        double sigma_;
+        double n_;
+        double sigma2_;
+      public:
+        SoftSphere( double epsilon=1.0, double sigma=1.0, double n=12.0 )
+          : epsilon_(epsilon), sigma_(sigma), n_(n), sigma2_(sigma*sigma)
+        {}
+
+        double epsilon() const { return epsilon_; }
+        double sigma  () const { return sigma_; }
+        double n      () const { return n_; }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2 ) const
+        {
+            return epsilon_*std::pow( sigma2_/rij2, 0.5*n_ );
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2 ) const
+        {
+            return -n_*epsilon_*std::pow( sigma2_/rij2, 0.5*n_ )/rij2;
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Tabulated potential: energy and force factor are interpolated piecewise by
+ // polynomials on a uniform grid in rij2 in [rij2_min, rij2_max]. On interval k
+ //   V = c[4k] + t*(c[4k+1] + t*(c[4k+2] + t*c[4k+3])),  t = (rij2 - rij2_min)/h - k
+ // Below rij2_min the first interval is extrapolated, beyond rij2_max energy
+ // and force factor are zero. The coefficients are computed by the Python class
+ // et_md2.potentials.TabulatedPotential.
+    class Tabulated
+    {
+        double rij2_min_;
+        double rij2_max_;
+        double inv_h_;
+        long nintervals_;
+        std::vector<double> energy_;
+        std::vector<double> force_factor_;
+
+        template<typename FloatType>
+        FloatType interpolate_( std::vector<double> const & c, FloatType rij2 ) const
+        {
+            if( rij2 >= rij2_max_ )
+                return 0;
+            double const x = (rij2 - rij2_min_)*inv_h_;
+            long const k = std::min( std::max( (long)std::floor(x), 0L ), nintervals_ - 1 );
+            double const t = x - k;
+            double const * ck = &c[4*k];
+            return ck[0] + t*(ck[1] + t*(ck[2] + t*ck[3]));
+        }
+
+      public:
+        Tabulated
+          ( double rij2_min
+          , double rij2_max
+          , std::vector<double> const & energy       // coefficients, 4 per interval
+          , std::vector<double> const & force_factor // coefficients, 4 per interval
+          )
+          : rij2_min_(rij2_min), rij2_max_(rij2_max)
+          , nintervals_( energy.size()/4 )
+          , energy_(energy), force_factor_(force_factor)
+        {
+            if( nintervals_ < 1 || energy.size() != 4*(std::size_t)nintervals_ || force_factor.size() != energy.size() )
+                throw std::runtime_error("Tabulated: expecting two coefficient arrays of the same shape (n-1,4).");
+            inv_h_ = nintervals_/(rij2_max - rij2_min);
+        }
+
+        double rij2_min() const { return rij2_min_; }
+        double rij2_max() const { return rij2_max_; }
+        std::size_t n() const { return nintervals_ + 1; }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2 ) const
+        {
+            return interpolate_( energy_, rij2 );
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2 ) const
+        {
+            return interpolate_( force_factor_, rij2 );
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Lennard-Jones potential for a mixture of atom types, with parameters per
+ // pair of types (a,b), truncated at cutoff_ab:
+ //   V_ab(r) = 4*epsilon_ab*[ (sigma_ab/r)**12 - (sigma_ab/r)**6 ],  r < cutoff_ab
+ //           = 0                                                   ,  r >= cutoff_ab
+ // The parameters are stored row-major in arrays with ntypes*ntypes elements.
+    class PairLJ
+    {
+        std::size_t ntypes_;
+        std::vector<double> four_epsilon_;
+        std::vector<double> sigma2_;
+        std::vector<double> cutoff2_;
+      public:
+        PairLJ
+          ( std::size_t ntypes
+          , std::vector<double> const & epsilon // epsilon_ab
+          , std::vector<double> const & sigma   // sigma_ab
+          , std::vector<double> const & cutoff  // cutoff_ab, infinity for no cutoff
+          )
+          : ntypes_(ntypes)
+          , four_epsilon_(epsilon), sigma2_(sigma), cutoff2_(cutoff)
+        {
+            std::size_t const n2 = ntypes*ntypes;
+            if( epsilon.size() != n2 || sigma.size() != n2 || cutoff.size() != n2 )
+                throw std::runtime_error("PairLJ: expecting parameter arrays with shape (ntypes,ntypes).");
+            for( std::size_t a=0; a<ntypes; ++a )
+                for( std::size_t b=a+1; b<ntypes; ++b )
+                    if( epsilon[a*ntypes+b] != epsilon[b*ntypes+a]
+                     || sigma  [a*ntypes+b] != sigma  [b*ntypes+a]
+                     || cutoff [a*ntypes+b] != cutoff [b*ntypes+a] )
+                        throw std::invalid_argument("PairLJ: expecting symmetric parameter arrays.");
+            for( std::size_t k=0; k<n2; ++k ) {
+                four_epsilon_[k] *= 4;
+                sigma2_[k] *= sigma2_[k];
+                cutoff2_[k] *= cutoff2_[k];
+            }
+        }
+
+        std::size_t ntypes() const { return ntypes_; }
+
+     // Throw std::out_of_range if ti or tj is not a valid atom type. The
+     // kernels validate the atom types once, energy() and force_factor() do not.
+        void validate_types( std::int32_t ti, std::int32_t tj ) const
+        {
+            if( ti < 0 || (std::size_t)ti >= ntypes_ || tj < 0 || (std::size_t)tj >= ntypes_ )
+                throw std::out_of_range("Atom type out of range.");
+        }
+
+        template<typename FloatType>
+        FloatType energy( FloatType rij2, std::int32_t ti, std::int32_t tj ) const
+        {
+            std::size_t const k = ti*ntypes_ + tj;
+            if( rij2 >= cutoff2_[k] )
+                return 0;
+            FloatType const s2 = sigma2_[k]/rij2;
+            FloatType const s6 = s2*s2*s2;
+            return four_epsilon_[k]*(s6 - 1)*s6;
+        }
+
+        template<typename FloatType>
+        FloatType force_factor( FloatType rij2, std::int32_t ti, std::int32_t tj ) const
+        {
+            std::size_t const k = ti*ntypes_ + tj;
+            if( rij2 >= cutoff2_[k] )
+                return 0;
+            FloatType const s2 = sigma2_[k]/rij2;
+            FloatType const s6 = s2*s2*s2;
+            return 6*four_epsilon_[k]*(1 - 2*s6)*s6/rij2;
+        }
+    };
+
+ //-----------------------------------------------------------------------------
+ // Energy and force factor of the pair (i,j) with atom types types[i] and
+ // types[j]. The generic versions ignore the atom types, types may be nullptr.
+    template<typename Potential, typename FloatType>
+    FloatType pair_energy
+      ( Potential const & potential, FloatType rij2
+      , std::int32_t const *, std::size_t, std::size_t
+      )
+    {
+        return potential.energy(rij2);
+    }
+
+    template<typename Potential, typename FloatType>
+    FloatType pair_force_factor
+      ( Potential const & potential, FloatType rij2
+      , std::int32_t const *, std::size_t, std::size_t
+      )
+    {
+        return potential.force_factor(rij2);
+    }
+
+    template<typename FloatType>
+    FloatType pair_energy
+      ( PairLJ const & potential, FloatType rij2
+      , std::int32_t const * types, std::size_t i, std::size_t j
+      )
+    {
+        return potential.energy( rij2, types[i], types[j] );
+    }
+
+    template<typename FloatType>
+    FloatType pair_force_factor
+      ( PairLJ const & potential, FloatType rij2
+      , std::int32_t const * types, std::size_t i, std::size_t j
+      )
+    {
+        return potential.force_factor( rij2, types[i], types[j] );
+    }
+}// namespace potentials
+
+#endif // POTENTIALS_HPP
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module et_md2.spatial_sorting
+=============================
+
+A submodule for spatial sorting along a Hilbert curve. The Hilbert curve
+maps the cells of a 3D grid on a 1D sequence, such that cells that are
+close in the sequence are also close in space.
+
+The computational work is done by the C++ module et_md2.spatial_sorting.cpp.
+
+"""
+import numpy as np
+
+
+def build_verlet_list(r, vl):
+    """Build a C++ Verlet list from a cell list ordered along a Hilbert curve.
+
+    The atoms are binned in cells at least ``vl.list_cutoff()`` wide, and the
+    cells are visited in the order of the Hilbert curve, which improves the
+    cache locality of the build for large systems.
+
+    :param np.ndarray r: atom coordinates, r.shape = (n,3), dtype float32 or float64.
+    :param vl: et_md2.verletlist.c_vl.VL object, which is built from scratch.
+    """
+    import et_md2.spatial_sorting.cpp
+
+    if r.dtype == np.float64:
+        et_md2.spatial_sorting.cpp.build_vl_float64(r, vl)
+    elif r.dtype == np.float32:
+        et_md2.spatial_sorting.cpp.build_vl_float32(r, vl)
+    else:
+        raise TypeError(f"Expecting float32 or float64 positions, got `{r.dtype}`.")
+
+
+def hilbert_keys(r, cell_width):
+    """Return the Hilbert indices of the cells of the atoms.
+
+    The bounding box of the atoms is divided in cubic cells of width cell_width,
+    which is increased if necessary to have no more than
+    ``cpp.cell_index_limit()`` cells in each direction.
+
+    :param np.ndarray r: atom coordinates, r.shape = (n,3), dtype float32 or float64.
+    :param float cell_width: width of the cells.
+    :return: 1D numpy array with dtype int64.
+    """
+    import et_md2.spatial_sorting.cpp
+
+    if not r.dtype in (np.float32, np.float64):
+        raise TypeError(f"Expecting float32 or float64 positions, got `{r.dtype}`.")
+    h = np.empty(r.shape[0], dtype=np.int64)
+    if not len(h):
+        return h
+    lower = r.min(axis=0)
+    extent = float(np.max(r.max(axis=0) - lower))
+    # the largest cell index must be less than cell_index_limit()
+    w = max(cell_width, extent / (et_md2.spatial_sorting.cpp.cell_index_limit() - 1))
+    rw = np.ascontiguousarray(r - lower)
+    if r.dtype == np.float64:
+        et_md2.spatial_sorting.cpp.rw2h_float64(rw, w, h)
+    else:
+        et_md2.spatial_sorting.cpp.rw2h_float32(rw, w, h)
+    return h
+
+
+def hilbert_order(r, cell_width):
+    """Return the permutation that sorts the atoms along a Hilbert curve.
+
+    Atoms in the same cell keep their relative order.
+
+    :param np.ndarray r: atom coordinates, r.shape = (n,3), dtype float32 or float64.
+    :param float cell_width: width of the cells, see :py:func:`hilbert_keys`.
+    :return: integer numpy array perm, such that r[perm] is sorted.
+    """
+    import et_md2.spatial_sorting.cpp
+
+    h = hilbert_keys(r, cell_width)
+    perm = np.empty(len(h), dtype=np.uint32)
+    if len(h):
+        et_md2.spatial_sorting.cpp.sort(h, perm)
+    return perm.astype(np.intp)
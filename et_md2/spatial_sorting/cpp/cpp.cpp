@@ -0,0 +1,569 @@
+/*
+ *  C++ source file for module et_md2.spatial_sorting.cpp
+ *  Created on: 15 Sep 2016
+ *      Author: etijskens
+ *
+ * Python wrapper for hilbert indices, spatial sorting, and for building
+ * Verlet lists from a cell list ordered along a Hilbert curve.
+ * The hilbert code is in et_md2/cpp/spatial_sorting, as recuperated from hpc-tnt-1.2 (2016)
+ */
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+namespace py = pybind11;
+
+// include source code
+#include "hilbert_c.cpp"
+#include "hilbert.cpp"
+
+// some abbreviations:
+typedef hilbert::HilbertIndex_t H_t; // type for hilbert indices
+typedef hilbert::I_t            I_t; // type for indexing arrays
+
+// common code for dealing with numpy arrays
+#include "ArrayInfo.hpp"
+// Verlet list
+#include "vl.hpp"
+
+#include <limits>
+#include <vector>
+#include <algorithm>
+// for debugging mainly
+#include <iostream>
+#include <cassert>
+
+// convert 3D positions (numpy arrays) to hilbert indices
+void xyzw2h_float64
+  ( py::array_t<double> x // in
+  , py::array_t<double> y // in
+  , py::array_t<double> z // in
+  ,             double  w // in
+  , py::array_t<H_t   > h // out
+  )
+{
+    ArrayInfo<double,1> ax(x), ay(y), az(z);
+    ArrayInfo<H_t   ,1> ah(h);
+    ax.assert_identical_shape(ay);
+    ax.assert_identical_shape(az);
+    ax.assert_identical_shape(ah);
+ /*
+    double const *ptrx = ax.cdata();
+    double const *ptry = ay.cdata();
+    double const *ptrz = az.cdata();
+    H_t          *ptrh = ah.data();
+
+    I_t n = ax.shape(0);
+
+    for( I_t i=0; i<n; i++ ) {
+        ptrh[i] = hilbert::xyzw2h(ptrx[i],ptry[i],ptrz[i],w);
+    }
+  */
+    I_t const n = ax.shape(0);
+    for( I_t i=0; i<n; i++ ) {
+        ah[i] = hilbert::xyzw2h(ax[i],ay[i],az[i],w);
+    }
+}
+
+void rw2h_float64
+  ( py::array_t<double> r // in
+  ,             double  w // in
+  , py::array_t<H_t   > h // out
+  )
+{
+    ArrayInfo<double,2> ar(r);
+    ArrayInfo<H_t   ,1> ah(h);
+
+    I_t const n = ar.shape(0);
+    I_t const m = ar.shape(1);
+    for( I_t i=0; i<n; i++ ) {
+        ah[i] = hilbert::rw2h(&ar[m*i], w);
+//        std::cout<<"rw2h_float64 "<<i<<" ["<<p[0]<<" "<<p[1]<<" "<<p[2]<<"] ->"<<ah[i]<<std::endl;
+    }
+}
+
+void xyzw2h_float32
+  ( py::array_t<float> x
+  , py::array_t<float> y
+  , py::array_t<float> z
+  ,             float  w
+  , py::array_t<H_t>   h
+  )
+{
+    ArrayInfo<float,1> ax(x), ay(y), az(z);
+    ArrayInfo<H_t  ,1> ah(h);
+    ax.assert_identical_shape(ay);
+    ax.assert_identical_shape(az);
+    ax.assert_identical_shape(ah);
+
+    I_t const n = ax.shape(0);
+    for( I_t i=0; i<n; i++ ) {
+        ah[i] = hilbert::xyzw2h(ax[i],ay[i],az[i],w);
+    }
+}
+
+void rw2h_float32
+  ( py::array_t<float> r // in
+  ,             float  w // in
+  , py::array_t<H_t  > h // out
+  )
+{
+    ArrayInfo<float,2> ar(r);
+    ArrayInfo<H_t  ,1> ah(h);
+
+    I_t const n = ar.shape(0);
+    I_t const m = ar.shape(1);
+    for( I_t i=0; i<n; i++ ) {
+        ah[i] = hilbert::rw2h(&ar[m*i], w);
+//        std::cout<<"rw2h_float32 "<<i<<" ["<<p[0]<<" "<<p[1]<<" "<<p[2]<<"] ->"<<ah[i]<<std::endl;
+    }
+}
+
+void xyzw2ijkh_float64
+  ( py::array_t<double> x // in
+  , py::array_t<double> y // in
+  , py::array_t<double> z // in
+  ,             double  w // in
+  , py::array_t<int>    i // out
+  , py::array_t<int>    j // out
+  , py::array_t<int>    k // out
+  , py::array_t<H_t>    h // out
+  )
+{
+    ArrayInfo<double,1> ax(x), ay(y), az(z);
+    ArrayInfo<int   ,1> ai(i), aj(j), ak(k);
+    ArrayInfo<H_t   ,1> ah(h);
+    ax.assert_identical_shape(ay);
+    ax.assert_identical_shape(az);
+    ax.assert_identical_shape(ai);
+    ax.assert_identical_shape(aj);
+    ax.assert_identical_shape(ak);
+    ax.assert_identical_shape(ah);
+
+    I_t const n = ax.shape(0);
+    for( I_t ip=0; ip<n; ip++ ) {
+        hilbert::xyzw2ijkh_float64( ax[ip], ay[ip], az[ip], w, ai[ip], aj[ip], ak[ip], ah[ip]);
+    }
+}
+
+void xyzw2ijkh_float32
+  ( py::array_t<float> x // in
+  , py::array_t<float> y // in
+  , py::array_t<float> z // in
+  ,             float  w // in
+  , py::array_t<int>   i // out
+  , py::array_t<int>   j // out
+  , py::array_t<int>   k // out
+  , py::array_t<H_t>   h // out
+  )
+{
+    ArrayInfo<float,1> ax(x), ay(y), az(z);
+    ArrayInfo<int  ,1> ai(i), aj(j), ak(k);
+    ArrayInfo<H_t  ,1> ah(h);
+    ax.assert_identical_shape(ay);
+    ax.assert_identical_shape(az);
+    ax.assert_identical_shape(ai);
+    ax.assert_identical_shape(aj);
+    ax.assert_identical_shape(ak);
+    ax.assert_identical_shape(ah);
+
+    I_t const n = ax.shape(0);
+    for( I_t ip=0; ip<n; ip++ ) {
+        hilbert::xyzw2ijkh_float32( ax[ip], ay[ip], az[ip], w, ai[ip], aj[ip], ak[ip], ah[ip]);
+    }
+}
+
+void rw2ch_float64
+  ( py::array_t<double> r // in
+  ,             double  w // in
+  , py::array_t<int>    c // out
+  , py::array_t<H_t>    h // out
+  )
+{
+    ArrayInfo<double,2> ar(r);
+    ArrayInfo<int   ,2> ac(c);
+    ArrayInfo<H_t   ,1> ah(h);
+
+    I_t const n = ar.shape(0);
+    for( I_t ip=0; ip<n; ip++ ) {
+        double const * p = &ar[3*ip];
+        hilbert::rw2ch_float64( p, w, &ac[3*ip], ah[ip]);
+    }
+}
+
+void rw2ch_float32
+  ( py::array_t<float> r // in
+  ,             float  w // in
+  , py::array_t<int>   c // out
+  , py::array_t<H_t>   h // out
+  )
+{
+    ArrayInfo<float,2> ar(r);
+    ArrayInfo<int  ,2> ac(c);
+    ArrayInfo<H_t  ,1> ah(h);
+
+    I_t const n = ar.shape(0);
+    for( I_t ip=0; ip<n; ip++ ) {
+        hilbert::rw2ch_float32( &ar[3*ip], w, &ac[3*ip], ah[ip]);
+    }
+}
+
+void sort
+  ( py::array_t<H_t> h
+  , py::array_t<I_t> I
+  )
+{
+    ArrayInfo<H_t,1> ah(h);
+    ArrayInfo<I_t,1> aI(I);
+    hilbert::radix_sort( ah.shape(0), ah.data(), aI.data() );
+}
+
+void reorder_float64
+  ( py::array_t<I_t> I
+  , py::array_t<double> told
+  , py::array_t<double> tnew
+  )
+{
+    ArrayInfo<I_t   ,1> aI(I);
+    ArrayInfo<double,1> atold(told), atnew(tnew);
+
+    hilbert::reorder( aI.shape(0), aI.cdata(), atold.data(), atnew.data() );
+}
+
+void reorder2_float64
+  ( py::array_t<I_t> I
+  , py::array_t<double> told
+  , py::array_t<double> tnew
+  )
+{
+    ArrayInfo<I_t   ,1> aI(I);
+    ArrayInfo<double,2> atold(told), atnew(tnew);
+
+    hilbert::reorder2( atold.shape(0), atold.shape(1)
+                     , aI.cdata(), atold.data(), atnew.data() );
+}
+
+void reorder_float32
+  ( py::array_t<I_t> I
+  , py::array_t<float> told
+  , py::array_t<float> tnew
+  )
+{
+    ArrayInfo<I_t   ,1> aI(I);
+    ArrayInfo<float,1> atold(told), atnew(tnew);
+
+    hilbert::reorder( aI.shape(0), aI.cdata(), atold.data(), atnew.data() );
+}
+
+void reorder_int32
+  ( py::array_t<I_t> I
+  , py::array_t<int> told
+  , py::array_t<int> tnew
+  )
+{
+    ArrayInfo<I_t,1> aI(I);
+    ArrayInfo<int,1> atold(told), atnew(tnew);
+
+    hilbert::reorder( aI.shape(0), aI.cdata(), atold.data(), atnew.data() );
+}
+
+void reorder_uint32
+  ( py::array_t<I_t> I
+  , py::array_t<unsigned int> told
+  , py::array_t<unsigned int> tnew
+  )
+{
+    ArrayInfo<I_t,1> aI(I);
+    ArrayInfo<unsigned int,1> atold(told), atnew(tnew);
+
+    hilbert::reorder( aI.shape(0), aI.cdata(), atold.data(), atnew.data() );
+}
+
+void reorder_longlongint
+  ( py::array_t<I_t> I
+  , py::array_t<long long int> told
+  , py::array_t<long long int> tnew
+  )
+{
+    ArrayInfo<I_t,1> aI(I);
+    ArrayInfo<long long int,1> atold(told), atnew(tnew);
+
+    hilbert::reorder( aI.shape(0), aI.cdata(), atold.data(), atnew.data() );
+}
+
+inline H_t
+ijk2h_1( py::array_t<int> ijk )
+{
+    ArrayInfo<int,1> aijk(ijk);
+
+    int const *ptr_ijk = aijk.cdata();
+    if( hilbert::is_valid_ijk(ptr_ijk) ) {
+        H_t h = hilbert::ijk2h(ptr_ijk[0],ptr_ijk[1],ptr_ijk[2]);
+        return h;
+    } else {
+        return -1;
+    }
+}
+
+inline bool
+h2ijk_1( H_t const h, py::array_t<int> ijk )
+{
+    ArrayInfo<int,1> aijk(ijk);
+    int *ptr_ijk = aijk.data();
+    if( hilbert::is_valid_h(h) ) {
+        hilbert::h2ijk(h,aijk.data());
+        return true;
+    } else {
+        return false;
+    }
+}
+
+void
+h2ijk( H_t const h, py::array_t<int> ijk )
+{
+    ArrayInfo<int,1> aijk(ijk);
+    assert(aijk.shape(0)==3);
+//    std::cout<<"h2ijk: h="<<h<<", ijk=["<<aijk[0]<<' '<<aijk[1]<<' '<<aijk[2]<<"]"<<std::endl;
+    hilbert::h2ijk(h, aijk.data());
+//    std::cout<<"h2ijk: h="<<h<<", ijk=["<<aijk[0]<<' '<<aijk[1]<<' '<<aijk[2]<<"] !!"<<std::endl;
+}
+
+void
+build_hl
+  ( py::array_t<H_t> h          // in
+  , py::array_t<I_t> hl_offset  // out
+  , py::array_t<I_t> hl_natoms  // out
+  )
+{
+    ArrayInfo<H_t,1> a_h(h);
+    ArrayInfo<I_t,1> a_hl_offset(hl_offset);
+    ArrayInfo<I_t,1> a_hl_natoms(hl_natoms);
+
+    std::size_t natoms = a_h.shape(0);
+    std::size_t ncells = a_hl_offset.shape(0);
+    std::size_t ia0 = 0;
+    std::size_t ia  = 0;
+    for( std::size_t hi=0; hi<ncells; ++hi )
+    {
+        while( ia < natoms && a_h[ia] == hi ) {
+            ++ia;
+        }
+        a_hl_offset[hi] = ia0;
+        a_hl_natoms[hi] = ia - ia0;
+        ia0 = ia;
+        if( ia >= natoms ) {
+            break;
+        }
+    }
+}
+
+
+// Build a Verlet list from a cell list ordered along a Hilbert curve.
+// The atoms are binned in cells at least vl.list_cutoff() wide, the cells are
+// numbered by their Hilbert index, and the atoms are sorted by Hilbert index.
+// The cells are visited in Hilbert order, and for each cell the pairs in the
+// cell itself and with the 13 neighbouring cells of a half stencil are examined.
+// Thus, atoms that are close in space are also processed close in time.
+// The pairs (i,j) are added as i<j, in the original atom numbering, and also
+// as (j,i) if vl is a full Verlet list. If vl has a periodic box, the cells span
+// the box, the neighbouring cells wrap around it, and the pairs are found with
+// the minimum image convention.
+template<typename FloatType, typename VLType>
+void
+build_vl
+  ( carray_t<FloatType> r  // in
+  , VLType&             vl // out
+  )
+{
+    ArrayInfo<FloatType,2> a_r = positions_info(r);
+    std::size_t const natoms = a_r.shape(0);
+    FloatType const * pr = a_r.cdata();
+
+ // the box spanned by the cells: the periodic box of the Verlet list, or the
+ // bounding box of the atoms
+    bool const pbc = vl.periodic();
+    double lower[3], upper[3];
+    if( pbc ) {
+        for( std::size_t d=0; d<3; ++d ) {
+            lower[d] = vl.box_lower()[d];
+            upper[d] = lower[d] + vl.box_width()[d];
+        }
+    } else {
+        for( std::size_t d=0; d<3; ++d ) {
+            lower[d] = ( natoms ? pr[d] : 0.0 );
+            upper[d] = lower[d];
+        }
+        for( std::size_t i=1; i<natoms; ++i ) {
+            for( std::size_t d=0; d<3; ++d ) {
+                lower[d] = std::min( lower[d], (double)pr[3*i+d] );
+                upper[d] = std::max( upper[d], (double)pr[3*i+d] );
+            }
+        }
+    }
+ // Number of cells in each direction. The cells are at least vl.list_cutoff()
+ // wide, and there are at most hilbert::cell_index_limit() cells in each direction.
+    int K[3];
+    double inv_width[3];
+    for( std::size_t d=0; d<3; ++d ) {
+        double const w = upper[d] - lower[d];
+        long k = std::max( 1L, (long)std::floor( w/vl.list_cutoff() ) );
+        K[d] = (int)std::min( k, (long)hilbert::cell_index_limit() );
+        inv_width[d] = ( w > 0 ? K[d]/w : 0.0 );
+    }
+    if( pbc && ( K[0] < 3 || K[1] < 3 || K[2] < 3 ) ) {
+     // the neighbouring cells of a cell are not all different
+        vl.build_simple( pr, natoms );
+        return;
+    }
+ // Hilbert index of the cell of each atom
+    std::vector<H_t> h(natoms);
+    #pragma omp parallel for schedule(static)
+    for( long i=0; i<(long)natoms; ++i ) {
+        int ijk[3];
+        for( std::size_t d=0; d<3; ++d ) {
+            int c = (int)std::floor( (pr[3*i+d] - lower[d])*inv_width[d] );
+            if( pbc )
+                ijk[d] = ( c%K[d] + K[d] )%K[d];
+            else
+                ijk[d] = std::min( std::max( c, 0 ), K[d] - 1 );
+        }
+        h[i] = hilbert::ijk2h(ijk);
+    }
+ // sort the atoms by Hilbert index, I[ia] is the ia-th atom in Hilbert order
+    std::vector<I_t> I(natoms);
+    if( natoms )
+        hilbert::radix_sort( natoms, h.data(), I.data() );
+
+ // Hilbert list: the Hilbert index, offset and number of atoms (in the sorted
+ // order) of the non-empty cells. This is a run-length encoding of the sorted
+ // h, hence its size is O(natoms), however sparse the cells are.
+    std::vector<H_t>         hl_h;
+    std::vector<std::size_t> hl_offset;
+    std::vector<std::size_t> hl_natoms;
+    for( std::size_t ia=0; ia<natoms; ++ia ) {
+        if( hl_h.empty() || h[ia] != hl_h.back() ) {
+            hl_h.push_back(h[ia]);
+            hl_offset.push_back(ia);
+            hl_natoms.push_back(0);
+        }
+        ++hl_natoms.back();
+    }
+    std::size_t const ncells = hl_h.size();
+
+    int const ijk_delta[13][3] = { { 1, 0, 0} // x-direction
+                                 , {-1, 1, 0} // y-direction
+                                 , { 0, 1, 0}
+                                 , { 1, 1, 0}
+                                 , {-1,-1, 1} // z-direction
+                                 , { 0,-1, 1}
+                                 , { 1,-1, 1}
+                                 , {-1, 0, 1}
+                                 , { 0, 0, 1}
+                                 , { 1, 0, 1}
+                                 , {-1, 1, 1}
+                                 , { 0, 1, 1}
+                                 , { 1, 1, 1}
+                                 };
+    double const cutoff2 = vl.list_cutoff()*vl.list_cutoff();
+    auto add_if_near = [&]( std::size_t i, std::size_t j )
+    {
+        double rij[3];
+        for( std::size_t k=0; k<3; ++k )
+            rij[k] = pr[3*j+k] - pr[3*i+k];
+        vl.minimum_image(rij);
+        double const rij2 = rij[0]*rij[0] + rij[1]*rij[1] + rij[2]*rij[2];
+        if( rij2 <= cutoff2 ) {
+            if( i < j ) vl.add(i,j);
+            else        vl.add(j,i);
+            if( vl.full() ) {
+                if( i < j ) vl.add(j,i);
+                else        vl.add(i,j);
+            }
+        }
+    };
+
+    vl.reset(natoms);
+ // Loop over all non-empty cells, in Hilbert order:
+    for( std::size_t c=0; c<ncells; ++c )
+    {
+        H_t const h_central = hl_h[c];
+        std::size_t const offset_central = hl_offset[c];
+        std::size_t const natoms_central = hl_natoms[c];
+     // central-central pairs
+        for( std::size_t ia=offset_central; ia<offset_central+natoms_central; ++ia )
+            for( std::size_t ja=ia+1; ja<offset_central+natoms_central; ++ja )
+                add_if_near( I[ia], I[ja] );
+
+     // central-neighbour pairs
+        int ijk_central[3];
+        hilbert::h2ijk(h_central, ijk_central);
+        for( std::size_t nb=0; nb<13; ++nb )
+        {
+            int ijk_nb[3];
+            bool inside = true;
+            for( std::size_t d=0; d<3; ++d ) {
+                ijk_nb[d] = ijk_central[d] + ijk_delta[nb][d];
+                if( pbc ) // wrap around the periodic box
+                    ijk_nb[d] = ( ijk_nb[d] + K[d] )%K[d];
+                inside = inside && -1 < ijk_nb[d] && ijk_nb[d] < K[d];
+            }
+            if( !inside )
+                continue; // the cell is outside the box
+            H_t const h_nb = hilbert::ijk2h(ijk_nb);
+            std::size_t const c_nb = std::lower_bound( hl_h.begin(), hl_h.end(), h_nb ) - hl_h.begin();
+            if( c_nb == ncells || hl_h[c_nb] != h_nb )
+                continue; // the cell is empty
+            std::size_t const offset_nb = hl_offset[c_nb];
+            std::size_t const natoms_nb = hl_natoms[c_nb];
+            for( std::size_t ia=offset_central; ia<offset_central+natoms_central; ++ia )
+                for( std::size_t ja=offset_nb; ja<offset_nb+natoms_nb; ++ja )
+                    add_if_near( I[ia], I[ja] );
+        }// end loop over neighbour cells
+    }// end loop over cells
+    vl.linearise(false);
+    vl.set_reference(pr, natoms);
+}
+
+PYBIND11_MODULE(cpp, m)
+{// optional module doc-string
+    m.doc() = "C++ implementation of et_md2.spatial_sorting"; // optional module docstring
+
+    m.def("xyzw2h_float64", xyzw2h_float64 ); // 3D positions to hilbert index of the corresponding cell with width w.
+    m.def("xyzw2h_float32", xyzw2h_float32 ); // 3D positions to hilbert index of the corresponding cell with width w.
+
+    m.def("xyzw2ijkh_float32", xyzw2ijkh_float32 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
+    m.def("xyzw2ijkh_float64", xyzw2ijkh_float64 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
+
+    m.def(  "rw2h_float64",   rw2h_float64 ); // 3D positions to hilbert index of the corresponding cell with width w.
+    m.def(  "rw2h_float32",   rw2h_float32 ); // 3D positions to hilbert index of the corresponding cell with width w.
+
+    m.def("rw2ch_float64", rw2ch_float64 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
+    m.def("rw2ch_float32", rw2ch_float32 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
+
+    m.def("sort"  , sort   ); // sort the hilbert indices and produce reordering array.
+    m.def("reorder_float32"     , reorder_float32);
+    m.def("reorder_float64"     , reorder_float64);
+    m.def("reorder_int32"       , reorder_int32  );
+    m.def("reorder_uint32"      , reorder_uint32 );
+    m.def("reorder_longlongint" , reorder_longlongint );
+    m.def("reorder2_float64"    , reorder2_float64);
+
+    m.def("ijk2h_1",ijk2h_1);
+    m.def("h2ijk_1",h2ijk_1);
+    m.def("h2ijk",h2ijk);
+
+    m.def("info",hilbert::info);
+    m.def("cell_index_limit",hilbert::cell_index_limit);
+    m.def("hilbert_index_limit",hilbert::hilbert_index_limit);
+    m.def("validate_cell_index",hilbert::validate_cell_index);
+    m.def("validate_hilbert_index",hilbert::validate_hilbert_index);
+    m.def("is_validating",hilbert::is_validating);
+    m.def("is_valid_ijk",hilbert::is_valid_ijk);
+    m.def("is_valid_i",hilbert::is_valid_i);
+    m.def("is_valid_h",hilbert::is_valid_h);
+
+    m.def("build_hl", build_hl);
+    m.def("build_vl_float32", build_vl<float ,VL  >);
+    m.def("build_vl_float32", build_vl<float ,VL64>);
+    m.def("build_vl_float64", build_vl<double,VL  >);
+    m.def("build_vl_float64", build_vl<double,VL64>);
+}
\ No newline at end of file
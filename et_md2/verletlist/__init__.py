@@ -41,11 +41,32 @@ def implementation(impl=None):
 # This is the Python implementation
 class VL:
     nneighbours = 20  # initial size of the Verlet lists. They grow dynamically as needed.
+    block_size = 2**22  # maximum number of pair distances per block in build_vectorized().
 
-    def __init__(self, cutoff=1.0):
+    def __init__(self, cutoff=1.0, skin=0.0, index_dtype=None, full=False):
         """Verlet lists of a number of atoms.
 
         :param float cutoff: cutoff distance
+        :param float skin: skin distance. The Verlet lists are built with a cutoff
+            distance of cutoff + skin. They remain valid until an atom has moved
+            more than skin/2, see ``needs_rebuild()``. Pairs farther apart than
+            cutoff are ignored when computing interactions.
+        :param index_dtype: integer type of the atom indices in ``vl_list`` and
+            of the Verlet list sizes ``vl_size``, ``np.int32`` or ``np.int64``.
+            If None, ``np.int32`` is used if there are less than 2**31 atoms,
+            and ``np.int64`` otherwise. The offsets ``vl_offset`` are always
+            ``np.int64``, because the number of pairs is much larger than the
+            number of atoms.
+        :param bool full: if False, the Verlet list is a half Verlet list, which
+            stores each pair (i,j) once, as j in the Verlet list of atom i, with
+            i < j. If True, it is a full Verlet list, which stores each pair in
+            the Verlet lists of both atoms. The interactions of a full Verlet
+            list are computed without Newton's third law, i.e. the force of pair
+            (i,j) is only added to atom i.
+
+        The Verlet list can have a periodic box, see ``set_box()``. Then the
+        pairs are found with the minimum image convention, when building the
+        Verlet list as well as when computing the interactions.
 
         The initial data structure is a 2D integer numpy array. There is one
         row for each atom. Each row starts with the number of neighbours,
@@ -67,8 +88,19 @@ class VL:
         *   cl_offset : 1D numpy array containing the starting position of all the
                       Verlet lists in the cl_list array.
         """
+        if not index_dtype is None and not np.dtype(index_dtype) in (np.int32, np.int64):
+            raise TypeError(f"index_dtype must be np.int32 or np.int64, not {index_dtype}.")
         self.cutoff = cutoff
+        self.skin = skin
+        self.index_dtype = index_dtype
+        self.full = full
+        self.r_ref = None
+        self.lower_corner = None
+        self.box_width = None
         self.vl2d = None
+        self.vl_list = None
+        self.vl_size = None
+        self.vl_offset = None
         self.debug = False
 
 
@@ -89,7 +121,7 @@ class VL:
         """
 
         # the maximum number of elements in a Verlet list cannot exceed natoms -1
-        nneighbours = min(VerletList.nneighbours, natoms - 1)
+        nneighbours = min(VL.nneighbours, natoms - 1)
 
         if hasattr(self, 'vl2d') and not self.vl2d is None:
             # reuse it
@@ -116,11 +148,85 @@ class VL:
             for i in range(natoms):
                 self.vl2d[i] = [0, None]
 
+        self._index_dtype = self.get_index_dtype(natoms)
+
         # garbage collection of the linear data structure
         self.vl_list = None
         self.vl_size = None
         self.vl_offset = None
 
+    def get_index_dtype(self, natoms):
+        """Return the integer type of the atom indices for natoms atoms.
+
+        :raises OverflowError: if the atoms cannot be indexed with ``self.index_dtype``.
+        """
+        if self.index_dtype is None:
+            return np.dtype(np.int32) if natoms < 2**31 else np.dtype(np.int64)
+        dtype = np.dtype(self.index_dtype)
+        if natoms > np.iinfo(dtype).max:
+            raise OverflowError(f"Too many atoms for {dtype} atom indices: {natoms}.")
+        return dtype
+
+    @property
+    def list_cutoff(self):
+        """The cutoff distance used for building the Verlet lists, cutoff + skin."""
+        return self.cutoff + self.skin
+
+    def set_box(self, lower_corner, upper_corner):
+        """Set the periodic box [lower_corner, upper_corner[.
+
+        The pair distances are then computed with the minimum image convention.
+        The Verlet list must be rebuilt afterwards.
+
+        :param lower_corner: lower corner of the box, shape (3,)
+        :param upper_corner: upper corner of the box, shape (3,)
+        :raises ValueError: if the box is less than 2*(cutoff + skin) wide in some
+            direction, because then an atom may interact with more than one image
+            of another atom.
+        """
+        lower_corner = np.array(lower_corner, dtype=float)
+        box_width = np.array(upper_corner, dtype=float) - lower_corner
+        if lower_corner.shape != (3,) or box_width.shape != (3,):
+            raise ValueError("Expecting box corners with 3 coordinates.")
+        if np.any(box_width <= 0):
+            raise ValueError("Expecting upper_corner > lower_corner.")
+        if np.any(box_width < 2 * self.list_cutoff):
+            raise ValueError(f"Periodic box too small for the minimum image convention: "
+                             f"width {box_width} < 2*(cutoff + skin) = {2 * self.list_cutoff}.")
+        self.lower_corner = lower_corner
+        self.box_width = box_width
+        self.r_ref = None # the Verlet list must be rebuilt
+
+    def clear_box(self):
+        """Remove the periodic box."""
+        self.lower_corner = None
+        self.box_width = None
+        self.r_ref = None
+
+    @property
+    def periodic(self):
+        """True if the Verlet list has a periodic box."""
+        return self.box_width is not None
+
+    def set_reference(self, r):
+        """Store a copy of the positions the Verlet list is built from."""
+        self.r_ref = np.array(r)
+
+    def needs_rebuild(self, r):
+        """Test if the Verlet list must be rebuilt.
+
+        That is the case if any atom has moved more than skin/2 since the
+        Verlet list was built, or if the Verlet list was not yet built.
+
+        :param np.ndarray r: current atom coordinates: r.shape = (n,3)
+        """
+        if self.r_ref is None or self.r_ref.shape != r.shape:
+            return True
+        # an atom wrapped to the other side of the box has not moved
+        dr = _minimum_image(r - self.r_ref, self.box_width)
+        dr2_max = np.max(np.einsum('ij,ij->i', dr, dr), initial=0.0)
+        return dr2_max > (0.5 * self.skin) ** 2
+
     def __str__(self):
         s = "verlet lists:\n"
         max_nneighbours = 0
@@ -145,10 +251,10 @@ class VL:
         # Make sure that the Verlet list of atom i can accommodate the extra neighbour:
         if self.vl2d[i][1] is None:
             # allocate initial array
-            self.vl2d[i][1] = np.empty(VerletList.nneighbours, dtype=int)
+            self.vl2d[i][1] = np.empty(VL.nneighbours, dtype=self._index_dtype)
         if n == self.vl2d[i][1].shape[0]:
             # grow current array
-            self.vl2d[i][1] = np.append(self.vl2d[i][1], np.empty(VerletList.nneighbours, dtype=int))
+            self.vl2d[i][1] = np.append(self.vl2d[i][1], np.empty(VL.nneighbours, dtype=self._index_dtype))
 
         # add the neighbour:
         self.vl2d[i][1][n] = j
@@ -167,19 +273,22 @@ class VL:
         y = r[:, 1]
         z = r[:, 2]
         self.allocate_2d(len(x))
-        rc2 = self.cutoff ** 2
+        rc2 = self.list_cutoff ** 2
 
         ri2 = np.empty((self.natoms,), dtype=r.dtype)
         rij = np.empty_like(r)
         for i in range(self.natoms - 1):
-            rij[i + 1:, :] = r[i + 1:, :] - r[i, :]
+            rij[i + 1:, :] = _minimum_image(r[i + 1:, :] - r[i, :], self.box_width)
             if self.debug:
                 ri2 = 0
             ri2[i + 1:] = np.einsum('ij,ij->i', rij[i + 1:, :], rij[i + 1:, :])
             for j in range(i + 1, self.natoms):
                 if ri2[j] <= rc2:
                     self.add(i, j)
+                    if self.full:
+                        self.add(j, i)
         self.linearise(keep2d)
+        self.set_reference(r)
 
     def build_simple(self, r, keep2d=False):
         """Build the Verlet list from the positions.
@@ -190,45 +299,110 @@ class VL:
         :param list r: numpy array with atom coordinates: r.shape = (n,3)
         """
         self.allocate_2d(r.shape[0])
-        rc2 = self.cutoff ** 2
+        rc2 = self.list_cutoff ** 2
         for i in range(self.natoms - 1):
             ri = r[i, :]
             for j in range(i + 1, self.natoms):
                 rj = r[j, :]
-                rij = rj - ri
+                rij = _minimum_image(rj - ri, self.box_width)
                 rij2 = np.dot(rij, rij)
                 if rij2 <= rc2:
                     self.add(i, j)
+                    if self.full:
+                        self.add(j, i)
         self.linearise(keep2d=keep2d)
+        self.set_reference(r)
+
+    def build_vectorized(self, r):
+        """Build the linearised Verlet list directly from the positions.
+
+        Brute force approach, like ``build()``, but the rows are processed in
+        blocks, and the accepted pairs are extracted with ``np.nonzero`` on the
+        distance mask of the block. ``vl_list``, ``vl_size`` and ``vl_offset``
+        are written directly, the 2D data structure is not used. This algorithm
+        has complexity O(N^2), but there are no per pair Python calls.
+
+        The number of rows per block is chosen such that a block has at most
+        ``VL.block_size`` pair distances.
+
+        :param np.ndarray r: numpy array with atom coordinates: r.shape = (n,3)
+        """
+        natoms = r.shape[0]
+        index_dtype = self.get_index_dtype(natoms)
+        rc2 = self.list_cutoff ** 2
+        self.vl2d = None
 
-    def build_grid(self, r, grid, keep2d=False):
+        self.vl_size = np.zeros(natoms, dtype=index_dtype)
+        vl_blocks = []
+        nrows = max(1, VL.block_size // max(natoms, 1))
+        for i0 in range(0, natoms, nrows):
+            i1 = min(i0 + nrows, natoms)
+            # the first column, for a half Verlet list only atoms j >= i0 are needed
+            j0 = 0 if self.full else i0
+            # rij[ib, jb, :] = r[j0 + jb] - r[i0 + ib]
+            rij = _minimum_image(r[np.newaxis, j0:, :] - r[i0:i1, np.newaxis, :], self.box_width)
+            rij2 = np.einsum('ijk,ijk->ij', rij, rij)
+            if self.full:
+                # keep all pairs (i,j) with j != i
+                mask = rij2 <= rc2
+                mask[np.arange(i1 - i0), np.arange(i0, i1)] = False
+            else:
+                # only keep pairs (i,j) with j > i, i.e. jb > ib
+                mask = np.triu(rij2 <= rc2, k=1)
+            ib, jb = np.nonzero(mask) # row-major order, hence sorted by i
+            self.vl_size[i0:i1] = np.bincount(ib, minlength=i1 - i0)
+            vl_blocks.append((jb + j0).astype(index_dtype))
+
+        self.vl_list = np.concatenate(vl_blocks) if vl_blocks else np.empty(0, dtype=index_dtype)
+        self.vl_offset = np.zeros(natoms, dtype=np.int64)
+        np.cumsum(self.vl_size[:-1], out=self.vl_offset[1:])
+        self.set_reference(r)
+
+    def build_grid(self, r, grid):
         """Build Verlet lists using a grid.
 
-        This algorithm has complexity O(N).
+        This algorithm has complexity O(N). For each cell, the pairs in the cell
+        itself and the pairs with the 13 neighbouring cells ahead of it are
+        examined using array arithmetic. The pairs are stored as (i,j) with i < j,
+        and also as (j,i) for a full Verlet list.
 
-        :param list r: list of numpy arrays with atom coordinates: r = [x, y, z]
-       """
-        x = r[0]
-        y = r[1]
-        z = r[2]
+        If the Verlet list has a periodic box, the grid must span that box, and
+        the atoms must be inside it. The neighbouring cells then wrap around the
+        box. If the grid is less than 3 cells wide in some direction,
+        ``build_vectorized()`` is used instead.
+
+        :param np.ndarray r: numpy array with atom coordinates: r.shape = (n,3)
+        :param grid: et_md2.grid.Grid object, built from the same positions.
+        """
         if not grid.linearised():
             raise ValueError("The grid list must be built and linearised first.")
-
-        self.allocate_2d(len(x))
-        rc2 = self.cutoff ** 2
+        if grid.cell_size < self.list_cutoff:
+            raise ValueError(f"The grid cells must be at least {self.list_cutoff} wide (cutoff + skin).")
+
+        if self.periodic and np.any(grid.K < 3):
+            # the neighbouring cells of a cell are not all different
+            self.build_vectorized(r)
+            return
+
+        natoms = r.shape[0]
+        rc2 = self.list_cutoff ** 2
+        box_width = self.box_width
+        pairs_i = []
+        pairs_j = []
         # loop over all cells
         for m in range(grid.K[2]):
             for l in range(grid.K[1]):
                 for k in range(grid.K[0]):
                     cklm = grid.cell_list(k, l, m)
-                    natoms_in_cklm = len(cklm)
-                    # loop over all atom pairs in cklm
-                    for ia in range(natoms_in_cklm):
-                        i = cklm[ia]
-                        for j in cklm[ia + 1:]:
-                            rij2 = (x[j] - x[i]) ** 2 + (y[j] - y[i]) ** 2
-                            if rij2 <= rc2:
-                                self.add(i, j)
+                    if not len(cklm):
+                        continue
+                    rklm = r[cklm]
+                    # all atom pairs in cklm
+                    rij = _minimum_image(rklm[np.newaxis, :, :] - rklm[:, np.newaxis, :], box_width)
+                    rij2 = np.einsum('ijk,ijk->ij', rij, rij)
+                    ia, ja = np.nonzero(np.triu(rij2 <= rc2, k=1))
+                    pairs_i.append(cklm[ia])
+                    pairs_j.append(cklm[ja])
                     # loop over neighbouring cells. If the cell does not exist an IndexError is raised
                     for klm2 in ((k + 1, l, m)  # one ahead in the x-direction
                                  , (k - 1, l + 1, m)  # three ahead in the y-direction
@@ -244,19 +418,28 @@ class VL:
                                  , (k, l + 1, m + 1)
                                  , (k + 1, l + 1, m + 1)
                                  ):
+                        if box_width is not None:
+                            # wrap around the periodic box
+                            klm2 = tuple(np.mod(klm2, grid.K))
                         try:
                             cklm2 = grid.cell_list(*klm2)
                         except IndexError:
                             pass  # Cell kl2 does not exist
                         else:  # The else clause is executed only when the try clause does not raise an error
-                            # loop over all atom pairs i,j with i in cklm and j in cklm2
-                            for i in cklm:
-                                for j in cklm2:
-                                    rij2 = (x[j] - x[i]) ** 2 + (y[j] - y[i]) ** 2
-                                    if rij2 <= rc2:
-                                        self.add(i, j)
-
-        self.linearise(keep2d=keep2d)
+                            # all atom pairs i,j with i in cklm and j in cklm2
+                            rij = _minimum_image(r[cklm2][np.newaxis, :, :] - rklm[:, np.newaxis, :], box_width)
+                            rij2 = np.einsum('ijk,ijk->ij', rij, rij)
+                            ia, ja = np.nonzero(rij2 <= rc2)
+                            pairs_i.append(cklm[ia])
+                            pairs_j.append(cklm2[ja])
+
+        i = np.concatenate(pairs_i) if pairs_i else np.empty(0, dtype=int)
+        j = np.concatenate(pairs_j) if pairs_j else np.empty(0, dtype=int)
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        if self.full:
+            i, j = np.concatenate((i, j)), np.concatenate((j, i))
+        self.linearise_pairs(natoms, i, j)
+        self.set_reference(r)
 
     def linearised(self):
         return not self.vl_list is None
@@ -271,9 +454,9 @@ class VL:
         for i in range(natoms):
             nneighbours_total += self.vl2d[i][0]
 
-        self.vl_size = np.empty(natoms, dtype=int)
-        self.vl_offset = np.empty(natoms, dtype=int)
-        self.vl_list = np.empty(nneighbours_total, dtype=int)
+        self.vl_size = np.empty(natoms, dtype=self._index_dtype)
+        self.vl_offset = np.empty(natoms, dtype=np.int64)
+        self.vl_list = np.empty(nneighbours_total, dtype=self._index_dtype)
 
         offset = 0
         for i in range(natoms):
@@ -287,6 +470,55 @@ class VL:
         if not keep2d:
             self.vl2d = None  # garbage collection takes care of it.
 
+    def linearise_pairs(self, natoms, i, j):
+        """Store a set of pairs as linearised Verlet list.
+
+        Atom j[k] is added to the Verlet list of atom i[k]. The Verlet lists
+        are sorted in ascending order. The 2D Verlet list data structure is
+        not used.
+
+        :param int natoms: number of atoms
+        :param np.ndarray i: 1D integer array
+        :param np.ndarray j: 1D integer array, same length as i.
+        """
+        index_dtype = self.get_index_dtype(natoms)
+        order = np.lexsort((j, i))
+        self.vl2d = None
+        self.vl_list = np.asarray(j)[order].astype(index_dtype)
+        self.vl_size = np.bincount(i, minlength=natoms).astype(index_dtype)
+        self.vl_offset = np.zeros(natoms, dtype=np.int64)
+        np.cumsum(self.vl_size[:-1], out=self.vl_offset[1:])
+
+    def permute(self, perm):
+        """Relabel the atoms of the linearised Verlet list after the atoms have been reordered.
+
+        New atom i is old atom perm[i], as returned by
+        :py:meth:`et_md2.atoms.Atoms.sort_spatially`. The pairs are relabelled
+        with the inverse permutation, the pairs of a half Verlet list are stored
+        again as (i,j) with i < j, and the Verlet lists are sorted, see
+        ``linearise_pairs()``. The reference positions are permuted too. No
+        distances are computed, hence this is much cheaper than a rebuild.
+
+        :param np.ndarray perm: permutation of the atoms, 1D integer array.
+        :raises ValueError: if perm is not a permutation of the atoms.
+        """
+        if not self.linearised():
+            raise ValueError("The Verlet list must be linearised.")
+        natoms = len(self.vl_size)
+        perm = np.asarray(perm)
+        inv = np.full(natoms, -1, dtype=np.intp)
+        if perm.shape == (natoms,) and np.all((0 <= perm) & (perm < natoms)):
+            inv[perm] = np.arange(natoms)
+        if np.any(inv < 0):
+            raise ValueError("Expecting a permutation of the atoms of the Verlet list.")
+        i = inv[np.repeat(np.arange(natoms), self.vl_size)]
+        j = inv[self.vl_list]
+        if not self.full:
+            i, j = np.minimum(i, j), np.maximum(i, j)
+        self.linearise_pairs(natoms, i, j)
+        if self.r_ref is not None and self.r_ref.shape[0] == natoms:
+            self.r_ref = self.r_ref[perm]
+
     def verlet_list(self, i):
         """Return the Verlet list of atom i.
 
@@ -314,23 +546,14 @@ class VL:
     def compute_interaction_forces(self, r, a, potential):
         """Compute interaction forces.
 
+        The pairs are processed in blocks using array arithmetic, see ``compute_forces()``.
+
         :param np.ndarray r: atom position coordinates
         :param np.ndarray a: atom acceleration coordinates
-        :param np.ndarray m: atom masses
-        :param potential: Potential object, must have force_factor(rij2) method.
+        :param potential: Potential object, must have force_factor(rij2) method,
+            accepting a numpy array.
         """
-        for i in range(self.natoms):
-            o = self.vl_offset[i]
-            n = self.vl_size[i]
-            ri = r[i,:]
-            ai = a[i,:]
-            for k in range(o, o + n):
-                j = self.vl_list[k]
-                rij = r[j,:] - ri
-                rij2 = np.dot(rij, rij)
-                rij *= potential.force_factor(rij2)
-                ai += rij
-                a[j,:] -= rij
+        compute_forces(self, r, a, potential.force_factor)
 
         # not here, according to 'one function, one responsability' guideline.
         # F = ma, a currently contains the forces, so we must divide by m to obtain the accelerations
@@ -345,27 +568,193 @@ class VL:
     def compute_interaction_energy(self, r, potential):
         """Compute interaction energy.
 
+        The pairs are processed in blocks using array arithmetic, see ``compute_energy()``.
+
         :param np.ndarray r: atom coordinates
-        :param potential: Potential object, must have interaction_energy(rij2) method.
+        :param potential: Potential object, must have interaction_energy(rij2) method,
+            accepting a numpy array.
         :return: interaction energy, epot.
         """
-        epot = 0.0
-        for i in range(self.natoms):
-            o = self.vl_offset[i]
-            n = self.vl_size[i]
-            for k in range(o, o + n):
-                j = self.vl_list[k]
-                rij = r[j, :] - r[i, :]
-                rij2 = np.dot(rij, rij)
-                epot += potential.interaction_energy(rij2)
+        return compute_energy(self, r, potential.interaction_energy)
+
 
-        return epot
+def pair_blocks(vl, block_size=None):
+    """Iterate over the pairs of a linearised Verlet list in blocks.
+
+    The CSR arrays ``vl_list``, ``vl_offset`` and ``vl_size`` are expanded into
+    arrays of atom indices i and j, such that (i[k], j[k]) are the pairs, for
+    a range of consecutive atoms i at a time. The blocks have at most block_size
+    pairs, unless a single Verlet list is longer. Works for both implementations.
+
+    :param vl: linearised Verlet list.
+    :param int block_size: maximum number of pairs per block. If None, ``VL.block_size`` is used.
+    :return: generator of tuples (i, j) of 1D integer numpy arrays.
+    """
+    if block_size is None:
+        block_size = VL.block_size
+    vl_list = vl.vl_list
+    vl_offset = vl.vl_offset
+    vl_size = vl.vl_size
+    natoms = len(vl_size)
+    vl_end = vl_offset + vl_size
+    i0 = 0
+    while i0 < natoms:
+        # the atoms i0, ..., i1-1 whose Verlet lists end before vl_offset[i0] + block_size
+        i1 = int(np.searchsorted(vl_end, vl_offset[i0] + block_size, side='right'))
+        i1 = min(max(i1, i0 + 1), natoms)
+        i = np.repeat(np.arange(i0, i1, dtype=vl_list.dtype), vl_size[i0:i1])
+        j = vl_list[vl_offset[i0]:vl_end[i1 - 1]]
+        yield i, j
+        i0 = i1
+
+
+def _cutoff_full(vl):
+    """Return the cutoff distance of vl, and whether it is a full Verlet list."""
+    if isinstance(vl, VL):
+        return vl.cutoff, vl.full
+    else:
+        return vl.cutoff(), vl.full()
+
+
+def _minimum_image(rij, box_width):
+    """Return the minimum images of the interatomic vectors rij (in place).
+
+    :param np.ndarray rij: interatomic vectors, rij.shape = (...,3)
+    :param box_width: width of the periodic box, shape (3,), or None (no periodic box).
+    """
+    if box_width is not None:
+        rij -= box_width * np.round(rij / box_width)
+    return rij
+
+
+def _pair_args(rij2, i, j, types):
+    """Return the arguments of the potential functions for the pairs (i[k], j[k])."""
+    if types is None:
+        return (rij2,)
+    else:
+        return (rij2, types[i], types[j])
+
+
+def compute_forces(vl, r, a, force_factor, types=None):
+    """Add the interaction forces to a, using array arithmetic.
+
+    The pairs are expanded in blocks with ``pair_blocks()``, the force factors
+    of a block are computed in a single call, and the pair forces are
+    scatter-added to the atoms with ``np.bincount``. For a full Verlet list
+    the force of pair (i,j) is only added to atom i. Pairs farther apart
+    than vl.cutoff are ignored. If vl has a periodic box, the minimum image
+    convention is used.
+
+    :param vl: linearised Verlet list, either implementation.
+    :param np.ndarray r: atom position coordinates, r.shape = (n,3)
+    :param np.ndarray a: atom acceleration coordinates, a.shape = (n,3)
+    :param force_factor: function of the squared interatomic distance, accepting a numpy array.
+    :param np.ndarray types: atom types. If not None, force_factor is called as
+        force_factor(rij2, types[i], types[j]).
+    """
+    cutoff, full = _cutoff_full(vl)
+    box_width = vl.box_width
+    rc2 = cutoff ** 2
+    n = r.shape[0]
+    for i, j in pair_blocks(vl):
+        rij = _minimum_image(r[j] - r[i], box_width)
+        rij2 = np.einsum('ij,ij->i', rij, rij)
+        inside = rij2 <= rc2 # pairs in the skin are ignored
+        i, j, rij = i[inside], j[inside], rij[inside]
+        rij *= force_factor(*_pair_args(rij2[inside], i, j, types))[:, np.newaxis]
+        for d in range(3):
+            a[:, d] += np.bincount(i, weights=rij[:, d], minlength=n)
+            if not full: # Newton's third law
+                a[:, d] -= np.bincount(j, weights=rij[:, d], minlength=n)
+
+
+def compute_energy(vl, r, potential, types=None):
+    """Compute the interaction energy, using array arithmetic.
+
+    The pairs are expanded in blocks with ``pair_blocks()``, and the potential
+    of a block is computed in a single call. Pairs farther apart than vl.cutoff
+    are ignored.
+
+    :param vl: linearised Verlet list, either implementation.
+    :param np.ndarray r: atom position coordinates, r.shape = (n,3)
+    :param potential: function of the squared interatomic distance, accepting a numpy array.
+    :param np.ndarray types: atom types. If not None, potential is called as
+        potential(rij2, types[i], types[j]).
+    :return: interaction energy, epot.
+    """
+    cutoff, full = _cutoff_full(vl)
+    box_width = vl.box_width
+    rc2 = cutoff ** 2
+    epot = 0.0
+    for i, j in pair_blocks(vl):
+        rij = _minimum_image(r[j] - r[i], box_width)
+        rij2 = np.einsum('ij,ij->i', rij, rij)
+        inside = rij2 <= rc2 # pairs in the skin are ignored
+        epot += np.sum(potential(*_pair_args(rij2[inside], i[inside], j[inside], types)))
+    if full:
+        epot *= 0.5 # every pair is counted twice
+    return float(epot)
+
+
+def compute_all(vl, r, a, force_factor, potential, types=None):
+    """Add the interaction forces to a, and compute the interaction energy and
+    the virial tensor, using array arithmetic.
+
+    Same as ``compute_forces()`` and ``compute_energy()``, but the pair
+    distances are computed only once. The virial tensor is
+    W = sum_pairs (r_i - r_j) x F_ij, with F_ij the force on atom i exerted by atom j.
+    Its trace is the virial in the pressure p = (2*Ekin + tr W)/(3V).
+
+    :param vl: linearised Verlet list, either implementation.
+    :param np.ndarray r: atom position coordinates, r.shape = (n,3)
+    :param np.ndarray a: atom acceleration coordinates, a.shape = (n,3)
+    :param force_factor: function of the squared interatomic distance, accepting a numpy array.
+    :param potential: function of the squared interatomic distance, accepting a numpy array.
+    :param np.ndarray types: atom types. If not None, force_factor and potential
+        are called with arguments (rij2, types[i], types[j]).
+    :return: tuple (epot, virial), virial.shape = (3,3)
+    """
+    cutoff, full = _cutoff_full(vl)
+    box_width = vl.box_width
+    rc2 = cutoff ** 2
+    n = r.shape[0]
+    epot = 0.0
+    virial = np.zeros((3,3))
+    for i, j in pair_blocks(vl):
+        rij = _minimum_image(r[j] - r[i], box_width)
+        rij2 = np.einsum('ij,ij->i', rij, rij)
+        inside = rij2 <= rc2 # pairs in the skin are ignored
+        i, j, rij, rij2 = i[inside], j[inside], rij[inside], rij2[inside]
+        args = _pair_args(rij2, i, j, types)
+        epot += np.sum(potential(*args))
+        fij = rij * force_factor(*args)[:, np.newaxis]
+        # r_i - r_j = -rij
+        virial -= np.einsum('ki,kj->ij', rij, fij)
+        for d in range(3):
+            a[:, d] += np.bincount(i, weights=fij[:, d], minlength=n)
+            if not full: # Newton's third law
+                a[:, d] -= np.bincount(j, weights=fij[:, d], minlength=n)
+    if full:
+        # every pair is counted twice
+        epot *= 0.5
+        virial *= 0.5
+    return float(epot), virial
 
 
 def vl2set(vl):
-    """Convert VerletList object into set of pairs."""
+    """Convert VerletList object into set of pairs.
+
+    Both implementations expose the linearised Verlet list as numpy arrays
+    ``vl_list``, ``vl_offset`` and ``vl_size``, which are used if available.
+    """
     pairs = set()
-    if isinstance(vl, VerletList):
+    if vl.vl_list is not None:
+        vl_size = vl.vl_size.astype(int, copy=False)
+        # the Verlet lists are stored one after the other in vl_list
+        i = np.repeat(np.arange(len(vl_size)), vl_size)
+        j = vl.vl_list.astype(int, copy=False)
+        pairs.update(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+    elif isinstance(vl, VL):
         for i in range(vl.natoms):
             vli = vl.verlet_list(i)
             n_pairs_i = len(vli)
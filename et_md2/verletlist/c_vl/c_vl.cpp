@@ -8,62 +8,207 @@
 namespace py = pybind11;
 
 #include "vl_lib/vl.cpp"
+#include "ArrayInfo.hpp"
+
+template<typename VLType, typename FloatType>
+void
+set_reference( VLType& vl, carray_t<FloatType> r )
+{
+    ArrayInfo<FloatType,2> ar = positions_info(r);
+    vl.set_reference( ar.cdata(), ar.shape(0) );
+}
+
+template<typename VLType, typename FloatType>
+void
+build_simple( VLType& vl, carray_t<FloatType> r )
+{
+    ArrayInfo<FloatType,2> ar = positions_info(r);
+    vl.build_simple( ar.cdata(), ar.shape(0) );
+}
+
+template<typename VLType, typename FloatType>
+void
+build( VLType& vl, carray_t<FloatType> r )
+{
+    ArrayInfo<FloatType,2> ar = positions_info(r);
+    vl.build( ar.cdata(), ar.shape(0) );
+}
+
+template<typename VLType, typename FloatType>
+bool
+needs_rebuild( VLType const& vl, carray_t<FloatType> r )
+{
+    ArrayInfo<FloatType,2> ar = positions_info(r);
+    return vl.needs_rebuild( ar.cdata(), ar.shape(0) );
+}
+
+// Replace the linearised Verlet list by a copy of the arrays.
+template<typename VLType>
+void
+assign
+  ( VLType& vl
+  , carray_t<typename VLType::index_type>  vl_list
+  , carray_t<typename VLType::offset_type> vl_offset
+  , carray_t<typename VLType::index_type>  vl_size
+  )
+{
+    ArrayInfo<typename VLType::index_type ,1> alist(vl_list);
+    ArrayInfo<typename VLType::offset_type,1> aoffset(vl_offset);
+    ArrayInfo<typename VLType::index_type ,1> asize(vl_size);
+    if( aoffset.shape(0) != asize.shape(0) )
+        throw std::runtime_error("Expecting vl_offset and vl_size with the same length.");
+    vl.assign( alist.cdata(), alist.shape(0), aoffset.cdata(), asize.cdata(), asize.shape(0) );
+}
+
+// Relabel the atoms of the Verlet list, new atom i is old atom perm[i].
+template<typename VLType>
+void
+permute( VLType& vl, carray_t<std::int64_t> perm )
+{
+    ArrayInfo<std::int64_t,1> aperm(perm);
+    vl.permute( aperm.cdata(), aperm.shape(0) );
+}
+
+// Set the periodic box of the Verlet list.
+template<typename VLType>
+void
+set_box( VLType& vl, carray_t<double> lower_corner, carray_t<double> upper_corner )
+{
+    ArrayInfo<double,1> alc(lower_corner);
+    ArrayInfo<double,1> auc(upper_corner);
+    if( alc.shape(0) != 3 || auc.shape(0) != 3 )
+        throw std::runtime_error("Expecting box corners with 3 coordinates.");
+    vl.set_box( alc.cdata(), auc.cdata() );
+}
+
+// Return a copy of v as a numpy array, None if v is empty.
+py::object
+box_array( std::vector<double> const& v )
+{
+    if( v.empty() )
+        return py::none();
+    return py::array_t<double>( v.size(), v.data() );
+}
+
+// Return a read-only numpy array with the given shape, viewing the data of v,
+// without copying. The array shares ownership of v through a capsule, hence
+// it remains valid when the Verlet list is rebuilt or destroyed.
+template<typename T>
+py::object
+readonly_view( std::shared_ptr<std::vector<T> const> v, std::vector<py::ssize_t> shape )
+{
+    typedef std::shared_ptr<std::vector<T> const> Owner;
+    py::capsule base( new Owner(v), []( void * p ){ delete static_cast<Owner *>(p); } );
+    py::array_t<T> a( shape, v->data(), base );
+    a.attr("flags").attr("writeable") = false;
+    return a;
+}
+
+// Return the reference positions as a read-only view of shape (n,3), None if
+// they are not set.
+template<typename VLType>
+py::object
+r_ref_array( VLType const & vl )
+{
+    auto r_ref = vl.shared_r_ref();
+    if( r_ref->empty() )
+        return py::none();
+    return readonly_view( r_ref, { (py::ssize_t)r_ref->size()/3, 3 } );
+}
+
+// Return one of the linearised Verlet list arrays as a read-only view,
+// None if the Verlet list is not linearised.
+template<typename VLType, typename T>
+py::object
+vl_array( VLType const & vl, std::shared_ptr<std::vector<T> const> (VLType::*array)() const )
+{
+    if( !vl.linearised() )
+        return py::none();
+    auto v = (vl.*array)();
+    return readonly_view( v, { (py::ssize_t)v->size() } );
+}
+
+// Return the maximum number of OpenMP threads (1 if compiled without OpenMP).
+int
+max_threads()
+{
+  #ifdef _OPENMP
+    return omp_get_max_threads();
+  #else
+    return 1;
+  #endif
+}
+
+// Set the number of OpenMP threads (ignored if compiled without OpenMP).
+void
+set_num_threads( int n )
+{
+  #ifdef _OPENMP
+    omp_set_num_threads(n);
+  #endif
+}
+
+// Expose a Verlet list class with atom index type Index_t.
+template<typename Index_t>
+void
+declare_vl( py::module& m, char const * name )
+{
+    typedef VerletList<Index_t> VLType;
+    py::class_<VLType>(m, name)
+        .def(py::init<std::size_t, double, double, bool>()
+            , py::arg("natoms"), py::arg("cutoff"), py::arg("skin")=0.0, py::arg("full")=false)
+        .def("reset"     , &VLType::reset)
+        .def("add"       , &VLType::add)
+        .def("linearise" , &VLType::linearise)
+        .def("natoms"    , &VLType::natoms)
+        .def("has"       , &VLType::has)
+        .def("print"     , &VLType::print)
+        .def("contact"   , &VLType::contact)
+        .def("ncontacts" , &VLType::ncontacts)
+        .def("cutoff"   , &VLType::cutoff)
+        .def("skin"     , &VLType::skin)
+        .def("list_cutoff", &VLType::list_cutoff)
+        .def("full"     , &VLType::full)
+     // The positions are not converted if their dtype matches an overload,
+     // otherwise they are converted to double, the first overload.
+        .def("set_reference", &set_reference<VLType,double>)
+        .def("set_reference", &set_reference<VLType,float>)
+        .def("needs_rebuild", &needs_rebuild<VLType,double>)
+        .def("needs_rebuild", &needs_rebuild<VLType,float>)
+        .def("build_simple", &build_simple<VLType,double>)
+        .def("build_simple", &build_simple<VLType,float>)
+        .def("build"       , &build<VLType,double>)
+        .def("build"       , &build<VLType,float>)
+        .def("linearised"  , &VLType::linearised)
+        .def("permute"     , &permute<VLType>, py::arg("perm"))
+        .def("assign"      , &assign<VLType>, py::arg("vl_list"), py::arg("vl_offset"), py::arg("vl_size"))
+        .def("set_box"     , &set_box<VLType>, py::arg("lower_corner"), py::arg("upper_corner"))
+        .def("clear_box"   , &VLType::clear_box)
+        .def_property_readonly("periodic", &VLType::periodic)
+        .def_property_readonly("lower_corner", [](VLType const& vl){ return box_array( vl.box_lower() ); })
+        .def_property_readonly("box_width"   , [](VLType const& vl){ return box_array( vl.box_width() ); })
+     // zero-copy, read-only views of the linearised Verlet list
+        .def_property_readonly("vl_list"  , [](VLType const& vl){ return vl_array(vl, &VLType::shared_vl_list  ); })
+        .def_property_readonly("vl_offset", [](VLType const& vl){ return vl_array(vl, &VLType::shared_vl_offset); })
+        .def_property_readonly("vl_size"  , [](VLType const& vl){ return vl_array(vl, &VLType::shared_vl_size  ); })
+     // zero-copy, read-only view of the positions the Verlet list was built from
+        .def_property_readonly("r_ref", &r_ref_array<VLType>)
+     // the integer types of the arrays
+        .def_property_readonly_static("index_dtype" , [](py::object){ return py::dtype::of<Index_t     >(); })
+        .def_property_readonly_static("offset_dtype", [](py::object){ return py::dtype::of<std::int64_t>(); })
+    ;
+}
 
 PYBIND11_MODULE(c_vl, m)
 {// doc-string
     m.doc() = "Verlet List, C++ implementation";
 
+    m.def("max_threads"    , &max_threads);
+    m.def("set_num_threads", &set_num_threads);
+
  // exposed classes
- // Verlet list
-    py::class_<VL>(m, "VL")
-        .def(py::init<std::size_t, double>())
-        .def("reset"     , &VL::reset)
-        .def("add"       , &VL::add)
-        .def("linearise" , &VL::linearise)
-        .def("natoms"    , &VL::natoms)
-        .def("has"       , &VL::has)
-        .def("print"     , &VL::print)
-        .def("contact"   , &VL::contact)
-        .def("ncontacts" , &VL::ncontacts)
-        .def("cutoff"   , &VL::cutoff)
-    ;
- // Hilbert curve functions
-//    m.def("xyzw2h_float64", xyzw2h_float64 ); // 3D positions to hilbert index of the corresponding cell with width w.
-//    m.def("xyzw2h_float32", xyzw2h_float32 ); // 3D positions to hilbert index of the corresponding cell with width w.
-//
-//    m.def("xyzw2ijkh_float32", xyzw2ijkh_float32 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
-//    m.def("xyzw2ijkh_float64", xyzw2ijkh_float64 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
-//
-//    m.def(  "rw2h_float64",   rw2h_float64 ); // 3D positions to hilbert index of the corresponding cell with width w.
-//    m.def(  "rw2h_float32",   rw2h_float32 ); // 3D positions to hilbert index of the corresponding cell with width w.
-//
-//    m.def("rw2ch_float64", rw2ch_float64 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
-//    m.def("rw2ch_float32", rw2ch_float32 ); // 3D positions to cell indices and hilbert index of the corresponding cell with width w.
-
- // spatial sorting
-//    m.def("sort"  , sort   ); // sort the hilbert indices and produce reordering array.
-//    m.def("reorder_float32"     , reorder_float32);
-//    m.def("reorder_float64"     , reorder_float64);
-//    m.def("reorder_int32"       , reorder_int32  );
-//    m.def("reorder_uint32"      , reorder_uint32 );
-//    m.def("reorder_longlongint" , reorder_longlongint );
-//    m.def("reorder2_float64"    , reorder2_float64);
-//
-//    m.def("ijk2h_1",ijk2h_1);
-//    m.def("h2ijk_1",h2ijk_1);
-//    m.def("h2ijk",h2ijk);
-//
-//    m.def("info",hilbert::info);
-//    m.def("cell_index_limit",hilbert::cell_index_limit);
-//    m.def("hilbert_index_limit",hilbert::hilbert_index_limit);
-//    m.def("validate_cell_index",hilbert::validate_cell_index);
-//    m.def("validate_hilbert_index",hilbert::validate_hilbert_index);
-//    m.def("is_validating",hilbert::is_validating);
-//    m.def("is_valid_ijk",hilbert::is_valid_ijk);
-//    m.def("is_valid_i",hilbert::is_valid_i);
-//    m.def("is_valid_h",hilbert::is_valid_h);
-//
-//    m.def("build_hl", build_hl);
-//    m.def("build_vl", build_vl);
+ // Verlet list with 32-bit atom indices
+    declare_vl<std::int32_t>(m, "VL");
+ // Verlet list with 64-bit atom indices
+    declare_vl<std::int64_t>(m, "VL64");
 }
-
@@ -9,18 +9,25 @@
 // The example below is modified after http://people.duke.edu/~ccc14/cspy/18G_C++_Python_pybind11.html#More-on-working-with-numpy-arrays
 #include "vl.hpp"
 
-VL::VL
+template<typename Index_t>
+VerletList<Index_t>::VerletList
   ( std::size_t natoms
   , double cutoff
+  , double skin
+  , bool full
   )
-  : cutoff_(cutoff)
+  : full_(full)
+  , cutoff_(cutoff)
+  , skin_(skin)
 {
     this->reset(natoms);
 }
 
+template<typename Index_t>
 void
-VL::reset( std::size_t n_atoms )
+VerletList<Index_t>::reset( std::size_t n_atoms )
 {
+    validate_natoms(n_atoms);
     this->vl2d_.resize(n_atoms);
 
     std::size_t ncontacts = std::min( n_atoms-1, (std::size_t)NCONTACTS );
@@ -32,19 +39,65 @@ VL::reset( std::size_t n_atoms )
     this->linearised_ = false;
 }
 
+template<typename Index_t>
 double
-VL::cutoff() const {
+VerletList<Index_t>::cutoff() const {
     return cutoff_;
 }
 
+template<typename Index_t>
+double
+VerletList<Index_t>::skin() const {
+    return skin_;
+}
+
+template<typename Index_t>
+double
+VerletList<Index_t>::list_cutoff() const {
+    return cutoff_ + skin_;
+}
+
+template<typename Index_t>
+void
+VerletList<Index_t>::set_box( double const * lower, double const * upper )
+{
+    std::vector<double> width(3);
+    for( std::size_t d=0; d<3; ++d ) {
+        width[d] = upper[d] - lower[d];
+        if( !( width[d] > 0.0 ) )
+            throw std::runtime_error("Expecting upper_corner > lower_corner.");
+        if( width[d] < 2*list_cutoff() ) {
+            std::string msg("Periodic box too small for the minimum image convention: width ");
+            msg += std::to_string(width[d]) + " < 2*(cutoff + skin) = "
+                 + std::to_string(2*list_cutoff()) + ".";
+            throw std::runtime_error(msg);
+        }
+    }
+    lower_.assign( lower, lower + 3 );
+    width_ = width;
+ // the Verlet list must be rebuilt
+    r_ref_ = share_( std::vector<double>() );
+}
+
+template<typename Index_t>
+void
+VerletList<Index_t>::clear_box()
+{
+    lower_.clear();
+    width_.clear();
+    r_ref_ = share_( std::vector<double>() );
+}
+
+template<typename Index_t>
 std::size_t
-VL::natoms() const
+VerletList<Index_t>::natoms() const
 {
-    return ( linearised_ ? vl_offset_.size() : vl2d_.size() );
+    return ( linearised_ ? vl_offset_->size() : vl2d_.size() );
 }
 
+template<typename Index_t>
 void
-VL::add(std::size_t i, std::size_t j)
+VerletList<Index_t>::add(std::size_t i, std::size_t j)
 {
   #ifdef DEBUG
     validate_atom(i);
@@ -59,8 +112,9 @@ VL::add(std::size_t i, std::size_t j)
 }
 
 // range check for atom i
+template<typename Index_t>
 void
-VL::validate_atom(std::size_t i) const
+VerletList<Index_t>::validate_atom(std::size_t i) const
 {
     if( i >= this->natoms() ) {
         std::string msg("No such atom: ");
@@ -70,35 +124,50 @@ VL::validate_atom(std::size_t i) const
     }
 }
 
+// range check for the number of atoms
+template<typename Index_t>
+void
+VerletList<Index_t>::validate_natoms(std::size_t n)
+{
+    if( n > (std::size_t)std::numeric_limits<Index_t>::max() ) {
+        std::string msg("Too many atoms for ");
+        msg += std::to_string( 8*sizeof(Index_t) ) + "-bit atom indices: "
+             + std::to_string(n) + ". Use a VL64 Verlet list.";
+        throw std::overflow_error(msg);
+    }
+}
+
+template<typename Index_t>
 bool
-VL::has(std::size_t i, std::size_t j) const
+VerletList<Index_t>::has(std::size_t i, std::size_t j) const
 {
     validate_atom(i);
     validate_atom(j);
 
     if( linearised_ ) {
-        for( std::size_t k=vl_offset_[i]; k<vl_offset_[i]+vl_natoms_[i]; ++k ) {
-            if( vl_[k] == j )
+        for( std::int64_t k=(*vl_offset_)[i]; k<(*vl_offset_)[i]+(*vl_natoms_)[i]; ++k ) {
+            if( (std::size_t)(*vl_)[k] == j )
                 return true;
         }
     } else {
         for( auto& itr : vl2d_[i] ) {
-            if( itr == j )
+            if( (std::size_t)itr == j )
                 return true;
         }
     }
     return false;
 }
 
+template<typename Index_t>
 void
-VL::print() const
+VerletList<Index_t>::print() const
 {
     if( linearised_ ) {
         std::cout<<"VL::print() (linearised):\n";
         for(std::size_t i=0; i<natoms(); ++i) {
             std::cout<<i<<" [";
-            for( std::size_t k=vl_offset_[i]; k<vl_offset_[i]+vl_natoms_[i]; ++k ) {
-                std::cout<<vl_[k]<<",";
+            for( std::int64_t k=(*vl_offset_)[i]; k<(*vl_offset_)[i]+(*vl_natoms_)[i]; ++k ) {
+                std::cout<<(*vl_)[k]<<",";
             }
             std::cout<<"]"<<std::endl;
         }
@@ -113,52 +182,90 @@ VL::print() const
     }
 }
 
+template<typename Index_t>
 void
-VL::linearise(bool keep2d)
+VerletList<Index_t>::linearise(bool keep2d)
 {
     std::size_t natoms = vl2d_.size();
-    vl_offset_.resize(natoms);
-    vl_natoms_.resize(natoms);
+    std::vector<std::int64_t> vl_offset(natoms);
+    std::vector<Index_t> vl_natoms(natoms);
 
     std::size_t ncontacts = 0;
     for( auto& itr : vl2d_ ) {
         ncontacts += itr.size();
     }
 //        std::cout<<"ncontacts = "<<ncontacts<<std::endl;
-    vl_.reserve(ncontacts);
-    std::size_t offset = 0;
+    std::vector<Index_t> vl;
+    vl.reserve(ncontacts);
+    std::int64_t offset = 0;
     std::size_t i = 0;
     for( auto& itr : vl2d_ ) {
-        vl_offset_[i] = offset;
-        vl_natoms_[i] = itr.size();
-        offset       += itr.size();
-        vl_.insert( vl_.end(), itr.begin(), itr.end() );
+        vl_offset[i] = offset;
+        vl_natoms[i] = itr.size();
+        offset      += itr.size();
+        vl.insert( vl.end(), itr.begin(), itr.end() );
         i += 1;
     }
+    vl_        = share_( std::move(vl) );
+    vl_offset_ = share_( std::move(vl_offset) );
+    vl_natoms_ = share_( std::move(vl_natoms) );
     linearised_ = true;
-//        for( auto& ij : vl_) std::cout<<ij<<" ";
+//        for( auto& ij : *vl_) std::cout<<ij<<" ";
 //        std::cout<<std::endl;
     if( !keep2d ) {
         vl2d_.clear();
     }
 }
 
+template<typename Index_t>
 std::size_t
-VL::ncontacts( std::size_t i ) const
+VerletList<Index_t>::ncontacts( std::size_t i ) const
 {
     if( linearised_ ) {
-        return vl_natoms_[i];
+        return (*vl_natoms_)[i];
     } else{
         return vl2d_[i].size();
     }
 }
 
+template<typename Index_t>
 std::size_t
-VL::contact( std::size_t i, std::size_t j) const
+VerletList<Index_t>::contact( std::size_t i, std::size_t j) const
 {
     if( linearised_ ) {
-        return vl_[vl_offset_[i] + j ];
+        return (*vl_)[(*vl_offset_)[i] + j ];
     } else{
         return vl2d_[i][j];
     }
 }
+
+template<typename Index_t>
+void
+VerletList<Index_t>::assign
+  ( Index_t const * list, std::size_t nlist
+  , std::int64_t const * offset, Index_t const * size, std::size_t n
+  )
+{
+    validate_natoms(n);
+    for( std::size_t i=0; i<n; ++i ) {
+        if( offset[i] < 0 || size[i] < 0 || (std::size_t)( offset[i] + size[i] ) > nlist )
+            throw std::runtime_error("Inconsistent Verlet list arrays: Verlet list out of range.");
+     // the kernels partition the atoms over the threads by bisecting the offsets
+        if( i > 0 && offset[i] < offset[i-1] )
+            throw std::runtime_error("Inconsistent Verlet list arrays: vl_offset is not non-decreasing.");
+    }
+    for( std::size_t k=0; k<nlist; ++k ) {
+        if( list[k] < 0 || (std::size_t)list[k] >= n )
+            throw std::runtime_error("Inconsistent Verlet list arrays: atom index out of range.");
+    }
+    vl_        = share_( std::vector<Index_t>( list, list + nlist ) );
+    vl_offset_ = share_( std::vector<std::int64_t>( offset, offset + n ) );
+    vl_natoms_ = share_( std::vector<Index_t>( size, size + n ) );
+    vl2d_.clear();
+    r_ref_ = share_( std::vector<double>() );
+    linearised_ = true;
+}
+
+// explicit instantiations
+template class VerletList<std::int32_t>;
+template class VerletList<std::int64_t>;
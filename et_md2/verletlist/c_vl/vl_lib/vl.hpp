@@ -2,42 +2,148 @@
  *  C++ header file for shared library vllib
  */
 
+#ifndef VL_HPP
+#define VL_HPP
+
 #include <vector>
+#include <memory>
+#include <utility>
+#include <cstdint>
+#include <limits>
+#include <string>
 #include <stdexcept>
 #include <algorithm>
 #include <iostream>
-
-typedef  unsigned int I_t;
+#include <cmath>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
 
 #define NCONTACTS 50
  //------------------------------------------------------------------------------
  // Basic Verlet list data structure.
- // (Lacks a method build it from a set of atom coordinates).
-    class VL
+ // It can be built from a set of atom coordinates with build_simple() or build(),
+ // or by adding the contacts one by one with add() and calling linearise().
+ // A half Verlet list stores each pair (i,j) once, as j in the Verlet list of
+ // atom i with i < j. A full Verlet list stores each pair twice, in the Verlet
+ // lists of both atoms.
+ // Index_t is the integer type of the atom indices in the Verlet lists, and of
+ // the Verlet list sizes. The offsets are always 64-bit, because the number of
+ // pairs exceeds the number of atoms by far.
+    template<typename Index_t>
+    class VerletList
     {//------------------x------------------------------------------------------------
-    private:
+      public:
+     // The linearised Verlet list arrays and the reference positions are shared
+     // with the numpy arrays viewing them (see c_vl.cpp). Hence, they are never
+     // modified in place, but replaced by a new vector, and the old vector lives
+     // on as long as it is viewed.
+        template<typename T>
+        using shared_vector = std::shared_ptr<std::vector<T> const>;
+
+      private:
+        template<typename T>
+        static shared_vector<T> share_( std::vector<T> && v )
+        {
+            return std::make_shared<std::vector<T> const>( std::move(v) );
+        }
+
         bool linearised_;
+        bool full_;
         double cutoff_;
+        double skin_;
+     // positions of the atoms when the Verlet list was built
+        shared_vector<double> r_ref_ = share_( std::vector<double>() );
+     // lower corner and width of the periodic box, empty if not periodic
+        std::vector<double> lower_;
+        std::vector<double> width_;
      // 2d Verlet list
-        std::vector< std::vector<std::size_t> > vl2d_;
+        std::vector< std::vector<Index_t> > vl2d_;
      // linearized Verlet list
-        std::vector< std::size_t > vl_;
-        std::vector< std::size_t > vl_offset_;
-        std::vector< std::size_t > vl_natoms_;
+        shared_vector<Index_t>      vl_        = share_( std::vector<Index_t>() );
+        shared_vector<std::int64_t> vl_offset_ = share_( std::vector<std::int64_t>() );
+        shared_vector<Index_t>      vl_natoms_ = share_( std::vector<Index_t>() );
 
       public:
+        typedef Index_t index_type;
+        typedef std::int64_t offset_type;
+
      // ctor
-        VL( std::size_t natoms, double cutoff );
+        VerletList( std::size_t natoms, double cutoff, double skin=0.0, bool full=false );
+
+     // Return true if this is a full Verlet list, false for a half Verlet list.
+        bool full() const { return full_; }
 
      // Return cutoff.
         double cutoff() const;
 
+     // Return skin. The Verlet list is built with cutoff + skin.
+        double skin() const;
+
+     // Return the cutoff distance for building the Verlet list, cutoff + skin.
+        double list_cutoff() const;
+
+     // Set the periodic box [lower, upper[ (both of shape (3,)). Pairs are then
+     // found with the minimum image convention, in the Verlet list builds as
+     // well as in the interaction kernels. Throw std::runtime_error if the box
+     // is less than 2*list_cutoff() wide in some direction, because then an
+     // atom may interact with more than one image of another atom.
+        void set_box( double const * lower, double const * upper );
+
+     // Remove the periodic box.
+        void clear_box();
+
+     // Test if there is a periodic box.
+        bool periodic() const { return !width_.empty(); }
+
+     // Access the lower corner and the width of the periodic box (empty if
+     // there is no periodic box).
+        std::vector<double> const & box_lower() const { return lower_; }
+        std::vector<double> const & box_width() const { return width_; }
+
+     // Replace rij (shape (3,)) by its minimum image, if there is a periodic box.
+        template<typename FloatType>
+        void minimum_image( FloatType * rij ) const
+        {
+            if( width_.empty() )
+                return;
+            for( std::size_t d=0; d<3; ++d )
+                rij[d] -= width_[d]*std::round( rij[d]/width_[d] );
+        }
+
+     // Store the positions r (n x 3) the Verlet list is built from.
+        template<typename FloatType>
+        void set_reference( FloatType const * r, std::size_t n );
+
+     // Test if any atom has moved more than skin/2 since the Verlet list
+     // was built (or if there are no reference positions).
+        template<typename FloatType>
+        bool needs_rebuild( FloatType const * r, std::size_t n ) const;
+
      // (reset 2d data structure)
         void reset( std::size_t n_atoms );
 
      // Return the number of atoms in the VL
         std::size_t natoms() const;
 
+     // Test if the Verlet list is linearised.
+        bool linearised() const { return linearised_; }
+
+     // Access the linearised Verlet list arrays.
+        std::vector<Index_t>      const & vl_list  () const { return *vl_; }
+        std::vector<std::int64_t> const & vl_offset() const { return *vl_offset_; }
+        std::vector<Index_t>      const & vl_size  () const { return *vl_natoms_; }
+
+     // Access the reference positions (x0,y0,z0,x1,...), empty if not set.
+        std::vector<double> const & r_ref() const { return *r_ref_; }
+
+     // Share the linearised Verlet list arrays and the reference positions, the
+     // shared vectors remain valid when the Verlet list is rebuilt.
+        shared_vector<Index_t>      shared_vl_list  () const { return vl_; }
+        shared_vector<std::int64_t> shared_vl_offset() const { return vl_offset_; }
+        shared_vector<Index_t>      shared_vl_size  () const { return vl_natoms_; }
+        shared_vector<double>       shared_r_ref    () const { return r_ref_; }
+
         std::size_t ncontacts( std::size_t i ) const;
         std::size_t contact( std::size_t i, std::size_t j ) const;
 
@@ -50,9 +156,332 @@ typedef  unsigned int I_t;
      // Throw std::runtime_error if atom i is outside the atom range.
         void validate_atom(std::size_t i) const;
 
+     // Throw std::overflow_error if n atoms cannot be indexed with Index_t.
+        static void validate_natoms(std::size_t n);
+
      // Check if pair (i,j) is in the VL.
         bool has(std::size_t i, std::size_t j) const;
 
      // Print the Verlet list of each atom to stdout.
         void print() const;
+
+     // Build the (linearised) Verlet list from the positions r (n x 3).
+     // Brute force approach, O(N^2).
+        template<typename FloatType>
+        void build_simple( FloatType const * r, std::size_t n );
+
+     // Build the (linearised) Verlet list from the positions r (n x 3), using
+     // a cell list with cells at least list_cutoff() wide. O(N).
+     // If there is a periodic box, the cells span the box and the neighbouring
+     // cells wrap around it. The positions must be inside the box. If the box
+     // is less than 3 cells wide in some direction, build_simple() is used.
+        template<typename FloatType>
+        void build( FloatType const * r, std::size_t n );
+
+     // Replace the linearised Verlet list by a copy of the arrays list (all
+     // Verlet lists one after the other, shape (nlist,)), offset and size
+     // (offset and length of the Verlet list of each atom, shape (n,)), e.g.
+     // as read from a file. Throw std::runtime_error if the arrays are not
+     // consistent. The reference positions are cleared.
+        void assign( Index_t const * list, std::size_t nlist
+                   , std::int64_t const * offset, Index_t const * size, std::size_t n );
+
+     // Relabel the atoms of the linearised Verlet list after the atoms have been
+     // reordered: new atom i is old atom perm[i]. The Verlet lists are reordered
+     // accordingly, pairs of a half Verlet list are stored again as (i,j) with
+     // i < j, and the Verlet lists are sorted. The reference positions are
+     // permuted too. O(number of pairs), no distances are computed.
+        template<typename Perm_t>
+        void permute( Perm_t const * perm, std::size_t n );
+
+    private:
+     // Build the linearised Verlet list row by row. row(i,vli) must append the
+     // neighbours j of atom i to vli. Each Verlet list is sorted. The rows are
+     // computed in parallel if OpenMP is enabled, so row() must be thread safe.
+        template<typename RowFunction>
+        void build_rows_( std::size_t n, RowFunction row );
     };
+
+ // Verlet list with 32-bit atom indices, the default.
+    typedef VerletList<std::int32_t> VL;
+ // Verlet list with 64-bit atom indices, for 2**31 atoms or more.
+    typedef VerletList<std::int64_t> VL64;
+
+ //------------------------------------------------------------------------------
+ // template member function implementations
+ //------------------------------------------------------------------------------
+    template<typename Index_t>
+    template<typename FloatType>
+    void
+    VerletList<Index_t>::set_reference( FloatType const * r, std::size_t n )
+    {
+        r_ref_ = share_( std::vector<double>( r, r + 3*n ) );
+    }
+
+    template<typename Index_t>
+    template<typename FloatType>
+    bool
+    VerletList<Index_t>::needs_rebuild( FloatType const * r, std::size_t n ) const
+    {
+        std::vector<double> const & r_ref = *r_ref_;
+        if( r_ref.size() != 3*n )
+            return true;
+        double const half_skin2 = 0.25*skin_*skin_;
+        for( std::size_t i=0; i<n; ++i ) {
+            double dr[3];
+            for( std::size_t d=0; d<3; ++d )
+                dr[d] = r[3*i+d] - r_ref[3*i+d];
+         // an atom wrapped to the other side of the box has not moved
+            minimum_image(dr);
+            double const dr2 = dr[0]*dr[0] + dr[1]*dr[1] + dr[2]*dr[2];
+            if( dr2 > half_skin2 )
+                return true;
+        }
+        return false;
+    }
+
+    template<typename Index_t>
+    template<typename RowFunction>
+    void
+    VerletList<Index_t>::build_rows_( std::size_t n, RowFunction row )
+    {
+        validate_natoms(n);
+        vl2d_.clear();
+        std::vector<std::int64_t> vl_offset(n);
+        std::vector<Index_t> vl_natoms(n);
+
+     // The atoms are split in contiguous chunks, which are processed in parallel,
+     // each into its own buffer. There are more chunks than threads for load
+     // balancing. The chunk buffers are merged in chunk order, hence the result
+     // does not depend on the number of threads.
+        std::size_t nthreads = 1;
+      #ifdef _OPENMP
+        nthreads = omp_get_max_threads();
+      #endif
+        std::size_t const nchunks = std::max( std::min( n, 8*nthreads ), (std::size_t)1 );
+        std::vector< std::vector<Index_t> > buffers(nchunks);
+
+        #pragma omp parallel for schedule(dynamic)
+        for( long ichunk=0; ichunk<(long)nchunks; ++ichunk )
+        {
+            std::vector<Index_t>& buffer = buffers[ichunk];
+            std::vector<Index_t> vli;
+            for( std::size_t i=n*ichunk/nchunks; i<n*(ichunk+1)/nchunks; ++i ) {
+                vli.clear();
+                row(i, vli);
+                std::sort( vli.begin(), vli.end() );
+                vl_natoms[i] = vli.size();
+                buffer.insert( buffer.end(), vli.begin(), vli.end() );
+            }
+        }
+     // prefix sum of the chunk sizes
+        std::vector<std::size_t> chunk_offset(nchunks + 1, 0);
+        for( std::size_t ichunk=0; ichunk<nchunks; ++ichunk )
+            chunk_offset[ichunk+1] = chunk_offset[ichunk] + buffers[ichunk].size();
+     // merge
+        std::vector<Index_t> vl( chunk_offset[nchunks] );
+        #pragma omp parallel for schedule(static)
+        for( long ichunk=0; ichunk<(long)nchunks; ++ichunk )
+        {
+            std::copy( buffers[ichunk].begin(), buffers[ichunk].end(), vl.begin() + chunk_offset[ichunk] );
+            std::int64_t offset = chunk_offset[ichunk];
+            for( std::size_t i=n*ichunk/nchunks; i<n*(ichunk+1)/nchunks; ++i ) {
+                vl_offset[i] = offset;
+                offset += vl_natoms[i];
+            }
+            std::vector<Index_t>().swap( buffers[ichunk] ); // release memory
+        }
+        vl_        = share_( std::move(vl) );
+        vl_offset_ = share_( std::move(vl_offset) );
+        vl_natoms_ = share_( std::move(vl_natoms) );
+        linearised_ = true;
+    }
+
+    template<typename Index_t>
+    template<typename FloatType>
+    void
+    VerletList<Index_t>::build_simple( FloatType const * r, std::size_t n )
+    {
+        FloatType const rc2 = list_cutoff()*list_cutoff();
+        bool const full = full_;
+        build_rows_( n
+                   , [=]( std::size_t i, std::vector<Index_t>& vli )
+                     {
+                         FloatType const * ri = &r[3*i];
+                         for( std::size_t j=( full ? 0 : i+1 ); j<n; ++j ) {
+                             if( j == i )
+                                 continue;
+                             FloatType const * rj = &r[3*j];
+                             FloatType rij[3];
+                             for( std::size_t d=0; d<3; ++d )
+                                 rij[d] = rj[d] - ri[d];
+                             minimum_image(rij);
+                             FloatType const rij2 = rij[0]*rij[0] + rij[1]*rij[1] + rij[2]*rij[2];
+                             if( rij2 <= rc2 )
+                                 vli.push_back(j);
+                         }
+                     }
+                   );
+        set_reference(r, n);
+    }
+
+    template<typename Index_t>
+    template<typename FloatType>
+    void
+    VerletList<Index_t>::build( FloatType const * r, std::size_t n )
+    {
+        FloatType const rc2 = list_cutoff()*list_cutoff();
+        bool const pbc = periodic();
+     // the box spanned by the cells: the periodic box, or the bounding box of the atoms
+        double lower[3], upper[3];
+        if( pbc ) {
+            for( std::size_t d=0; d<3; ++d ) {
+                lower[d] = lower_[d];
+                upper[d] = lower_[d] + width_[d];
+            }
+        } else {
+            for( std::size_t d=0; d<3; ++d ) {
+                lower[d] = ( n ? r[d] : 0.0 );
+                upper[d] = lower[d];
+            }
+            for( std::size_t i=1; i<n; ++i ) {
+                for( std::size_t d=0; d<3; ++d ) {
+                    lower[d] = std::min( lower[d], (double)r[3*i+d] );
+                    upper[d] = std::max( upper[d], (double)r[3*i+d] );
+                }
+            }
+        }
+     // cells are at least list_cutoff() wide
+        long K[3];
+        double inv_width[3];
+        for( std::size_t d=0; d<3; ++d ) {
+            double const w = upper[d] - lower[d];
+            K[d] = std::max( 1L, (long)std::floor( w/list_cutoff() ) );
+            inv_width[d] = ( w > 0 ? K[d]/w : 0.0 );
+        }
+        if( pbc && ( K[0] < 3 || K[1] < 3 || K[2] < 3 ) ) {
+         // the neighbouring cells of a cell are not all different
+            build_simple(r, n);
+            return;
+        }
+     // cell indices of the atoms
+        std::vector<long> cell(3*n);
+        std::vector<std::size_t> cell_flat(n);
+        #pragma omp parallel for schedule(static)
+        for( long i=0; i<(long)n; ++i ) {
+            for( std::size_t d=0; d<3; ++d ) {
+                long c = (long)std::floor( (r[3*i+d] - lower[d])*inv_width[d] );
+                if( pbc )
+                    cell[3*i+d] = ( c%K[d] + K[d] )%K[d];
+                else
+                    cell[3*i+d] = std::min( std::max( c, 0L ), K[d] - 1 );
+            }
+            cell_flat[i] = cell[3*i] + K[0]*( cell[3*i+1] + K[1]*cell[3*i+2] );
+        }
+     // counting sort of the atoms over the cells
+        std::size_t const ncells = K[0]*K[1]*K[2];
+        std::vector<std::size_t> cl_offset(ncells + 1, 0);
+        for( std::size_t i=0; i<n; ++i )
+            ++cl_offset[cell_flat[i] + 1];
+        for( std::size_t c=0; c<ncells; ++c )
+            cl_offset[c+1] += cl_offset[c];
+        std::vector<std::size_t> cl_list(n);
+        std::vector<std::size_t> fill( cl_offset.begin(), cl_offset.end() - 1 );
+        for( std::size_t i=0; i<n; ++i )
+            cl_list[fill[cell_flat[i]]++] = i;
+
+     // range of the neighbouring cell indices of cell index c in direction d.
+     // With a periodic box they wrap around, otherwise they are clamped.
+        auto lo   = [&]( long c, std::size_t   ) { return ( pbc ? c - 1 : std::max( c - 1, 0L ) ); };
+        auto hi   = [&]( long c, std::size_t d ) { return ( pbc ? c + 1 : std::min( c + 1, K[d] - 1 ) ); };
+        auto wrap = [&]( long c, std::size_t d ) { return ( c < 0 ? c + K[d] : ( c >= K[d] ? c - K[d] : c ) ); };
+
+        build_rows_( n
+                   , [&]( std::size_t i, std::vector<Index_t>& vli )
+                     {
+                         FloatType const * ri = &r[3*i];
+                         long const * ci = &cell[3*i];
+                      // loop over the neighbouring cells, and the cell itself
+                         for( long m=lo(ci[2],2); m<=hi(ci[2],2); ++m )
+                         for( long l=lo(ci[1],1); l<=hi(ci[1],1); ++l )
+                         for( long k=lo(ci[0],0); k<=hi(ci[0],0); ++k )
+                         {
+                             std::size_t const c = wrap(k,0) + K[0]*( wrap(l,1) + K[1]*wrap(m,2) );
+                             for( std::size_t ic=cl_offset[c]; ic<cl_offset[c+1]; ++ic ) {
+                                 std::size_t const j = cl_list[ic];
+                                 if( j == i || ( !full_ && j < i ) )
+                                     continue;
+                                 FloatType const * rj = &r[3*j];
+                                 FloatType rij[3];
+                                 for( std::size_t d=0; d<3; ++d )
+                                     rij[d] = rj[d] - ri[d];
+                                 minimum_image(rij);
+                                 FloatType const rij2 = rij[0]*rij[0] + rij[1]*rij[1] + rij[2]*rij[2];
+                                 if( rij2 <= rc2 )
+                                     vli.push_back(j);
+                             }
+                         }
+                     }
+                   );
+        set_reference(r, n);
+    }
+
+    template<typename Index_t>
+    template<typename Perm_t>
+    void
+    VerletList<Index_t>::permute( Perm_t const * perm, std::size_t n )
+    {
+        if( !linearised_ )
+            throw std::runtime_error("The Verlet list must be linearised.");
+        if( n != natoms() )
+            throw std::runtime_error("Expecting a permutation of the atoms of the Verlet list.");
+     // inverse permutation: old atom i is new atom inv[i]
+        std::vector<Index_t> inv(n, -1);
+        for( std::size_t k=0; k<n; ++k ) {
+            if( perm[k] < 0 || (std::size_t)perm[k] >= n || inv[perm[k]] != -1 )
+                throw std::runtime_error("Expecting a permutation of the atoms of the Verlet list.");
+            inv[perm[k]] = k;
+        }
+        std::vector<Index_t>      const & vl_list   = *vl_;
+        std::vector<std::int64_t> const & vl_offset = *vl_offset_;
+        std::vector<Index_t>      const & vl_natoms = *vl_natoms_;
+     // counting sort of the relabelled pairs over the new atoms
+        std::vector<Index_t> size(n, 0);
+        for( std::size_t i=0; i<n; ++i ) {
+            for( std::int64_t k=vl_offset[i]; k<vl_offset[i]+vl_natoms[i]; ++k ) {
+                Index_t a = inv[i], b = inv[vl_list[k]];
+                if( !full_ && b < a )
+                    std::swap(a, b);
+                ++size[a];
+            }
+        }
+        std::vector<std::int64_t> offset(n, 0);
+        for( std::size_t a=1; a<n; ++a )
+            offset[a] = offset[a-1] + size[a-1];
+        std::vector<Index_t> vl( vl_list.size() );
+        std::vector<std::int64_t> fill(offset);
+        for( std::size_t i=0; i<n; ++i ) {
+            for( std::int64_t k=vl_offset[i]; k<vl_offset[i]+vl_natoms[i]; ++k ) {
+                Index_t a = inv[i], b = inv[vl_list[k]];
+                if( !full_ && b < a )
+                    std::swap(a, b);
+                vl[fill[a]++] = b;
+            }
+        }
+        #pragma omp parallel for schedule(dynamic, 1024)
+        for( long a=0; a<(long)n; ++a )
+            std::sort( vl.begin() + offset[a], vl.begin() + offset[a] + size[a] );
+        vl_        = share_( std::move(vl) );
+        vl_offset_ = share_( std::move(offset) );
+        vl_natoms_ = share_( std::move(size) );
+
+        if( r_ref_->size() == 3*n ) {
+            std::vector<double> r_ref(3*n);
+            for( std::size_t a=0; a<n; ++a )
+                for( std::size_t d=0; d<3; ++d )
+                    r_ref[3*a+d] = (*r_ref_)[3*perm[a]+d];
+            r_ref_ = share_( std::move(r_ref) );
+        }
+    }
+
+#endif // VL_HPP
@@ -142,6 +142,21 @@ def test_resize():
             x += 1
 
 
+def test_type():
+    """The atom types are int32, zero by default, and resized with the other arrays."""
+    a = atoms.Atoms(5)
+    assert a.type.dtype == np.int32
+    assert np.all(a.type == 0)
+    assert a.ntypes == 1
+    a.type[:] = [0, 1, 2, 1, 0]
+    assert a.ntypes == 3
+    a.resize(8)
+    assert a.type.shape == (8,)
+    assert np.all(a.type[:5] == [0, 1, 2, 1, 0])
+    a.resize(2, positions_only=True)
+    assert a.type.shape == (8,)
+
+
 def test_lattice_positions():
     n = 5
     dtype = np.single
@@ -185,6 +200,57 @@ def test_lattice_positions_2():
     ia += 1
 
 
+def _coordination(a, r0):
+    """Return the number of neighbours at distance r0 of each atom."""
+    d = np.linalg.norm(a.r[np.newaxis, :, :] - a.r[:, np.newaxis, :], axis=2)
+    return np.sum(np.isclose(d, r0, rtol=1e-5), axis=1)
+
+
+def test_lattice_positions_r0():
+    """The lattice is scaled to nearest neighbour distance r0, and all arrays
+    are resized to the number of lattice points."""
+    a = atoms.Atoms(5)
+    a.lattice_positions(upper_corner=(6,6,6), r0=1.5)
+    # fcc lattice constant sqrt(2)*r0 = 2.12, 3x3x3 unit cells
+    assert a.n == 108
+    for ar in a.arrays + [a.type, a.image]:
+        assert ar.shape[0] == 108
+    assert np.all(a.r < 6)
+    z = _coordination(a, 1.5)
+    assert np.max(z) == 12
+    # the atom in the middle of the box has all its neighbours
+    assert z[np.argmin(np.linalg.norm(a.r - 3.0, axis=1))] == 12
+
+
+@pytest.mark.parametrize('cell,coordination', [('bcc', 8), ('hcp', 12), ('diamond', 4)])
+def test_lattice_types(cell, coordination):
+    """The lattices have nearest neighbour distance r0 and the right coordination number."""
+    a = atoms.Atoms()
+    a.lattice_positions(lower_corner=(-1,-1,-1), upper_corner=(5,5,5), r0=1.0, cell=cell)
+    assert np.all(a.r >= -1) and np.all(a.r < 5)
+    d = np.linalg.norm(a.r[np.newaxis, :, :] - a.r[:, np.newaxis, :], axis=2)
+    assert np.min(d[d > 0]) == pytest.approx(1.0)
+    assert np.max(_coordination(a, 1.0)) == coordination
+
+
+def test_lattice_user_basis():
+    """A user supplied basis gives the same lattice as the named unit cell."""
+    a = atoms.Atoms()
+    a.lattice_positions(upper_corner=(3,4,5), r0=0.9)
+    b = atoms.Atoms()
+    b.lattice_positions(upper_corner=(3,4,5), r0=0.9, cell=[[0,0,0], [0.5,0.5,0], [0.5,0,0.5], [0,0.5,0.5]])
+    assert np.array_equal(a.r, b.r)
+    # an orthorhombic unit cell
+    c = atoms.Atoms()
+    c.lattice_positions(upper_corner=(3,4,5), cell=[[0,0,0]], edges=(1,2,5))
+    assert c.n == 3*2*1
+    assert np.array_equal(c.r[-1], [2,2,0])
+    with pytest.raises(NotImplementedError):
+        c.lattice_positions(cell='foo')
+    with pytest.raises(ValueError):
+        c.lattice_positions(cell=[0,0,0])
+
+
 def test_plot_8():
     """for visual inspection"""
     n = 8
@@ -224,10 +290,66 @@ def test_apply_PBC():
     a.lattice_positions(upper_corner=upper_corner)
     r = 0.5
     a.add_noise(r)
-    print(a.apply_PBC(collect=True))
+    r0 = a.r.copy()
+    moved = a.apply_PBC(collect=True)
+    print(moved)
+    outside = np.any((r0 < 0) | (r0 >= upper_corner), axis=1)
+    assert np.array_equal(moved, np.flatnonzero(outside))
+    assert np.all(a.r >= 0)
+    assert np.all(a.r < upper_corner)
+    # wrapping and unwrapping single precision coordinates rounds to ~1e-7
+    assert np.allclose(a.unwrapped_positions(), r0, atol=1e-6)
     # apply PBC again, now not a single atom should have moved
     moved = a.apply_PBC(collect=True)
-    assert not moved
+    assert len(moved) == 0
+
+
+def test_sort_spatially():
+    """The atoms are sorted along a Hilbert curve, all atom arrays are permuted consistently."""
+    pytest.importorskip('et_md2.spatial_sorting.cpp')
+    np.random.seed(2)
+    a = atoms.Atoms()
+    a.lattice_positions(upper_corner=(8,8,8))
+    n = a.n
+    shuffle = np.random.permutation(n)
+    a.r[:] = a.r[shuffle]
+    a.v[:] = np.random.random((n,3))
+    a.a[:] = np.random.random((n,3))
+    a.m[:] = np.random.random(n)
+    a.type[:] = np.random.randint(0, 3, n)
+    a.image[:] = np.random.randint(-2, 3, (n,3))
+    before = [ar.copy() for ar in a.arrays + [a.type, a.image]]
+    r = a.r
+
+    perm = a.sort_spatially(1.0)
+    assert a.r is r # in place
+    assert np.array_equal(np.sort(perm), np.arange(n))
+    for ar, ar0 in zip(a.arrays + [a.type, a.image], before):
+        assert np.array_equal(ar, ar0[perm])
+    # consecutive atoms are close in space
+    d = np.linalg.norm(np.diff(a.r, axis=0), axis=1)
+    d0 = np.linalg.norm(np.diff(before[0], axis=0), axis=1)
+    assert np.mean(d) < 0.25*np.mean(d0)
+
+
+def test_image():
+    """The image counters track the atoms over several periods."""
+    a = atoms.Atoms(3, zero=True)
+    a.lower_corner = np.array([-1.0, 0.0, 0.0])
+    a.upper_corner = np.array([ 1.0, 1.0, 3.0])
+    r0 = np.array([[ 0.5, 0.5, 0.5]
+                  ,[-0.5, 0.2, 2.5]
+                  ,[ 0.0, 0.9, 1.0]])
+    a.r[:] = r0
+    dr = np.array([[ 4.75, 0.0,  0.0]
+                  ,[-3.25, 1.5, -7.0]
+                  ,[ 0.0,  0.0,  0.0]])
+    a.r += dr
+    moved = a.apply_PBC(collect=True)
+    assert np.array_equal(moved, [0, 1])
+    assert np.array_equal(a.image, [[3, 0, 0], [-2, 1, -2], [0, 0, 0]])
+    assert np.allclose(a.unwrapped_positions(), r0 + dr)
+    assert a.apply_PBC() is None
 
 
 # ==============================================================================
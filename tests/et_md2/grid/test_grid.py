@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for sub-module et_md2.grid."""
+
+import sys
+sys.path.insert(0,'.')
+
+import pytest
+import numpy as np
+
+from et_md2.atoms import Atoms
+from et_md2.grid import Grid
+
+
+def test_grid_cells():
+    """Every atom is in exactly one cell, the cell containing its position."""
+    atoms = Atoms(1000)
+    atoms.random_positions(upper_corner=(4.,3.,2.5))
+    grid = Grid(cell_size=1.0, atoms=atoms)
+    assert not grid.linearised()
+    grid.build()
+    assert grid.linearised()
+    assert np.all(grid.K == np.array([4,3,2]))
+    assert grid.ncells == 24
+    assert grid.cl_size.sum() == atoms.n
+    assert np.all(np.sort(grid.cl_list) == np.arange(atoms.n))
+
+    cell_width = (atoms.upper_corner - atoms.lower_corner)/grid.K
+    for m in range(grid.K[2]):
+        for l in range(grid.K[1]):
+            for k in range(grid.K[0]):
+                cklm = grid.cell_list(k,l,m)
+                lower = np.array([k,l,m])*cell_width
+                assert np.all(lower <= atoms.r[cklm])
+                assert np.all(atoms.r[cklm] < lower + cell_width)
+                # counting sort is stable
+                assert np.all(np.diff(cklm) > 0)
+
+
+def test_grid_many_cells():
+    """With more than 2**16 cells the counting sort takes several 16-bit digits."""
+    atoms = Atoms(20000)
+    atoms.random_positions(upper_corner=(50.,50.,40.))
+    grid = Grid(cell_size=1.0, atoms=atoms)
+    grid.build()
+    assert grid.ncells == 100000
+    assert np.all(grid.cl_list == np.argsort(grid.cell, kind='stable'))
+    assert np.all(grid.cell[grid.cl_list] == np.repeat(np.arange(grid.ncells), grid.cl_size))
+
+
+def test_grid_nonexisting_cell():
+    atoms = Atoms(10)
+    atoms.random_positions(upper_corner=(2.,2.,2.))
+    grid = Grid(cell_size=1.0, atoms=atoms)
+    grid.build()
+    with pytest.raises(IndexError):
+        grid.cell_list(-1,0,0)
+    with pytest.raises(IndexError):
+        grid.cell_list(0,2,0)
+
+
+def test_grid_bounding_box():
+    """Without box, the bounding box of the positions is used."""
+    r = np.array([[0.,0.,0.],[2.5,0.,0.],[1.2,0.,0.]])
+    grid = Grid(cell_size=1.0)
+    grid.build(r)
+    assert np.all(grid.K == np.array([2,1,1]))
+    assert np.all(grid.cell_list(0,0,0) == np.array([0,2]))
+    assert np.all(grid.cell_list(1,0,0) == np.array([1]))
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (normally all tests are run with pytest)
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_grid_cells
+
+    print(f'__main__ running {the_test_you_want_to_debug}')
+    the_test_you_want_to_debug()
+    print("-*# finished #*-")
+# ==============================================================================
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for sub-module et_md2.integrators."""
+
+import sys
+sys.path.insert(0,'.')
+
+import numpy as np
+import pytest
+
+from et_md2.atoms import Atoms
+import et_md2.integrators
+import et_md2.interactions
+import et_md2.potentials
+import et_md2.verletlist
+
+
+def _atoms(seed=1, ncells=3):
+    """Return a slightly disordered Lennard-Jones crystal with random velocities."""
+    np.random.seed(seed)
+    lj = et_md2.potentials.LJ_py()
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(ncells,ncells,ncells))
+    # nearest neighbours at the equilibrium distance
+    atoms.r *= np.sqrt(2)*lj.r0()
+    atoms.upper_corner = ncells*np.sqrt(2)*lj.r0()*np.ones(3)
+    atoms.add_noise(0.02)
+    atoms.m[:] = 1.0
+    atoms.v[:] = 0.1*(np.random.random(atoms.r.shape) - 0.5)
+    atoms.a[:] = 0.0
+    return atoms
+
+
+def _energy(atoms, epot):
+    return 0.5*np.sum(atoms.m[:, np.newaxis]*atoms.v**2) + epot
+
+
+def test_run_py():
+    """The total energy is conserved, and the Verlet list is rebuilt as needed."""
+    atoms = _atoms()
+    vl = et_md2.verletlist.VL(cutoff=2.4, skin=0.2)
+    epot0, _ = et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=0)
+    e0 = _energy(atoms, epot0)
+    epot, virial = et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=200)
+    assert virial.shape == (3,3)
+    assert _energy(atoms, epot) == pytest.approx(e0, rel=1e-5)
+    assert not vl.needs_rebuild(atoms.r)
+
+
+def test_callback():
+    """The callback is called after every chunk of time steps."""
+    atoms = _atoms()
+    vl = et_md2.verletlist.VL(cutoff=2.4, skin=0.2)
+    steps = []
+    et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=12, every=5
+                          , callback=lambda step, atoms, epot, virial: steps.append(step)
+                          )
+    assert steps == [5, 10, 12]
+
+
+def test_run_cpp():
+    """The C++ integrator agrees with the Python integrator."""
+    pytest.importorskip('et_md2.integrators.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    results = []
+    for impl in ('py', 'cpp'):
+        atoms = _atoms()
+        if impl == 'py':
+            vl = et_md2.verletlist.VL(cutoff=2.4, skin=0.2)
+        else:
+            vl = c_vl.VL(atoms.n, 2.4, 0.2)
+        # faster atoms, to have Verlet list rebuilds
+        atoms.v *= 5.0
+        epot, virial = et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=150, every=60)
+        results.append((atoms.r.copy(), atoms.v.copy(), atoms.a.copy(), epot, virial))
+    (r0, v0, a0, epot0, virial0), (r1, v1, a1, epot1, virial1) = results
+    assert np.allclose(r1, r0)
+    assert np.allclose(v1, v0)
+    assert np.allclose(a1, a0)
+    assert epot1 == pytest.approx(epot0)
+    assert np.allclose(virial1, virial0)
+
+    # the number of rebuilds
+    import et_md2.integrators.cpp as cpp
+    atoms = _atoms()
+    atoms.v *= 5.0
+    vl = c_vl.VL(atoms.n, 2.4, 0.2)
+    vl.build(atoms.r)
+    atoms.a[:] = 0.0
+    et_md2.interactions.compute_all(atoms, vl, et_md2.potentials.to_cpp(None))
+    epot, virial, nrebuilds = cpp.run_dp(atoms.r, atoms.v, atoms.a, atoms.m, vl, et_md2.potentials.to_cpp(None), 0.002, 150)
+    assert nrebuilds > 0
+    assert epot == pytest.approx(epot0)
+
+
+def test_run_pbc():
+    """Atoms leaving the box are wrapped to the other side. The atoms are too far
+    apart to interact, hence they move in straight lines."""
+    pytest.importorskip('et_md2.integrators.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    for vl in (et_md2.verletlist.VL(cutoff=1.0, skin=0.2), c_vl.VL(8, 1.0, 0.2)):
+        atoms = Atoms(zero=True)
+        atoms.lattice_positions(upper_corner=(2,2,2), cell='primitive')
+        assert atoms.n == 8
+        atoms.r = 3.0*atoms.r + 1.5
+        # a strided column of box corners
+        atoms.upper_corner = np.array([[0.0, 6.0], [0.0, 6.0], [0.0, 6.0]])[:, 1]
+        atoms.v[:] = (10.0, -5.0, 1.0)
+        r0 = atoms.r.copy()
+        r_expected = np.mod(atoms.r + 100*0.01*atoms.v, 6.0)
+        et_md2.integrators.run(atoms, vl, dt=0.01, nsteps=100, every=30, pbc=True)
+        assert np.all(atoms.r >= 0.0)
+        assert np.all(atoms.r < 6.0)
+        assert np.allclose(atoms.r, r_expected)
+        assert np.allclose(atoms.unwrapped_positions(), r0 + 100*0.01*atoms.v)
+
+
+def test_run_pbc_crystal():
+    """The atoms of a crystal in a periodic box interact across the box boundaries,
+    the total energy is conserved, and the C++ integrator agrees with the Python
+    integrator."""
+    pytest.importorskip('et_md2.integrators.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    results = []
+    for impl in ('py', 'cpp'):
+        atoms = _atoms(ncells=4)
+        if impl == 'py':
+            vl = et_md2.verletlist.VL(cutoff=2.4, skin=0.2)
+        else:
+            vl = c_vl.VL(atoms.n, 2.4, 0.2)
+        atoms.v *= 5.0
+        epot0, _ = et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=0, pbc=True)
+        assert vl.periodic
+        # there are no surface atoms, all atoms have the same neighbours
+        assert np.all(vl.vl_size + np.bincount(vl.vl_list, minlength=atoms.n) == 12 + 6 + 24 + 12 + 24)
+        e0 = _energy(atoms, epot0)
+        epot, virial = et_md2.integrators.run(atoms, vl, dt=0.002, nsteps=150, every=50, pbc=True)
+        assert _energy(atoms, epot) == pytest.approx(e0, rel=1e-5)
+        assert np.all(atoms.r >= 0.0)
+        assert np.all(atoms.r < atoms.upper_corner)
+        results.append((atoms.unwrapped_positions(), atoms.v.copy(), epot, virial))
+    (r0, v0, epot0, virial0), (r1, v1, epot1, virial1) = results
+    assert np.allclose(r1, r0)
+    assert np.allclose(v1, v0)
+    assert epot1 == pytest.approx(epot0)
+    assert np.allclose(virial1, virial0)
+
+
+def test_run_cpp_types():
+    """The C++ integrator passes the atom types to a potential for mixtures."""
+    pytest.importorskip('et_md2.integrators.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    pair_lj = et_md2.potentials.PairLJ_py.mixed([0.25, 0.5], [1.0, 0.95], cutoff=2.4)
+    results = []
+    for vl in (et_md2.verletlist.VL(cutoff=2.4, skin=0.2), c_vl.VL(_atoms().n, 2.4, 0.2)):
+        atoms = _atoms()
+        atoms.type[::2] = 1
+        epot, _ = et_md2.integrators.run(atoms, vl, pair_lj, dt=0.002, nsteps=20)
+        results.append((atoms.r.copy(), epot))
+    assert np.allclose(results[1][0], results[0][0])
+    assert results[1][1] == pytest.approx(results[0][1])
+
+
+def test_run_cpp_layout():
+    """The C++ integrator updates r, v and a in place, hence it rejects arrays
+    that would have to be converted, rather than writing the wrong memory."""
+    cpp = pytest.importorskip('et_md2.integrators.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = _atoms()
+    vl = c_vl.VL(atoms.n, 2.4, 0.2)
+    vl.build(atoms.r)
+    lj = et_md2.potentials.to_cpp(None)
+    et_md2.interactions.compute_all(atoms, vl, lj)
+    # the masses are converted
+    r, v, a = atoms.r.copy(), atoms.v.copy(), atoms.a.copy()
+    epot, _, _ = cpp.run_dp(atoms.r, atoms.v, atoms.a, atoms.m.astype(np.float32), vl, lj, 0.002, 10)
+    vl.build(r)
+    assert cpp.run_dp(r, v, a, np.array([1.0]), vl, lj, 0.002, 10)[0] == pytest.approx(epot)
+    assert np.allclose(r, atoms.r)
+    for x in (np.asfortranarray(atoms.r), atoms.r.astype(np.float32), atoms.r.tolist()):
+        with pytest.raises(RuntimeError):
+            cpp.run_dp(x, atoms.v, atoms.a, atoms.m, vl, lj, 0.002, 1)
+        with pytest.raises(RuntimeError):
+            cpp.run_dp(atoms.r, x, atoms.a, atoms.m, vl, lj, 0.002, 1)
+        with pytest.raises(RuntimeError):
+            cpp.run_dp(atoms.r, atoms.v, x, atoms.m, vl, lj, 0.002, 1)
+    # wrong shapes
+    with pytest.raises(RuntimeError):
+        cpp.run_dp(np.ascontiguousarray(atoms.r[:,:2]), atoms.v, atoms.a, atoms.m, vl, lj, 0.002, 1)
+    with pytest.raises(RuntimeError):
+        cpp.run_dp(atoms.r[:-1], atoms.v[:-1], atoms.a[:-1], atoms.m[:-1], vl, lj, 0.002, 1)
+    with pytest.raises(RuntimeError):
+        cpp.run_dp(atoms.r, atoms.v[:-1], atoms.a, atoms.m, vl, lj, 0.002, 1)
+    with pytest.raises(RuntimeError):
+        cpp.run_dp(atoms.r, atoms.v, atoms.a, atoms.m[:-1], vl, lj, 0.002, 1)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (normally all tests are run with pytest)
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_run_py
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print("-*# finished #*-")
+# ==============================================================================
@@ -12,6 +12,8 @@ from et_md2.atoms import Atoms
 import et_md2.interactions.lj as LJ
 import et_md2.interactions
 import et_md2.verletlist
+import et_md2.potentials
+from et_md2.potentials import LJ_py
 
 
 def test_compute_forces_vl():
@@ -75,6 +77,412 @@ def test_compute_interactions_vl():
 #     assert epot == pytest.approx(-0.25, abs=1.e-15)
 
 
+def test_compute_forces_vectorized():
+    """Forces and energy of two atoms at the equilibrium distance and closer."""
+    lj = LJ_py()
+    r0 = lj.r0()
+    atoms = Atoms(2,zero=True)
+    atoms.r[:,:] = np.array( [ [-0.5*r0, 0.0, 0.0]
+                             , [ 0.5*r0, 0.0, 0.0] ] )
+    vl = et_md2.verletlist.VL(cutoff=3*r0)
+    vl.build_vectorized(atoms.r)
+    epot = et_md2.interactions.compute_interactions(atoms, vl, lj.interaction_energy)
+    assert epot == pytest.approx(-0.25, abs=1.e-15)
+    et_md2.interactions.compute_forces(atoms, vl, lj.force_factor)
+    assert np.allclose(atoms.a, 0, atol=1e-15)
+
+    atoms.r *= 0.9
+    vl.build_vectorized(atoms.r)
+    et_md2.interactions.compute_forces(atoms, vl, lj.force_factor)
+    # repulsive
+    assert atoms.a[0,0] < 0
+    assert np.all(atoms.a[0] == -atoms.a[1])
+
+
+def _compute_all_expected(atoms, vl, lj):
+    """Return the accelerations, energy and virial tensor computed separately."""
+    atoms.a[:] = 0.0
+    et_md2.interactions.compute_forces(atoms, vl, lj.force_factor)
+    a_expected = atoms.a.copy()
+    epot_expected = et_md2.interactions.compute_interactions(atoms, vl, lj.interaction_energy)
+    # for a non-periodic system the virial tensor is sum_i r_i x F_i
+    virial_expected = np.einsum('ki,kj->ij', atoms.r, a_expected)
+    atoms.a[:] = 0.0
+    return a_expected, epot_expected, virial_expected
+
+
+def _lj_atoms(lj):
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.r *= lj.r0()
+    atoms.add_noise(0.05)
+    atoms.m[:] = 1.0
+    return atoms
+
+
+def test_compute_all():
+    """compute_all() computes the same forces and energy as compute_forces()
+    and compute_interactions(), and the virial tensor."""
+    lj = LJ_py()
+    atoms = _lj_atoms(lj)
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    a_expected, epot_expected, virial_expected = _compute_all_expected(atoms, vl, lj)
+
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vl, lj)
+    assert a is atoms.a
+    assert np.allclose(a, a_expected, rtol=1e-12, atol=1e-12)
+    assert epot == pytest.approx(epot_expected, rel=1e-12)
+    assert np.allclose(virial, virial_expected)
+    assert np.allclose(virial, virial.T)
+
+
+def test_compute_all_default_potential():
+    """Without potential, compute_all() uses the reduced Lennard-Jones potential,
+    with either Verlet list implementation."""
+    lj = LJ_py()
+    atoms = _lj_atoms(lj)
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, virial_expected = et_md2.interactions.compute_all(atoms, vl, lj)
+    a_expected = a_expected.copy()
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vl)
+    assert np.array_equal(a, a_expected)
+    assert epot == epot_expected
+    assert np.array_equal(virial, virial_expected)
+
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vlcpp)
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(virial, virial_expected)
+
+
+def test_compute_all_cpp():
+    """The C++ compute_all() agrees with the Python implementation."""
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl
+    lj = LJ_py() # the reduced Lennard-Jones potential of the C++ implementation
+    atoms = _lj_atoms(lj)
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    a_expected, epot_expected, virial_expected = _compute_all_expected(atoms, vl, lj)
+
+    vlcpp = et_md2.verletlist.c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vlcpp)
+    assert a is atoms.a
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(virial, virial_expected)
+
+def test_compute_all_cpp_threads():
+    """The C++ forces, energy and virial do not depend on the number of threads."""
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.interactions.cpp as cpp
+    import et_md2.verletlist.c_vl as c_vl
+    lj = LJ_py()
+    atoms = _lj_atoms(lj)
+    vl = c_vl.VL(atoms.n, 2.5, 0.3)
+    vl.build(atoms.r)
+
+    max_threads = c_vl.max_threads()
+    results = []
+    for nthreads in (1, 2, 3, 4):
+        c_vl.set_num_threads(nthreads)
+        a = np.zeros_like(atoms.r)
+        results.append(cpp.compute_all_dp(atoms.r, a, atoms.m, vl))
+        a2 = np.zeros_like(atoms.r)
+        cpp.compute_forces_dp(atoms.r, a2, atoms.m, vl)
+        assert np.allclose(a2, a)
+        assert cpp.compute_interactions_dp(atoms.r, vl) == pytest.approx(results[-1][1])
+    c_vl.set_num_threads(max_threads)
+
+    a_expected, epot_expected, virial_expected = results[0]
+    for a, epot, virial in results[1:]:
+        assert np.allclose(a, a_expected)
+        assert epot == pytest.approx(epot_expected)
+        assert np.allclose(virial, virial_expected)
+
+
+def test_compute_all_cpp_full():
+    """The C++ kernels give the same results for a full and a half Verlet list."""
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.interactions.cpp as cpp
+    import et_md2.verletlist.c_vl as c_vl
+    lj = LJ_py()
+    atoms = _lj_atoms(lj)
+    results = []
+    for full in (False, True):
+        vl = c_vl.VL(atoms.n, 2.5, 0.3, full=full)
+        vl.build(atoms.r)
+        for nthreads in (1, 3):
+            max_threads = c_vl.max_threads()
+            c_vl.set_num_threads(nthreads)
+            a = np.zeros_like(atoms.r)
+            results.append(cpp.compute_all_dp(atoms.r, a, atoms.m, vl))
+            a2 = np.zeros_like(atoms.r)
+            cpp.compute_forces_dp(atoms.r, a2, atoms.m, vl)
+            assert np.allclose(a2, a)
+            assert cpp.compute_interactions_dp(atoms.r, vl) == pytest.approx(results[-1][1])
+            c_vl.set_num_threads(max_threads)
+
+    a_expected, epot_expected, virial_expected = results[0]
+    for a, epot, virial in results[1:]:
+        assert np.allclose(a, a_expected)
+        assert epot == pytest.approx(epot_expected)
+        assert np.allclose(virial, virial_expected)
+
+
+@pytest.mark.parametrize('name', ['LJ', 'Morse', 'WCA', 'SoftSphere'])
+def test_compute_all_cpp_potentials(name):
+    """The C++ kernels with a C++ potential agree with the Python kernels,
+    which evaluate the same potential object on arrays."""
+    potentials_cpp = pytest.importorskip('et_md2.potentials.cpp')
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    potential = { 'LJ'        : potentials_cpp.LJ(epsilon=1.5, sigma=0.9)
+                , 'Morse'     : potentials_cpp.Morse(D=1.5, a=2.0, r0=1.0)
+                , 'WCA'       : potentials_cpp.WCA(epsilon=1.5, sigma=0.9)
+                , 'SoftSphere': potentials_cpp.SoftSphere(epsilon=1.5, sigma=0.9, n=9)
+                }[name]
+    atoms = _lj_atoms(LJ_py())
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, virial_expected = [ x.copy() if isinstance(x, np.ndarray) else x
+                                                   for x in et_md2.interactions.compute_all(atoms, vl, potential) ]
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vlcpp, potential)
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(virial, virial_expected)
+
+    # single precision
+    r = atoms.r.astype(np.float32)
+    a = np.zeros_like(r)
+    a, epot, virial = et_md2.interactions.cpp.compute_all_sp(r, a, atoms.m.astype(np.float32), vlcpp, potential)
+    assert a.dtype == np.float32
+    assert np.allclose(a, a_expected, rtol=1e-3, atol=1e-3*np.abs(a_expected).max())
+    assert epot == pytest.approx(epot_expected, rel=1e-3)
+
+
+def test_compute_all_cpp_tabulated():
+    """A TabulatedPotential is converted for the C++ kernels and gives the same
+    results as the Python kernels."""
+    pytest.importorskip('et_md2.potentials.cpp')
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    table = et_md2.potentials.TabulatedPotential(LJ_py(), 0.5, 2.5**2, n=1001)
+    atoms = _lj_atoms(LJ_py())
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, virial_expected = [ x.copy() if isinstance(x, np.ndarray) else x
+                                                   for x in et_md2.interactions.compute_all(atoms, vl, table) ]
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vlcpp, table)
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(virial, virial_expected)
+
+
+def test_compute_forces_interactions_cpp_potential():
+    """compute_forces() and compute_interactions() forward a potential object to
+    the C++ kernels, and reject Python functions."""
+    potentials_cpp = pytest.importorskip('et_md2.potentials.cpp')
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    potential = potentials_cpp.LJ(epsilon=1.5, sigma=0.9)
+    atoms = _lj_atoms(LJ_py())
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, _ = et_md2.interactions.compute_all(atoms, vlcpp, potential)
+    a_expected = a_expected.copy()
+
+    atoms.a[:] = 0.0
+    et_md2.interactions.compute_forces(atoms, vlcpp, potential)
+    assert np.allclose(atoms.a, a_expected)
+    epot = et_md2.interactions.compute_interactions(atoms, vlcpp, potential)
+    assert epot == pytest.approx(epot_expected)
+
+    lj = LJ_py()
+    with pytest.raises(TypeError):
+        et_md2.interactions.compute_forces(atoms, vlcpp, lj.force_factor)
+    with pytest.raises(TypeError):
+        et_md2.interactions.compute_interactions(atoms, vlcpp, lj.interaction_energy)
+
+
+def _binary_mixture():
+    """Return atoms with random types 0 and 1, and a PairLJ_py potential."""
+    atoms = _lj_atoms(LJ_py())
+    atoms.type[:] = np.random.randint(0, 2, atoms.n)
+    pair_lj = et_md2.potentials.PairLJ_py.mixed([0.25, 0.5], [1.0, 0.9], cutoff=[[2.5, 2.2], [2.2, 2.0]])
+    return atoms, pair_lj
+
+
+def test_compute_all_types():
+    """A mixture is computed in a single traversal, and agrees with a direct
+    summation over all pairs of atoms."""
+    atoms, pair_lj = _binary_mixture()
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vl, pair_lj)
+
+    i, j = np.triu_indices(atoms.n, 1)
+    rij = atoms.r[j] - atoms.r[i]
+    rij2 = np.einsum('ij,ij->i', rij, rij)
+    ti, tj = atoms.type[i], atoms.type[j]
+    epot_expected = np.sum(pair_lj.interaction_energy(rij2, ti, tj))
+    fij = rij*pair_lj.force_factor(rij2, ti, tj)[:, np.newaxis]
+    a_expected = np.zeros_like(atoms.a)
+    for d in range(3):
+        a_expected[:, d] = np.bincount(i, weights=fij[:, d], minlength=atoms.n) \
+                         - np.bincount(j, weights=fij[:, d], minlength=atoms.n)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(a, a_expected)
+    assert np.allclose(virial, -np.einsum('ki,kj->ij', rij, fij))
+
+
+@pytest.mark.parametrize('full', [False, True])
+def test_compute_all_cpp_types(full):
+    """The C++ kernels agree with the Python kernels for a mixture."""
+    pytest.importorskip('et_md2.potentials.cpp')
+    cpp = pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    atoms, pair_lj = _binary_mixture()
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, virial_expected = [ x.copy() if isinstance(x, np.ndarray) else x
+                                                   for x in et_md2.interactions.compute_all(atoms, vl, pair_lj) ]
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3, full)
+    vlcpp.build(atoms.r)
+    atoms.a[:] = 0.0
+    a, epot, virial = et_md2.interactions.compute_all(atoms, vlcpp, pair_lj)
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert np.allclose(virial, virial_expected)
+
+    # positions and types with another layout or dtype are converted, the
+    # accelerations, which are updated in place, are not.
+    a = np.zeros_like(atoms.r)
+    cpp.compute_all_dp(np.asfortranarray(atoms.r), a, atoms.m, vlcpp, pair_lj.to_cpp(), atoms.type.astype(np.int64))
+    assert np.allclose(a, a_expected)
+    with pytest.raises(RuntimeError):
+        cpp.compute_forces_dp(atoms.r, np.zeros_like(atoms.r, order='F'), atoms.m, vlcpp, pair_lj.to_cpp(), atoms.type)
+    with pytest.raises(RuntimeError):
+        cpp.compute_interactions_dp(atoms.r[:-1], vlcpp, pair_lj.to_cpp(), atoms.type[:-1])
+
+    atoms.type[0] = 2
+    with pytest.raises(IndexError):
+        cpp.compute_all_dp(atoms.r, atoms.a, atoms.m, vlcpp, pair_lj.to_cpp(), atoms.type)
+
+
+def test_compute_forces_interactions_types():
+    """compute_forces() and compute_interactions() pass the atom types to a
+    potential for a mixture, as compute_all() does."""
+    atoms, pair_lj = _binary_mixture()
+    vl = et_md2.verletlist.VL(cutoff=2.5, skin=0.3)
+    vl.build_vectorized(atoms.r)
+    atoms.a[:] = 0.0
+    a_expected, epot_expected, _ = et_md2.interactions.compute_all(atoms, vl, pair_lj)
+    a_expected = a_expected.copy()
+
+    atoms.a[:] = 0.0
+    et_md2.interactions.compute_forces(atoms, vl, pair_lj)
+    assert np.allclose(atoms.a, a_expected)
+    epot = et_md2.interactions.compute_interactions(atoms, vl, pair_lj)
+    assert epot == pytest.approx(epot_expected)
+
+    pytest.importorskip('et_md2.potentials.cpp')
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    vlcpp = c_vl.VL(atoms.n, 2.5, 0.3)
+    vlcpp.build(atoms.r)
+    for potential in (pair_lj, pair_lj.to_cpp()):
+        atoms.a[:] = 0.0
+        et_md2.interactions.compute_forces(atoms, vlcpp, potential)
+        assert np.allclose(atoms.a, a_expected)
+        epot = et_md2.interactions.compute_interactions(atoms, vlcpp, potential)
+        assert epot == pytest.approx(epot_expected)
+
+
+def test_compute_all_cpp_periodic():
+    """The C++ kernels use the minimum image convention, as the Python kernels."""
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.verletlist.c_vl as c_vl
+    lj = LJ_py()
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(5,5,5))
+    atoms.r *= np.sqrt(2)*lj.r0()
+    atoms.upper_corner = 5*np.sqrt(2)*lj.r0()*np.ones(3)
+    atoms.add_noise(0.05)
+    atoms.apply_PBC()
+    atoms.m[:] = 1.0
+    results = []
+    for vl, potential in ((et_md2.verletlist.VL(cutoff=2.5, skin=0.3), lj), (c_vl.VL(atoms.n, 2.5, 0.3), None)):
+        vl.set_box(atoms.lower_corner, atoms.upper_corner)
+        vl.build(atoms.r)
+        atoms.a[:] = 0.0
+        a, epot, virial = et_md2.interactions.compute_all(atoms, vl, potential)
+        results.append((a.copy(), epot, virial))
+    (a_py, epot_py, virial_py), (a_cpp, epot_cpp, virial_cpp) = results
+    # Newton's third law holds across the box boundaries
+    assert np.allclose(np.sum(a_py, axis=0), 0.0)
+    assert np.allclose(a_cpp, a_py)
+    assert epot_cpp == pytest.approx(epot_py)
+    assert np.allclose(virial_cpp, virial_py)
+
+
+
+def test_compute_all_cpp_layout():
+    """The C++ kernels convert positions with another layout, and reject arrays
+    that cannot be used, rather than reading or writing the wrong memory."""
+    pytest.importorskip('et_md2.interactions.cpp')
+    import et_md2.interactions.cpp as cpp
+    import et_md2.verletlist.c_vl as c_vl
+    lj = LJ_py()
+    atoms = _lj_atoms(lj)
+    vl = c_vl.VL(atoms.n, 2.5, 0.3)
+    vl.build(atoms.r)
+    a_expected, epot_expected, virial_expected = cpp.compute_all_dp(atoms.r, np.zeros_like(atoms.r), atoms.m, vl)
+
+    a = np.zeros_like(atoms.r)
+    _, epot, virial = cpp.compute_all_dp(np.asfortranarray(atoms.r), a, atoms.m, vl)
+    assert np.allclose(a, a_expected)
+    assert epot == pytest.approx(epot_expected)
+    assert cpp.compute_interactions_dp(np.repeat(atoms.r, 2, axis=0)[::2], vl) == pytest.approx(epot_expected)
+    # the accelerations are updated in place, hence cannot be converted
+    for a in (np.zeros_like(atoms.r, order='F'), np.zeros(atoms.r.shape, dtype=np.float32), np.zeros_like(atoms.r).tolist()):
+        with pytest.raises(RuntimeError):
+            cpp.compute_all_dp(atoms.r, a, atoms.m, vl)
+        with pytest.raises(RuntimeError):
+            cpp.compute_forces_dp(atoms.r, a, atoms.m, vl)
+    a = np.zeros_like(atoms.r)
+    # wrong shapes
+    with pytest.raises(RuntimeError):
+        cpp.compute_all_dp(np.ascontiguousarray(atoms.r[:,:2]), a, atoms.m, vl)
+    with pytest.raises(RuntimeError):
+        cpp.compute_interactions_dp(atoms.r[:-1], vl)
+    with pytest.raises(RuntimeError):
+        cpp.compute_forces_dp(atoms.r, a[:-1], atoms.m, vl)
+    with pytest.raises(RuntimeError):
+        cpp.compute_forces_dp(atoms.r, a, atoms.m[:-1], vl)
+
+
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (normally all tests are run with pytest)
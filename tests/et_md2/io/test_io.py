@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for sub-module et_md2.io."""
+
+import sys
+sys.path.insert(0,'.')
+
+import numpy as np
+import pytest
+
+from et_md2.atoms import Atoms
+import et_md2.io
+import et_md2.verletlist
+
+
+def _atoms(dtype=float):
+    """Return a slightly disordered crystal with random velocities, types and image counters."""
+    np.random.seed(3)
+    atoms = Atoms(dtype=dtype)
+    atoms.lattice_positions(upper_corner=(4,4,4), r0=1.0)
+    atoms.add_noise(0.05)
+    atoms.apply_PBC()
+    atoms.v[:] = np.random.random(atoms.v.shape)
+    atoms.a[:] = np.random.random(atoms.a.shape)
+    atoms.m[:] = 1.0 + np.random.random(atoms.n)
+    atoms.type[:] = np.random.randint(0, 3, atoms.n)
+    atoms.image[:] = np.random.randint(-2, 3, atoms.image.shape)
+    return atoms
+
+
+@pytest.mark.parametrize('dtype', [float, np.single])
+@pytest.mark.parametrize('mmap_mode', ['c', None])
+def test_atoms(tmp_path, dtype, mmap_mode):
+    atoms = _atoms(dtype)
+    path = tmp_path / 'atoms.chk'
+    atoms.save(path)
+    loaded = Atoms.load(path, mmap_mode=mmap_mode)
+    assert loaded.n == atoms.n
+    assert loaded.dtype == atoms.dtype
+    for name in ('r', 'v', 'a', 'm', 'type', 'image'):
+        assert getattr(loaded, name).dtype == getattr(atoms, name).dtype
+        assert np.array_equal(getattr(loaded, name), getattr(atoms, name))
+    assert isinstance(loaded.r, np.memmap) == (mmap_mode is not None)
+    assert loaded.arrays[0] is loaded.r
+    assert np.array_equal(loaded.lower_corner, atoms.lower_corner)
+    assert np.array_equal(loaded.upper_corner, atoms.upper_corner)
+    # copy-on-write: the file is not modified
+    loaded.r[:] = 0.0
+    assert np.array_equal(et_md2.io.load_atoms(path).r, atoms.r)
+
+
+def test_atoms_empty(tmp_path):
+    atoms = Atoms(0)
+    path = tmp_path / 'atoms.chk'
+    atoms.save(path)
+    loaded = Atoms.load(path)
+    assert loaded.n == 0
+    assert loaded.lower_corner is None and loaded.upper_corner is None
+
+
+def test_not_a_checkpoint(tmp_path):
+    path = tmp_path / 'atoms.chk'
+    path.write_bytes(b'0123456789abcdef')
+    with pytest.raises(ValueError):
+        Atoms.load(path)
+    _atoms().save(path)
+    with pytest.raises(ValueError):
+        et_md2.io.load_vl(path)
+
+
+def test_sections_aligned(tmp_path):
+    path = tmp_path / 'atoms.chk'
+    _atoms().save(path)
+    _, _, arrays = et_md2.io.read_sections(path)
+    for array in arrays.values():
+        assert array.offset % et_md2.io.ALIGNMENT == 0
+
+
+@pytest.mark.parametrize('periodic', [False, True])
+def test_vl_py(tmp_path, periodic):
+    atoms = _atoms()
+    vl = et_md2.verletlist.VL(cutoff=1.2, skin=0.2)
+    if periodic:
+        vl.set_box(atoms.lower_corner, atoms.upper_corner)
+    vl.build_vectorized(atoms.r)
+    path = tmp_path / 'vl.chk'
+    et_md2.io.save_vl(vl, path)
+    loaded = et_md2.io.load_vl(path)
+    assert isinstance(loaded, et_md2.verletlist.VL)
+    assert isinstance(loaded.vl_list, np.memmap)
+    for name in ('vl_list', 'vl_offset', 'vl_size', 'r_ref'):
+        assert np.array_equal(getattr(loaded, name), getattr(vl, name))
+    assert (loaded.cutoff, loaded.skin, loaded.full) == (vl.cutoff, vl.skin, vl.full)
+    assert loaded.periodic == vl.periodic
+    if periodic:
+        assert np.allclose(loaded.box_width, vl.box_width)
+    assert not loaded.needs_rebuild(atoms.r)
+    assert et_md2.verletlist.vl2set(loaded) == et_md2.verletlist.vl2set(vl)
+
+
+def test_vl_py_not_linearised(tmp_path):
+    vl = et_md2.verletlist.VL(cutoff=1.2)
+    with pytest.raises(ValueError):
+        et_md2.io.save_vl(vl, tmp_path / 'vl.chk')
+
+
+@pytest.mark.parametrize('VLType', ['VL', 'VL64'])
+@pytest.mark.parametrize('periodic', [False, True])
+def test_vl_cpp(tmp_path, VLType, periodic):
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = _atoms()
+    vl = getattr(c_vl, VLType)(atoms.n, 1.2, 0.2, False)
+    if periodic:
+        vl.set_box(atoms.lower_corner, atoms.upper_corner)
+    vl.build(atoms.r)
+    path = tmp_path / 'vl.chk'
+    et_md2.io.save_vl(vl, path)
+    loaded = et_md2.io.load_vl(path)
+    assert type(loaded) is type(vl)
+    for name in ('vl_list', 'vl_offset', 'vl_size', 'r_ref'):
+        assert np.array_equal(getattr(loaded, name), getattr(vl, name))
+    assert (loaded.cutoff(), loaded.skin(), loaded.full()) == (vl.cutoff(), vl.skin(), vl.full())
+    assert loaded.periodic == periodic
+    assert not loaded.needs_rebuild(atoms.r)
+    # the reference positions passed override those in the file
+    r = atoms.r + 0.2
+    assert not et_md2.io.load_vl(path, r_ref=r).needs_rebuild(r)
+
+    # without reference positions the Verlet list must be rebuilt
+    vl = getattr(c_vl, VLType)(atoms.n, 1.2, 0.2, False)
+    vl.assign(loaded.vl_list, loaded.vl_offset, loaded.vl_size)
+    assert vl.r_ref is None
+    et_md2.io.save_vl(vl, path)
+    with pytest.warns(UserWarning):
+        loaded = et_md2.io.load_vl(path)
+    assert loaded.needs_rebuild(atoms.r)
+
+
+def test_vl_cpp_assign():
+    import et_md2.verletlist.c_vl as c_vl
+    vl = c_vl.VL(3, 1.0, 0.0, False)
+    vl.assign(np.array([1, 2, 2], dtype=np.int32), np.array([0, 2, 3]), np.array([2, 1, 0], dtype=np.int32))
+    assert vl.linearised()
+    assert vl.has(0, 1) and vl.has(0, 2) and vl.has(1, 2)
+    # neighbour index out of range
+    with pytest.raises(RuntimeError):
+        vl.assign(np.array([1, 3], dtype=np.int32), np.array([0, 2, 2]), np.array([2, 0, 0], dtype=np.int32))
+    # Verlet list out of range
+    with pytest.raises(RuntimeError):
+        vl.assign(np.array([1, 2], dtype=np.int32), np.array([0, 2, 2]), np.array([2, 1, 0], dtype=np.int32))
+    # vl_offset and vl_size differ in length
+    with pytest.raises(RuntimeError):
+        vl.assign(np.array([1], dtype=np.int32), np.array([0, 1, 1]), np.array([1, 0], dtype=np.int32))
+    # vl_offset is not non-decreasing
+    with pytest.raises(RuntimeError):
+        vl.assign(np.array([2, 1, 2], dtype=np.int32), np.array([1, 0, 3]), np.array([2, 1, 0], dtype=np.int32))
+
+
+
+@pytest.mark.parametrize('velocities', [False, True])
+def test_trajectory(tmp_path, velocities):
+    atoms = _atoms(np.single)
+    path = tmp_path / 'traj.bin'
+    frames = []
+    # more frames than buffers, to exercise the back-pressure
+    with et_md2.io.TrajectoryWriter(path, atoms, velocities=velocities, nbuffers=2) as writer:
+        for step in range(0, 1000, 50):
+            atoms.r += 0.01
+            atoms.v *= 0.9
+            writer.write(step, atoms)
+            frames.append((step, atoms.r.copy(), atoms.v.copy()))
+    assert writer.closed
+    reader = et_md2.io.TrajectoryReader(path)
+    assert len(reader) == len(frames)
+    assert reader.natoms == atoms.n
+    assert reader.dtype == np.float32
+    assert np.array_equal(reader.upper_corner, atoms.upper_corner)
+    assert np.array_equal(reader.steps, [step for step, _, _ in frames])
+    for frame, (step, r, v) in zip(reader, frames):
+        assert frame['step'] == step
+        assert np.array_equal(frame['r'], r)
+        if velocities:
+            assert np.array_equal(frame['v'], v)
+        else:
+            assert 'v' not in frame.dtype.names
+    with pytest.raises(ValueError):
+        writer.write(0, atoms)
+
+
+def test_trajectory_partial_frame(tmp_path):
+    atoms = _atoms()
+    path = tmp_path / 'traj.bin'
+    with et_md2.io.TrajectoryWriter(path, atoms) as writer:
+        writer.write(0, atoms)
+        writer.write(1, atoms)
+        writer.flush()
+        assert len(et_md2.io.TrajectoryReader(path)) == 2
+    # an interrupted write leaves a partial frame
+    with open(path, 'r+b') as f:
+        f.truncate(path.stat().st_size - 10)
+    reader = et_md2.io.TrajectoryReader(path)
+    assert len(reader) == 1
+    assert np.array_equal(reader[0]['r'], atoms.r)
+
+
+def test_trajectory_callback(tmp_path):
+    import et_md2.integrators
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = _atoms()
+    atoms.type[:] = 0
+    atoms.v[:] = 0.0
+    vl = c_vl.VL(atoms.n, 1.2, 0.2, False)
+    path = tmp_path / 'traj.bin'
+    with et_md2.io.TrajectoryWriter(path, atoms, velocities=True) as writer:
+        et_md2.integrators.run(atoms, vl, dt=0.001, nsteps=100, every=10, callback=writer, pbc=True)
+    reader = et_md2.io.TrajectoryReader(path)
+    assert np.array_equal(reader.steps, np.arange(10, 101, 10))
+    assert np.array_equal(reader[-1]['r'], atoms.r)
+    assert np.array_equal(reader[-1]['v'], atoms.v)
+
+
+
+def test_encode():
+    np.random.seed(5)
+    values = np.random.randint(-100, 100, 1000)
+    # a few outliers, e.g. atoms wrapped by the periodic boundary conditions
+    values[[3, 500, 999]] = [10**6, -2**40, 2**62]
+    nbits, data = et_md2.io._encode(values.copy())
+    assert nbits == 8
+    data = b''.join(data)
+    decoded, offset = et_md2.io._decode(data, 0, len(values), nbits)
+    assert offset == len(data)
+    assert np.array_equal(decoded, values)
+    # all zero
+    nbits, data = et_md2.io._encode(np.zeros(10, dtype=np.int64))
+    assert nbits == 0
+    assert np.array_equal(et_md2.io._decode(b''.join(data), 0, 10, nbits)[0], np.zeros(10))
+
+
+@pytest.mark.parametrize('dtype', [float, np.single])
+def test_compressed_trajectory(tmp_path, dtype):
+    atoms = _atoms(dtype)
+    path = tmp_path / 'traj.trz'
+    precision = 0.001
+    frames = []
+    with et_md2.io.CompressedTrajectoryWriter(path, atoms, precision, keyframe_interval=3, nbuffers=2) as writer:
+        for step in range(10):
+            atoms.r += 0.01 * (atoms.v - 0.5)
+            atoms.apply_PBC()
+            writer.write(step, atoms)
+            frames.append(atoms.r.copy())
+    reader = et_md2.io.CompressedTrajectoryReader(path)
+    assert len(reader) == len(frames)
+    assert np.array_equal(reader.steps, np.arange(10))
+    assert np.array_equal(reader._keyframes, [0, 3, 6, 9])
+    # random access, across keyframes
+    for k in (7, 2, -1, 4, 0):
+        frame = reader[k]
+        assert frame['step'] == k % 10
+        assert frame['r'].dtype == atoms.r.dtype
+        assert np.max(np.abs(frame['r'] - frames[k])) <= 0.5 * precision * (1 + 1e-3)
+    with pytest.raises(IndexError):
+        reader[10]
+
+
+def test_compressed_trajectory_size(tmp_path):
+    atoms = _atoms()
+    atoms.lattice_positions(upper_corner=(10,10,10), r0=1.0)
+    atoms.add_noise(0.05)
+    path = tmp_path / 'traj.trz'
+    with et_md2.io.CompressedTrajectoryWriter(path, atoms, 0.01) as writer:
+        for step in range(10):
+            writer.write(step, atoms)
+    assert 10 * atoms.r.nbytes / path.stat().st_size > 5
+
+
+def test_compressed_trajectory_partial_frame(tmp_path):
+    atoms = _atoms()
+    path = tmp_path / 'traj.trz'
+    with et_md2.io.CompressedTrajectoryWriter(path, atoms, 0.01) as writer:
+        writer.write(0, atoms)
+        writer.write(1, atoms)
+    with open(path, 'r+b') as f:
+        f.truncate(path.stat().st_size - 10)
+    reader = et_md2.io.CompressedTrajectoryReader(path)
+    assert len(reader) == 1
+    assert np.allclose(reader[0]['r'], atoms.r, atol=0.005)
+
+
+def test_compressed_trajectory_no_box(tmp_path):
+    atoms = _atoms()
+    atoms.lower_corner = None
+    with pytest.raises(ValueError):
+        et_md2.io.CompressedTrajectoryWriter(tmp_path / 'traj.trz', atoms, 0.01)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (normally all tests are run with pytest)
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_vl_cpp_assign
+
+    print("__main__ running", the_test_you_want_to_debug)
+    the_test_you_want_to_debug()
+    print("-*# finished #*-")
+# ==============================================================================
@@ -2,28 +2,128 @@
 # -*- coding: utf-8 -*-
 
 """
-Tests for C++ module et-MD2.cpp.
+Tests for C++ module et_md2.potentials.cpp.
 """
 
-import os
 import sys
+sys.path.insert(0,'.')
 
 import numpy as np
+import pytest
 
-import et_md2
+import et_md2.potentials
+cpp = pytest.importorskip('et_md2.potentials.cpp')
 
-# create an alias for the binary extension cpp module
-cpp = et_md2.cpp
 
+def all_potentials():
+    return [ cpp.LJ(epsilon=2.0, sigma=1.5)
+           , cpp.Morse(D=2.0, a=1.5, r0=1.2)
+           , cpp.WCA(epsilon=2.0, sigma=1.5)
+           , cpp.SoftSphere(epsilon=2.0, sigma=1.5, n=9)
+           ]
 
-def test_cpp_add():
-    x = np.array([0,1,2,3,4],dtype=float)
-    shape = x.shape
-    y = np.ones (shape,dtype=float)
-    z = np.zeros(shape,dtype=float)
-    expected_z = x + y
-    result = cpp.add(x,y,z)
-    assert (z == expected_z).all()
+
+def test_lj():
+    """For sigma = 1 the C++ LJ agrees with LJ_py."""
+    lj = cpp.LJ(epsilon=0.25)
+    lj_py = et_md2.potentials.LJ_py()
+    rij2 = np.linspace(0.8, 3.0, 23)
+    assert np.allclose(lj.interaction_energy(rij2), lj_py.interaction_energy(rij2))
+    assert np.allclose(lj.force_factor(rij2), lj_py.force_factor(rij2))
+    assert lj.r0() == pytest.approx(lj_py.r0())
+    lj2 = cpp.LJ(epsilon=2.0, sigma=1.5)
+    assert lj2.interaction_energy(lj2.r0()**2) == pytest.approx(-2.0)
+    assert lj2.force_factor(lj2.r0()**2) == pytest.approx(0.0, abs=1e-12)
+
+
+@pytest.mark.parametrize('potential', all_potentials())
+def test_force_factor(potential):
+    """The force factor is 2*dV/d(rij2), compared with a central difference."""
+    rij2 = np.linspace(1.0, 5.0, 41)
+    h = 1e-6
+    dV = (potential.interaction_energy(rij2 + h) - potential.interaction_energy(rij2 - h)) / (2*h)
+    assert np.allclose(potential.force_factor(rij2), 2*dV, rtol=1e-5, atol=1e-7)
+
+
+@pytest.mark.parametrize('potential', all_potentials())
+def test_dtype(potential):
+    """Floats give floats, arrays are computed in their own precision."""
+    assert isinstance(potential.interaction_energy(2.0), float)
+    for dtype in (np.float32, np.float64):
+        rij2 = np.linspace(1.0, 5.0, 5, dtype=dtype)
+        assert potential.interaction_energy(rij2).dtype == dtype
+        assert potential.force_factor(rij2).dtype == dtype
+        assert np.allclose(potential.force_factor(rij2), potential.force_factor(rij2.astype(float)), rtol=1e-5)
+
+
+def test_wca():
+    wca = cpp.WCA(epsilon=2.0, sigma=1.5)
+    lj = cpp.LJ(epsilon=2.0, sigma=1.5)
+    r0 = wca.r0()
+    assert r0 == pytest.approx(lj.r0())
+    rij2 = np.array([0.5, 1.0, 0.999*r0**2])
+    assert np.allclose(wca.interaction_energy(rij2), lj.interaction_energy(rij2) + 2.0)
+    assert np.allclose(wca.force_factor(rij2), lj.force_factor(rij2))
+    assert wca.interaction_energy(0.999*r0**2) == pytest.approx(0.0, abs=1e-4) # continuous
+    assert wca.interaction_energy(r0**2) == 0.0
+    assert wca.force_factor(4*r0**2) == 0.0
+
+
+def test_morse():
+    morse = cpp.Morse(D=2.0, a=1.5, r0=1.2)
+    assert morse.interaction_energy(1.2**2) == pytest.approx(-2.0)
+    assert morse.force_factor(1.2**2) == pytest.approx(0.0, abs=1e-12)
+    assert morse.interaction_energy(1e6) == pytest.approx(0.0, abs=1e-12)
+
+
+def test_soft_sphere():
+    ss = cpp.SoftSphere(epsilon=2.0, sigma=1.5, n=9)
+    r = 1.7
+    assert ss.interaction_energy(r**2) == pytest.approx(2.0*(1.5/r)**9)
+    assert ss.force_factor(r**2) < 0 # repulsive
+
+
+@pytest.mark.parametrize('kind', ['cubic', 'linear'])
+def test_tabulated(kind):
+    """The C++ table agrees with the Python table."""
+    table = et_md2.potentials.TabulatedPotential(et_md2.potentials.LJ_py(), 0.64, 6.25, n=301, kind=kind)
+    tabulated = table.to_cpp()
+    assert tabulated is table.to_cpp()
+    assert tabulated.n == 301
+    rij2 = np.linspace(0.5, 7.0, 1001)
+    assert np.allclose(tabulated.interaction_energy(rij2), table.interaction_energy(rij2), rtol=1e-12, atol=1e-12)
+    assert np.allclose(tabulated.force_factor(rij2), table.force_factor(rij2), rtol=1e-12, atol=1e-12)
+    with pytest.raises(RuntimeError):
+        cpp.Tabulated(0.64, 6.25, table.energy_coefficients[:, :3], table.force_factor_coefficients)
+
+
+def test_pair_lj():
+    """The C++ PairLJ agrees with PairLJ_py."""
+    pair_lj_py = et_md2.potentials.PairLJ_py.mixed([1.0, 4.0, 2.0], [1.0, 2.0, 1.2], cutoff=2.5)
+    pair_lj = pair_lj_py.to_cpp()
+    assert pair_lj.ntypes == 3
+    n = 200
+    rij2 = np.random.uniform(0.8, 7.0, n)
+    ti = np.random.randint(0, 3, n).astype(np.int32)
+    tj = np.random.randint(0, 3, n).astype(np.int32)
+    assert np.allclose(pair_lj.interaction_energy(rij2, ti, tj), pair_lj_py.interaction_energy(rij2, ti, tj))
+    assert np.allclose(pair_lj.force_factor(rij2, ti, tj), pair_lj_py.force_factor(rij2, ti, tj))
+    # no cutoff
+    pair_lj = cpp.PairLJ(pair_lj_py.epsilon, pair_lj_py.sigma)
+    assert pair_lj.interaction_energy(100.0, 1, 1) != 0.0
+    # atom types out of range
+    for t in (3, -1):
+        with pytest.raises(IndexError):
+            pair_lj.interaction_energy(rij2, ti, np.full(n, t, dtype=np.int32))
+        with pytest.raises(IndexError):
+            pair_lj.force_factor(1.0, t, 0)
+    # asymmetric parameters, as PairLJ_py
+    with pytest.raises(ValueError):
+        cpp.PairLJ([[1.0, 2.0], [3.0, 4.0]], np.ones((2,2)))
+    # parameters with another layout are converted
+    epsilon = np.asfortranarray(pair_lj_py.epsilon)
+    assert cpp.PairLJ(epsilon, pair_lj_py.sigma[:, ::-1][:, ::-1]).interaction_energy(2.0, 0, 1) \
+        == pytest.approx(pair_lj_py.interaction_energy(2.0, 0, 1))
 
 
 #===============================================================================
@@ -31,7 +131,7 @@ def test_cpp_add():
 # (normally all tests are run with pytest)
 #===============================================================================
 if __name__ == "__main__":
-    the_test_you_want_to_debug = test_cpp_add
+    the_test_you_want_to_debug = test_lj
 
     print(f"__main__ running {the_test_you_want_to_debug} ...")
     the_test_you_want_to_debug()
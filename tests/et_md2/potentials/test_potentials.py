@@ -149,6 +149,84 @@ def test_force_direction():
     assert fij[0] > 0
 
 
+def test_tabulated_cubic():
+    """The cubic table reproduces the Lennard-Jones potential and its force factor."""
+    lj = LJ()
+    table = et_md2.potentials.TabulatedPotential(lj, 0.64, 6.25, n=2001)
+    rij2 = np.linspace(0.64, 6.2, 997)
+    energy = lj.interaction_energy(rij2)
+    force_factor = lj.force_factor(rij2)
+    assert np.allclose(table.interaction_energy(rij2), energy, rtol=0, atol=1e-8*np.abs(energy).max())
+    assert np.allclose(table.force_factor(rij2), force_factor, rtol=0, atol=1e-6*np.abs(force_factor).max())
+    # exact in the grid points
+    rij2 = 0.64 + 100*table.h
+    assert table.interaction_energy(rij2) == pytest.approx(lj.interaction_energy(rij2), rel=1e-12)
+    assert isinstance(table.interaction_energy(rij2), float)
+
+
+def test_tabulated_linear():
+    """Linear interpolation is less accurate than cubic interpolation."""
+    lj = LJ()
+    cubic  = et_md2.potentials.TabulatedPotential(lj, 0.64, 6.25, n=501)
+    linear = et_md2.potentials.TabulatedPotential(lj, 0.64, 6.25, n=501, kind='linear')
+    rij2 = np.linspace(0.64, 6.2, 997)
+    exact = lj.interaction_energy(rij2)
+    err_cubic  = np.abs(cubic .interaction_energy(rij2) - exact).max()
+    err_linear = np.abs(linear.interaction_energy(rij2) - exact).max()
+    assert err_cubic < err_linear < 0.1
+
+
+def test_tabulated_cutoff():
+    """Energy and force factor vanish beyond rij2_max."""
+    table = et_md2.potentials.TabulatedPotential(LJ(), 0.64, 6.25, n=101)
+    rij2 = np.array([6.25, 7.0, 100.0])
+    assert np.all(table.interaction_energy(rij2) == 0.0)
+    assert np.all(table.force_factor(rij2) == 0.0)
+
+
+def test_tabulated_function():
+    """A plain function V(rij2) is tabulated, with a finite difference force factor."""
+    lj = LJ()
+    table = et_md2.potentials.TabulatedPotential(lj.interaction_energy, 0.64, 6.25, n=4001)
+    rij2 = np.linspace(0.7, 6.2, 101)
+    force_factor = lj.force_factor(rij2)
+    assert np.allclose(table.interaction_energy(rij2), lj.interaction_energy(rij2), rtol=0, atol=1e-6)
+    assert np.allclose(table.force_factor(rij2), force_factor, rtol=0, atol=1e-4*np.abs(force_factor).max())
+    with pytest.raises(ValueError):
+        et_md2.potentials.TabulatedPotential(lj, 6.25, 0.64)
+
+
+def test_pair_lj_single_type():
+    """With a single type PairLJ_py agrees with LJ_py."""
+    lj = LJ()
+    pair_lj = et_md2.potentials.PairLJ_py(0.25, 1.0)
+    assert pair_lj.ntypes == 1
+    rij2 = np.linspace(0.8, 6.0, 27)
+    t = np.zeros(len(rij2), dtype=np.int32)
+    assert np.allclose(pair_lj.interaction_energy(rij2, t, t), lj.interaction_energy(rij2))
+    assert np.allclose(pair_lj.force_factor(rij2, t, t), lj.force_factor(rij2))
+
+
+def test_pair_lj_mixed():
+    """Lorentz-Berthelot mixing rules and the cutoff per pair of types."""
+    pair_lj = et_md2.potentials.PairLJ_py.mixed([1.0, 4.0], [1.0, 2.0], cutoff=[[2.5, 3.0], [3.0, 3.5]])
+    assert np.allclose(pair_lj.epsilon, [[1.0, 2.0], [2.0, 4.0]])
+    assert np.allclose(pair_lj.sigma, [[1.0, 1.5], [1.5, 2.0]])
+    for a in range(2):
+        for b in range(2):
+            lj = LJ(epsilon=pair_lj.epsilon[a, b], sigma=pair_lj.sigma[a, b])
+            rij2 = np.linspace(0.9, 0.99*pair_lj.cutoff[a, b], 11)**2
+            assert np.allclose(pair_lj.interaction_energy(rij2, a, b), lj.interaction_energy(rij2))
+            s6 = (pair_lj.sigma[a, b]**2/rij2)**3
+            ff = 24*pair_lj.epsilon[a, b]*(1 - 2*s6)*s6/rij2
+            assert np.allclose(pair_lj.force_factor(rij2, a, b), ff)
+            rij2 = pair_lj.cutoff[a, b]**2
+            assert pair_lj.interaction_energy(rij2, a, b) == 0.0
+            assert pair_lj.force_factor(rij2, a, b) == 0.0
+    with pytest.raises(ValueError):
+        et_md2.potentials.PairLJ_py([[1.0, 2.0], [3.0, 4.0]], np.ones((2,2)))
+
+
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (normally all tests are run with pytest)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for sub-module et_md2.spatial_sorting."""
+
+import sys
+sys.path.insert(0,'.')
+
+import pytest
+import numpy as np
+
+from et_md2.atoms import Atoms
+import et_md2.verletlist
+import et_md2.verletlist.c_vl
+import et_md2.spatial_sorting
+import et_md2.spatial_sorting.cpp as cpp
+
+
+def test_hilbert_roundtrip():
+    """h2ijk is the inverse of ijk2h, and neighbouring Hilbert indices are neighbouring cells."""
+    n = 8
+    ijk = np.empty(3, dtype=np.int32)
+    cells = {}
+    for i in range(n):
+        for j in range(n):
+            for k in range(n):
+                ijk[:] = (i,j,k)
+                h = cpp.ijk2h_1(ijk)
+                cpp.h2ijk(h, ijk)
+                assert tuple(ijk) == (i,j,k)
+                cells[h] = (i,j,k)
+    assert sorted(cells) == list(range(n**3))
+    for h in range(1, n**3):
+        assert np.sum(np.abs(np.array(cells[h]) - np.array(cells[h-1]))) == 1
+
+
+@pytest.mark.parametrize('n', [1, 10, 1000, 200000])
+def test_sort(n):
+    """The radix sort is stable, and does not depend on the number of threads."""
+    max_threads = et_md2.verletlist.c_vl.max_threads()
+    # many duplicate keys, and keys beyond the Hilbert index limit
+    h0 = np.random.randint(0, 2**40, n // 10 + 1)[np.random.randint(0, n // 10 + 1, n)]
+    for nthreads in (1, 3):
+        et_md2.verletlist.c_vl.set_num_threads(nthreads)
+        h = h0.copy()
+        I = np.empty(n, dtype=np.uint32)
+        cpp.sort(h, I)
+        assert np.array_equal(I, np.argsort(h0, kind='stable'))
+        assert np.array_equal(h, h0[I])
+    et_md2.verletlist.c_vl.set_num_threads(max_threads)
+
+
+@pytest.mark.parametrize('dtype', [float, np.single])
+def test_hilbert_order(dtype):
+    """The Hilbert order sorts the Hilbert keys of the cells, and is stable."""
+    atoms = Atoms(2000, dtype=dtype)
+    atoms.r[:] = np.random.random(atoms.r.shape)*(7.0, 6.0, 5.0) - 2.0
+    h = et_md2.spatial_sorting.hilbert_keys(atoms.r, 1.0)
+    assert np.all(h >= 0)
+    perm = et_md2.spatial_sorting.hilbert_order(atoms.r, 1.0)
+    assert np.array_equal(perm, np.argsort(h, kind='stable'))
+    # too many cells for the Hilbert curve, the cells are widened
+    h = et_md2.spatial_sorting.hilbert_keys(1000*atoms.r, 1.0)
+    assert np.all((0 <= h) & (h < cpp.hilbert_index_limit()))
+
+
+@pytest.mark.parametrize('dtype', [float, np.single])
+def test_build_verlet_list(dtype):
+    """Verify the Hilbert cell list build against the C++ build."""
+    cutoff = 1.0
+    atoms = Atoms(3000, dtype=dtype)
+    atoms.random_positions(upper_corner=(7,6,5))
+
+    expected = et_md2.verletlist.c_vl.VL(atoms.n, cutoff, skin=0.1)
+    expected.build(atoms.r)
+
+    vl = et_md2.verletlist.c_vl.VL(atoms.n, cutoff, skin=0.1)
+    et_md2.spatial_sorting.build_verlet_list(atoms.r, vl)
+    assert vl.natoms() == atoms.n
+    assert et_md2.verletlist.vl2set(vl) == et_md2.verletlist.vl2set(expected)
+    for i in range(atoms.n):
+        for k in range(vl.ncontacts(i)):
+            assert i < vl.contact(i,k)
+    assert not vl.needs_rebuild(atoms.r)
+
+
+def test_build_verlet_list_periodic():
+    """With a periodic box, the Hilbert cell list build finds the minimum image pairs."""
+    cutoff = 1.0
+    atoms = Atoms(3000)
+    atoms.r[:] = np.random.random(atoms.r.shape)*(7.0, 6.0, 5.0)
+    atoms.lower_corner = np.zeros(3)
+    atoms.upper_corner = np.array([7.0, 6.0, 5.0])
+
+    expected = et_md2.verletlist.c_vl.VL(atoms.n, cutoff, skin=0.1)
+    expected.set_box(atoms.lower_corner, atoms.upper_corner)
+    expected.build_simple(atoms.r)
+
+    vl = et_md2.verletlist.c_vl.VL(atoms.n, cutoff, skin=0.1)
+    vl.set_box(atoms.lower_corner, atoms.upper_corner)
+    et_md2.spatial_sorting.build_verlet_list(atoms.r, vl)
+    assert et_md2.verletlist.vl2set(vl) == et_md2.verletlist.vl2set(expected)
+    assert not vl.needs_rebuild(atoms.r)
+
+
+
+def test_build_verlet_list_sparse():
+    """Two clusters of atoms far apart: the cells span a huge, mostly empty box."""
+    cutoff = 1.0
+    np.random.seed(2)
+    r = np.random.random((1000, 3))*3.0
+    r[500:] += (2000.0, 1500.0, 1000.0)
+
+    expected = et_md2.verletlist.c_vl.VL(len(r), cutoff)
+    expected.build_simple(r)
+
+    vl = et_md2.verletlist.c_vl.VL(len(r), cutoff)
+    et_md2.spatial_sorting.build_verlet_list(r, vl)
+    assert et_md2.verletlist.vl2set(vl) == et_md2.verletlist.vl2set(expected)
+
+
+def test_build_verlet_list_layout():
+    """Positions with another layout are converted, positions with a wrong shape are rejected."""
+    cutoff = 1.0
+    np.random.seed(3)
+    r = np.random.random((1000, 3))*(7.0, 6.0, 5.0)
+    expected = et_md2.verletlist.c_vl.VL(len(r), cutoff)
+    expected.build(r)
+    for rr in (np.asfortranarray(r), np.repeat(r, 2, axis=0)[::2]):
+        vl = et_md2.verletlist.c_vl.VL(len(r), cutoff)
+        et_md2.spatial_sorting.build_verlet_list(rr, vl)
+        assert et_md2.verletlist.vl2set(vl) == et_md2.verletlist.vl2set(expected)
+    with pytest.raises(RuntimeError):
+        et_md2.spatial_sorting.build_verlet_list(np.ascontiguousarray(r[:,:2]), vl)
+
+
+# ==============================================================================
+# The code below is for debugging a particular test in eclipse/pydev.
+# (normally all tests are run with pytest)
+# ==============================================================================
+if __name__ == "__main__":
+    the_test_you_want_to_debug = test_hilbert_roundtrip
+
+    print(f'__main__ running {the_test_you_want_to_debug}')
+    the_test_you_want_to_debug()
+    print("-*# finished #*-")
+# ==============================================================================
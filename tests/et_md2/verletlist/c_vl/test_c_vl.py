@@ -42,6 +42,270 @@ def test_vl():
 
 
 
+def test_vl_skin():
+    natoms = 4
+    VerletList = et_md2.verletlist.implementation('cpp')
+    vlist = VerletList(natoms, 1.5, skin=0.6)
+    assert vlist.cutoff() == 1.5
+    assert vlist.skin() == 0.6
+    assert vlist.list_cutoff() == pytest.approx(2.1)
+
+    for dtype in (np.float64, np.float32):
+        vlist = VerletList(natoms, 1.5, skin=0.6)
+        r = np.zeros((natoms,3), dtype=dtype)
+        r[:,0] = np.arange(natoms)
+        assert vlist.needs_rebuild(r)
+        vlist.set_reference(r)
+        assert not vlist.needs_rebuild(r)
+        r[2,2] += 0.29
+        assert not vlist.needs_rebuild(r)
+        r[2,2] += 0.02
+        assert vlist.needs_rebuild(r)
+
+
+def test_vl_build():
+    """Verify the C++ build methods against the Python VL.build_simple."""
+    cutoff = 1.1
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(5,4,3))
+    atoms.add_noise(0.1)
+
+    vlpy = et_md2.verletlist.VL(cutoff=cutoff, skin=0.2)
+    vlpy.build_simple(atoms.r)
+    expected = et_md2.verletlist.vl2set(vlpy)
+
+    VerletList = et_md2.verletlist.implementation('cpp')
+    for dtype in (np.float64, np.float32):
+        r = atoms.r.astype(dtype)
+        for method in ('build_simple', 'build'):
+            vlist = VerletList(atoms.n, cutoff, skin=0.2)
+            getattr(vlist, method)(r)
+            assert vlist.natoms() == atoms.n
+            assert et_md2.verletlist.vl2set(vlist) == expected
+            for i in range(atoms.n):
+                vli = [vlist.contact(i,k) for k in range(vlist.ncontacts(i))]
+                assert vli == list(vlpy.verlet_list(i))
+            assert not vlist.needs_rebuild(r)
+
+def test_vl_build_deterministic():
+    """The Verlet list does not depend on the number of threads."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms(2000)
+    atoms.random_positions(upper_corner=(6,6,6))
+
+    max_threads = c_vl.max_threads()
+    vlists = []
+    for nthreads in (1, 3, max_threads):
+        c_vl.set_num_threads(nthreads)
+        vlist = c_vl.VL(atoms.n, 1.0, skin=0.1)
+        vlist.build(atoms.r)
+        vlists.append(vlist)
+    c_vl.set_num_threads(max_threads)
+
+    expected = vlists[0]
+    for vlist in vlists[1:]:
+        for i in range(atoms.n):
+            assert vlist.ncontacts(i) == expected.ncontacts(i)
+            for k in range(vlist.ncontacts(i)):
+                assert vlist.contact(i,k) == expected.contact(i,k)
+
+def test_vl_arrays():
+    """The linearised Verlet list is exposed as read-only numpy arrays, without copying."""
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    VerletList = et_md2.verletlist.implementation('cpp')
+    vlist = VerletList(atoms.n, 1.0)
+    assert vlist.vl_list is None
+    assert vlist.r_ref is None
+    vlist.build(atoms.r)
+
+    vlpy = et_md2.verletlist.VL(cutoff=1.0)
+    vlpy.build_vectorized(atoms.r)
+    assert np.all(vlist.vl_size   == vlpy.vl_size)
+    assert np.all(vlist.vl_offset == vlpy.vl_offset)
+    assert np.all(vlist.vl_list   == vlpy.vl_list)
+
+    vl_list = vlist.vl_list
+    assert not vl_list.flags.writeable
+    assert not vl_list.flags.owndata
+    with pytest.raises(ValueError):
+        vl_list[0] = 1
+    # the view shares the memory of the C++ object
+    assert vl_list.__array_interface__['data'][0] == vlist.vl_list.__array_interface__['data'][0]
+    # the reference positions, too
+    assert np.array_equal(vlist.r_ref, atoms.r)
+    assert not vlist.r_ref.flags.writeable
+
+
+def test_vl_arrays_lifetime():
+    """The views keep the arrays they view alive, when the Verlet list is
+    rebuilt, permuted, reassigned or deleted."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+    vl = c_vl.VL(atoms.n, 1.2, 0.2)
+    vl.build(atoms.r)
+    names = ('vl_list', 'vl_offset', 'vl_size', 'r_ref')
+    views = [getattr(vl, name) for name in names]
+    copies = [view.copy() for view in views]
+
+    r = atoms.r + 0.5*np.random.random(atoms.r.shape)
+    vl.build(r)
+    vl.permute(np.random.permutation(atoms.n))
+    vl.set_reference(r)
+    vl.assign(copies[0], copies[1], copies[2])
+    del vl
+    # allocate and fill memory, which might reuse the freed vectors
+    garbage = [np.full(len(copy), -1, dtype=copy.dtype) for copy in copies for _ in range(10)]
+    for view, copy in zip(views, copies):
+        assert np.array_equal(view, copy)
+
+def test_vl64():
+    """VL has 32-bit atom indices, VL64 64-bit atom indices, the offsets are 64-bit."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+    vl32 = c_vl.VL(atoms.n, 1.2)
+    vl64 = c_vl.VL64(atoms.n, 1.2)
+    vl32.build(atoms.r)
+    vl64.build(atoms.r)
+    assert vl32.vl_list.dtype == vl32.vl_size.dtype == c_vl.VL.index_dtype == np.int32
+    assert vl64.vl_list.dtype == vl64.vl_size.dtype == c_vl.VL64.index_dtype == np.int64
+    assert vl32.vl_offset.dtype == vl64.vl_offset.dtype == np.int64
+    assert np.all(vl32.vl_list   == vl64.vl_list)
+    assert np.all(vl32.vl_offset == vl64.vl_offset)
+    assert et_md2.verletlist.vl2set(vl32) == et_md2.verletlist.vl2set(vl64)
+    with pytest.raises(OverflowError):
+        c_vl.VL(2**31, 1.0)
+
+def test_vl_full():
+    """A full Verlet list has every pair of the half Verlet list twice."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+    half = c_vl.VL(atoms.n, 1.2)
+    half.build(atoms.r)
+    assert not half.full()
+    pairs = et_md2.verletlist.vl2set(half)
+
+    vlpy = et_md2.verletlist.VL(cutoff=1.2, full=True)
+    vlpy.build_vectorized(atoms.r)
+    for build in ('build', 'build_simple'):
+        full = c_vl.VL(atoms.n, 1.2, full=True)
+        assert full.full()
+        getattr(full, build)(atoms.r)
+        assert et_md2.verletlist.vl2set(full) == pairs
+        assert np.all(full.vl_size   == vlpy.vl_size)
+        assert np.all(full.vl_offset == vlpy.vl_offset)
+        assert np.all(full.vl_list   == vlpy.vl_list)
+
+
+def test_vl_periodic():
+    """The periodic builds agree with the Python implementation."""
+    import et_md2.verletlist.c_vl as c_vl
+    # with a box 4 wide, build() falls back to build_simple(), as there are less
+    # than 3 cells in the z-direction
+    for upper_corner in ((6,5,5), (6,5,4)):
+        atoms = Atoms()
+        atoms.lattice_positions(upper_corner=upper_corner)
+        atoms.add_noise(0.1)
+        atoms.apply_PBC()
+        vlpy = et_md2.verletlist.VL(cutoff=1.2, skin=0.2)
+        vlpy.set_box(atoms.lower_corner, atoms.upper_corner)
+        vlpy.build_vectorized(atoms.r)
+        pairs = et_md2.verletlist.vl2set(vlpy)
+
+        vl = c_vl.VL(atoms.n, 1.2, 0.2)
+        assert not vl.periodic
+        assert vl.box_width is None
+        vl.build(atoms.r)
+        assert et_md2.verletlist.vl2set(vl) < pairs # pairs across the boundaries are missing
+        for full in (False, True):
+            for build in ('build', 'build_simple'):
+                vl = c_vl.VL(atoms.n, 1.2, 0.2, full)
+                vl.set_box(atoms.lower_corner, atoms.upper_corner)
+                assert vl.periodic
+                assert np.all(vl.lower_corner == 0.0)
+                assert np.all(vl.box_width == upper_corner)
+                getattr(vl, build)(atoms.r)
+                assert et_md2.verletlist.vl2set(vl) == pairs
+                assert np.sum(vl.vl_size) == (2 if full else 1)*len(pairs)
+
+    # wrapping an atom to the other side of the box does not move it
+    r = atoms.r.copy()
+    r[0,2] -= 4.0
+    assert not vl.needs_rebuild(r)
+    vl.clear_box()
+    assert not vl.periodic
+    assert vl.needs_rebuild(atoms.r)
+    with pytest.raises(RuntimeError):
+        vl.set_box(atoms.lower_corner, (6.0, 2.7, 4.0)) # less than 2*1.4 wide
+    # corners with another layout or dtype are converted
+    corners = np.array([[0.0, 6.0], [0.0, 5.0], [0.0, 4.0]])
+    vl.set_box(corners[:, 0], corners[:, 1].astype(int))
+    assert np.all(vl.lower_corner == 0.0)
+    assert np.all(vl.box_width == (6.0, 5.0, 4.0))
+
+
+def test_vl_permute():
+    """Permuting a Verlet list gives the Verlet list of the permuted atoms."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(5,4,4))
+    atoms.add_noise(0.1)
+    perm = np.random.permutation(atoms.n)
+    for VLType in (c_vl.VL, c_vl.VL64):
+        for full in (False, True):
+            vl = VLType(atoms.n, 1.2, 0.2, full)
+            vl.build(atoms.r)
+            vl.permute(perm)
+            expected = VLType(atoms.n, 1.2, 0.2, full)
+            expected.build(atoms.r[perm])
+            assert np.array_equal(vl.vl_size, expected.vl_size)
+            assert np.array_equal(vl.vl_offset, expected.vl_offset)
+            assert np.array_equal(vl.vl_list, expected.vl_list)
+            assert not vl.needs_rebuild(atoms.r[perm])
+            assert np.array_equal(vl.r_ref, atoms.r[perm])
+    # a permutation with another layout or dtype is converted
+    vl = c_vl.VL(atoms.n, 1.2, 0.2)
+    vl.build(atoms.r)
+    perm = perm[::-1]
+    vl.permute(np.repeat(perm, 2)[::2].astype(np.int32))
+    expected = c_vl.VL(atoms.n, 1.2, 0.2)
+    expected.build(atoms.r[perm])
+    assert np.array_equal(vl.vl_list, expected.vl_list)
+    with pytest.raises(RuntimeError):
+        vl.permute(np.zeros(atoms.n, dtype=int))
+    with pytest.raises(RuntimeError):
+        vl.permute(perm[:-1])
+
+
+def test_vl_positions_layout():
+    """Positions with another layout or dtype are converted, positions with a wrong shape are rejected."""
+    import et_md2.verletlist.c_vl as c_vl
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+    expected = c_vl.VL(atoms.n, 1.2)
+    expected.build(atoms.r)
+    strided = np.repeat(atoms.r, 2, axis=0)[::2]
+    for r in (np.asfortranarray(atoms.r), strided, atoms.r.astype(np.float32)):
+        for build in ('build', 'build_simple'):
+            vl = c_vl.VL(atoms.n, 1.2)
+            getattr(vl, build)(r)
+            assert et_md2.verletlist.vl2set(vl) == et_md2.verletlist.vl2set(expected)
+    vl = c_vl.VL(atoms.n, 1.2)
+    vl.build(np.asfortranarray(atoms.r))
+    assert not vl.needs_rebuild(strided)
+    r2 = np.ascontiguousarray(atoms.r[:,:2])
+    for f in (vl.build, vl.build_simple, vl.set_reference, vl.needs_rebuild):
+        with pytest.raises(RuntimeError):
+            f(r2)
+
+
 #===============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.
 # (normally all tests are run with pytest)
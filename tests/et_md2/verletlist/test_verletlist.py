@@ -4,14 +4,15 @@
 
 """Tests for sub-module et_md2.verletlist."""
 
-# import pytest
+import pytest
 import sys
 sys.path.insert(0,'.')
 
 
 from et_md2.atoms import Atoms
 import et_md2.verletlist
-# from et_md2.grid import Grid
+from et_md2.grid import Grid
+from et_md2.potentials import LJ_py
 
 import numpy as np
 
@@ -193,28 +194,279 @@ def test_build_2():
     pairs_simple = et_md2.verletlist.vl2set(vlsimple)
     assert pairs == pairs_simple
 
-# def _test_build_grid():
-#     """Verify VerletList.build_grid against VerletList.build_simple."""
-#     cutoff = 5.0
-#     max_neighbours = 100
-#     atoms = Atoms()
-#     atoms.lattice_positions(upper_corner=(5,5,5))
-#
-#     # compute grid
-#     the_grid = Grid(cell_size=cutoff, atoms=atoms, max_atoms_per_cell=100)
-#     the_grid.build()
-#
-#     # build grid-based verlet list
-#     vl = VerletList(cutoff=cutoff, max_neighbours=max_neighbours)
-#     vl.build_grid(the_grid.atoms.r, the_grid)
-#     print(vl)
-#     pairs = et_md2.verletlist.vl2set(vl)
-#
-#     vlsimple = VerletList(cutoff=cutoff, max_neighbours=max_neighbours)
-#     vlsimple.build_simple(atoms.r)
-#     print(vlsimple)
-#     expected = et_md2.verletlist.vl2set(vlsimple)
-#     assert pairs == expected
+def test_build_vectorized():
+    """Verify VerletList.build_vectorized against VerletList.build_simple."""
+    cutoff = 2.0
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(5,5,5))
+    atoms.add_noise(0.1)
+
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    vlsimple = VerletList(cutoff=cutoff)
+    vlsimple.build_simple(atoms.r)
+
+    block_size = VerletList.block_size
+    # use a very small block size, to force many blocks with a few rows only
+    for VerletList.block_size in (block_size, 1000):
+        vl = VerletList(cutoff=cutoff)
+        vl.build_vectorized(atoms.r)
+        assert vl.vl2d is None
+        assert vl.natoms == atoms.n
+        assert np.all(vl.vl_size   == vlsimple.vl_size)
+        assert np.all(vl.vl_offset == vlsimple.vl_offset)
+        assert np.all(vl.vl_list   == vlsimple.vl_list)
+        assert vl.has((0, 1))
+        assert np.all(vl.verlet_list(1) == vlsimple.verlet_list(1))
+    VerletList.block_size = block_size
+
+def test_skin():
+    """Pairs within cutoff + skin are in the Verlet list, and
+    needs_rebuild() fires when an atom has moved more than skin/2."""
+    x = np.array([0.0, 1, 2, 3, 4])
+    r = np.zeros((len(x),3))
+    r[:,0] = x
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    vl = VerletList(cutoff=1.5, skin=0.6)
+    assert vl.needs_rebuild(r)
+    vl.build_vectorized(r)
+    assert vl.has((0,2))
+    assert not vl.has((0,3))
+    assert not vl.needs_rebuild(r)
+
+    r2 = r.copy()
+    r2[3,1] += 0.29
+    assert not vl.needs_rebuild(r2)
+    r2[3,1] += 0.02
+    assert vl.needs_rebuild(r2)
+
+    vl.build(r2)
+    assert not vl.needs_rebuild(r2)
+
+
+def test_build_grid():
+    """Verify VerletList.build_grid against VerletList.build_simple."""
+    cutoff = 1.2
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(5,4,3))
+    atoms.add_noise(0.1)
+
+    # compute grid
+    the_grid = Grid(cell_size=cutoff, atoms=atoms)
+    the_grid.build()
+
+    # build grid-based verlet list
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    vl = VerletList(cutoff=cutoff)
+    vl.build_grid(the_grid.atoms.r, the_grid)
+    pairs = et_md2.verletlist.vl2set(vl)
+
+    vlsimple = VerletList(cutoff=cutoff)
+    vlsimple.build_simple(atoms.r)
+    expected = et_md2.verletlist.vl2set(vlsimple)
+    assert pairs == expected
+    # pairs are stored with i < j, and the Verlet lists are sorted:
+    assert np.all(vl.vl_size   == vlsimple.vl_size)
+    assert np.all(vl.vl_list   == vlsimple.vl_list)
+
+def test_index_dtype():
+    """The atom indices are 32-bit by default, the offsets are always 64-bit."""
+    cutoff = 1.2
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    vl32 = VerletList(cutoff=cutoff)
+    vl64 = VerletList(cutoff=cutoff, index_dtype=np.int64)
+    for build in ('build_simple', 'build_vectorized'):
+        getattr(vl32, build)(atoms.r)
+        getattr(vl64, build)(atoms.r)
+        assert vl32.vl_list.dtype == np.int32
+        assert vl32.vl_size.dtype == np.int32
+        assert vl64.vl_list.dtype == np.int64
+        assert vl64.vl_size.dtype == np.int64
+        for vl in (vl32, vl64):
+            assert vl.vl_offset.dtype == np.int64
+        assert np.all(vl32.vl_list   == vl64.vl_list)
+        assert np.all(vl32.vl_offset == vl64.vl_offset)
+
+    assert VerletList().get_index_dtype(2**31) == np.int64
+    with pytest.raises(OverflowError):
+        VerletList(index_dtype=np.int32).get_index_dtype(2**31)
+    with pytest.raises(TypeError):
+        VerletList(index_dtype=np.int16)
+
+def test_compute_interactions_vectorized():
+    """Verify the vectorized forces and energy against a loop over the pairs."""
+    cutoff = 1.5
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    atoms.add_noise(0.1)
+    lj = LJ_py(epsilon=1.0)
+
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    vl = VerletList(cutoff=cutoff, skin=0.3)
+    vl.build_vectorized(atoms.r)
+
+    a_expected = np.zeros_like(atoms.r)
+    epot_expected = 0.0
+    for i, j in et_md2.verletlist.vl2set(vl):
+        rij = atoms.r[j] - atoms.r[i]
+        rij2 = np.dot(rij, rij)
+        if rij2 <= cutoff**2:
+            a_expected[i] += lj.force_factor(rij2)*rij
+            a_expected[j] -= lj.force_factor(rij2)*rij
+            epot_expected += lj.interaction_energy(rij2)
+
+    block_size = VerletList.block_size
+    # use a very small block size, to force many blocks
+    for VerletList.block_size in (block_size, 100):
+        a = np.zeros_like(atoms.r)
+        vl.compute_interaction_forces(atoms.r, a, lj)
+        assert np.allclose(a, a_expected, rtol=1e-12, atol=1e-12*np.abs(a_expected).max())
+        epot = vl.compute_interaction_energy(atoms.r, lj)
+        assert epot == pytest.approx(epot_expected, rel=1e-12)
+    VerletList.block_size = block_size
+
+    # the pair blocks cover all pairs, in order
+    i, j = zip(*et_md2.verletlist.pair_blocks(vl, block_size=50))
+    # at most 50 pairs per block, unless the block is a single Verlet list
+    assert all(len(ib) <= 50 or np.all(ib == ib[0]) for ib in i)
+    assert np.all(np.concatenate(j) == vl.vl_list)
+    assert np.all(np.concatenate(i) == np.repeat(np.arange(atoms.n), vl.vl_size))
+
+def test_full():
+    """A full Verlet list has every pair of the half Verlet list twice, and
+    gives the same interactions."""
+    cutoff = 1.5
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,3))
+    atoms.add_noise(0.1)
+    lj = LJ_py(epsilon=1.0)
+
+    VerletList = et_md2.verletlist.implementation(impl='py')
+    half = VerletList(cutoff=cutoff, skin=0.3)
+    half.build_vectorized(atoms.r)
+    pairs = et_md2.verletlist.vl2set(half)
+    a_half = np.zeros_like(atoms.r)
+    epot_half, virial_half = et_md2.verletlist.compute_all(half, atoms.r, a_half, lj.force_factor, lj.interaction_energy)
+
+    the_grid = Grid(cell_size=cutoff + 0.3, atoms=atoms)
+    the_grid.build()
+    for build in ('build', 'build_simple', 'build_vectorized', 'build_grid'):
+        full = VerletList(cutoff=cutoff, skin=0.3, full=True)
+        if build == 'build_grid':
+            full.build_grid(atoms.r, the_grid)
+        else:
+            getattr(full, build)(atoms.r)
+        assert np.all(full.vl_size == np.bincount(np.array(list(pairs)).ravel(), minlength=atoms.n))
+        for i, j in pairs:
+            assert full.has((i, j)) and full.has((j, i))
+        for i in range(atoms.n):
+            vli = full.verlet_list(i)
+            assert np.all(np.diff(vli) > 0)
+            assert not i in vli
+
+        a = np.zeros_like(atoms.r)
+        epot, virial = et_md2.verletlist.compute_all(full, atoms.r, a, lj.force_factor, lj.interaction_energy)
+        assert np.allclose(a, a_half, rtol=1e-12, atol=1e-12*np.abs(a_half).max())
+        assert epot == pytest.approx(epot_half, rel=1e-12)
+        assert np.allclose(virial, virial_half)
+        assert et_md2.verletlist.compute_energy(full, atoms.r, lj.interaction_energy) == pytest.approx(epot_half, rel=1e-12)
+
+def _periodic_atoms():
+    """Return a disordered fcc crystal in a periodic box, and its minimum image pairs
+    within distance 1.4, computed brute force."""
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(6,5,5))
+    atoms.add_noise(0.1)
+    atoms.apply_PBC()
+    w = atoms.upper_corner - atoms.lower_corner
+    rij = atoms.r[np.newaxis, :, :] - atoms.r[:, np.newaxis, :]
+    rij -= w*np.round(rij/w)
+    i, j = np.nonzero(np.triu(np.einsum('ijk,ijk->ij', rij, rij) <= 1.4**2, k=1))
+    return atoms, set(zip(i.tolist(), j.tolist()))
+
+def test_periodic():
+    """The periodic builds find the minimum image pairs, also across the box boundaries."""
+    atoms, expected = _periodic_atoms()
+    # with skin, 1.2 + 0.2 = 1.4
+    vl = et_md2.verletlist.VL(cutoff=1.2, skin=0.2)
+    assert not vl.periodic
+    vl.build_vectorized(atoms.r)
+    assert et_md2.verletlist.vl2set(vl) < expected # pairs across the boundaries are missing
+
+    vl.set_box(atoms.lower_corner, atoms.upper_corner)
+    assert vl.periodic
+    assert np.all(vl.box_width == (6,5,5))
+    the_grid = Grid(cell_size=vl.list_cutoff, atoms=atoms)
+    the_grid.build()
+    assert np.all(the_grid.K >= 3)
+    for full in (False, True):
+        for build in ('build', 'build_simple', 'build_vectorized', 'build_grid'):
+            vl = et_md2.verletlist.VL(cutoff=1.2, skin=0.2, full=full)
+            vl.set_box(atoms.lower_corner, atoms.upper_corner)
+            if build == 'build_grid':
+                vl.build_grid(atoms.r, the_grid)
+            else:
+                getattr(vl, build)(atoms.r)
+            assert et_md2.verletlist.vl2set(vl) == expected
+            if full:
+                assert np.sum(vl.vl_size) == 2*len(expected)
+
+    # wrapping an atom to the other side of the box does not move it
+    r = atoms.r.copy()
+    r[0,0] += 6.0
+    assert not vl.needs_rebuild(r)
+    r[0,0] += 0.11
+    assert vl.needs_rebuild(r)
+
+    vl.clear_box()
+    assert not vl.periodic
+    assert vl.needs_rebuild(atoms.r)
+    with pytest.raises(ValueError):
+        vl.set_box((0,0,0), (5,2.7,5)) # less than 2*1.4 wide
+
+def test_periodic_interactions():
+    """In a perfect crystal in a periodic box all forces vanish, and all atoms
+    have the same energy."""
+    lj = LJ_py()
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,4))
+    a = np.sqrt(2)*lj.r0()
+    atoms.r *= a
+    atoms.upper_corner = 4*a*np.ones(3)
+    vl = et_md2.verletlist.VL(cutoff=2.2, skin=0.3)
+    vl.set_box(atoms.lower_corner, atoms.upper_corner)
+    vl.build_vectorized(atoms.r)
+    a = np.zeros_like(atoms.r)
+    epot, virial = et_md2.verletlist.compute_all(vl, atoms.r, a, lj.force_factor, lj.interaction_energy)
+    assert np.allclose(a, 0.0, atol=1e-12)
+    # 12 nearest neighbours at r0, 6 at sqrt(2)*r0 and 24 at sqrt(3)*r0
+    r2 = np.array([1.0, 2.0, 3.0])*lj.r0()**2
+    assert epot == pytest.approx(0.5*atoms.n*np.dot([12, 6, 24], lj.interaction_energy(r2)))
+    assert np.allclose(virial, np.trace(virial)/3*np.eye(3))
+    assert et_md2.verletlist.compute_energy(vl, atoms.r, lj.interaction_energy) == pytest.approx(epot)
+
+def test_permute():
+    """Permuting a Verlet list gives the Verlet list of the permuted atoms."""
+    atoms = Atoms()
+    atoms.lattice_positions(upper_corner=(4,4,3))
+    atoms.add_noise(0.1)
+    perm = np.random.permutation(atoms.n)
+    for full in (False, True):
+        vl = et_md2.verletlist.VL(cutoff=1.2, skin=0.2, full=full)
+        vl.build_vectorized(atoms.r)
+        vl.permute(perm)
+        expected = et_md2.verletlist.VL(cutoff=1.2, skin=0.2, full=full)
+        expected.build_vectorized(atoms.r[perm])
+        assert np.array_equal(vl.vl_size, expected.vl_size)
+        assert np.array_equal(vl.vl_offset, expected.vl_offset)
+        assert np.array_equal(vl.vl_list, expected.vl_list)
+        assert vl.vl_list.dtype == expected.vl_list.dtype
+        assert not vl.needs_rebuild(atoms.r[perm])
+    with pytest.raises(ValueError):
+        vl.permute(np.zeros(atoms.n, dtype=int))
 
 # ==============================================================================
 # The code below is for debugging a particular test in eclipse/pydev.